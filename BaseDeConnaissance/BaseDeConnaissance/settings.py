@@ -24,6 +24,111 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 
+# Cache of AI answers keyed by normalized query.
+# BACKEND: 'memory' (per process LRU), 'django' (CACHES alias) or 'sqlite' (on-disk file)
+AI_ANSWER_CACHE = {
+    'BACKEND': os.getenv('AI_ANSWER_CACHE_BACKEND', 'memory'),
+    'MAX_ENTRIES': 1000,
+    'TTL': 6 * 3600,
+}
+# Hard limit (seconds) for a streamed AI answer
+AI_STREAM_TIMEOUT = 30
+
+# Default cache, shared by every worker process. Page fragments (PAGE_CACHE) and the
+# category tree are invalidated by bumping generation keys stored here: a per-process
+# backend such as LocMemCache would leave other workers serving stale pages until the
+# entries expire. SQLite keeps all workers on one host, so the file-based cache is shared;
+# switch to the Redis or Memcached backend if that changes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Rendered fragments of home and article_detail, invalidated by signals
+PAGE_CACHE = {
+    'ENABLED': True,
+    'TIMEOUT': 600,       # seconds a fragment is kept
+    'LOCK_TIMEOUT': 10,   # seconds other requests wait for a fragment being rebuilt
+}
+
+# Search-as-you-type suggestions (in-memory prefix index, see utils/suggestions.py)
+SUGGESTIONS = {
+    'LIMIT': 8,
+    'REFRESH_INTERVAL': 900,   # seconds before the index is rebuilt in the background
+    'RECHERCHES_JOURS': 90,    # window of daily search rollups used for popular terms
+    'RECHERCHES_MIN': 3,       # successful searches needed for a term to be suggested
+}
+
+# Buffered article view tracking (Article.vues / ArticleVue)
+VIEW_TRACKING = {
+    'FLUSH_INTERVAL': 5,     # seconds between two batched writes
+    'DEDUP_WINDOW': 1800,    # a user/IP counts once per article in this window (seconds)
+    'MAX_BUFFER': 10000,     # views kept in memory before new ones are dropped
+}
+
+# Batched logging of searches (Recherche)
+SEARCH_LOGGING = {
+    'FLUSH_INTERVAL': 2,     # seconds between two bulk inserts
+    'MAX_QUEUE': 5000,       # bounded queue size
+    'BATCH_SIZE': 500,
+    'POLICY': 'drop',        # 'drop' when full, or 'block' up to BLOCK_TIMEOUT seconds
+    'BLOCK_TIMEOUT': 0.05,
+}
+
+# Raw ArticleVue/Recherche rows older than this are purged by agreger_evenements
+# once rolled up into daily totals
+RAW_EVENTS_RETENTION_DAYS = 90
+
+# Semantic search
+# Dotted path to an embedding backend class; empty = Gemini if GOOGLE_API_KEY is set,
+# otherwise the offline hashing backend.
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', '')
+VECTOR_STORE_DIR = BASE_DIR / 'vector_store'
+# Re-embed an article/solution in a background thread when its text changes
+EMBEDDING_SYNC_ON_SAVE = True
+# Blend keyword (BM25) and semantic results in search_view
+SEARCH_HYBRID = os.getenv('SEARCH_HYBRID', '') == '1'
+
+# Avatar variants generated in a process pool after upload (utils/avatars.py).
+# Files under media/avatars/v/ are named after a hash of their content and never
+# change: serve them with "Cache-Control: public, max-age=31536000, immutable".
+AVATARS = {
+    'ENABLED': True,
+    'WORKERS': 1,
+    'SIZES': [36, 72, 80, 160],     # square variants (pixels), 1x and 2x of the sizes shown
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 85,
+    'MAX_SIDE': 1024,               # the stored original is downscaled to this size
+    'MAX_PIXELS': 40_000_000,       # larger images are rejected before decoding
+    'MAX_UPLOAD_SIZE': 10 * 1024 * 1024,
+}
+
+# Article revision history (utils/revisions.py): a full compressed snapshot every
+# SNAPSHOT_INTERVAL versions, compressed line deltas in between
+REVISIONS = {
+    'SNAPSHOT_INTERVAL': 10,
+}
+
+# Read-only JSON API (baseconnaissance/api.py)
+API = {
+    'PAGE_SIZE': 50,           # articles per page (list and search)
+    'SYNC_BATCH_SIZE': 500,    # changed articles per api/modifications/ response
+    'SYNC_MARGIN': 5,          # seconds of recent changes left for the next sync call
+}
+
+# Text extraction from Article.fichier_pdf into the search index (optional dependency: pypdf)
+PDF_EXTRACTION = {
+    'ENABLED': True,
+    'WORKERS': 2,            # processes in the extraction pool
+    'PAGES_PER_TASK': 8,     # pages decoded by one task; bounds memory on large manuals
+    'PASSAGE_SIZE': 2000,    # maximum characters per stored passage
+    'STALE_AFTER': 900,      # seconds without progress before an interrupted extraction is taken over
+}
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -53,6 +158,8 @@ STATICFILES_DIRS= [BASE_DIR / 'static']
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'baseconnaissance.middleware.SQLInstrumentationMiddleware',
+    'baseconnaissance.middleware.ReadYourWritesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -61,6 +168,23 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-request SQL instrumentation (query count, SQL time, N+1 detection)
+SQL_INSTRUMENTATION = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 1.0 if DEBUG else 0.05,  # fraction of requests measured
+    'N_PLUS_ONE_THRESHOLD': 5,              # same statement shape repeated this often is flagged
+    'RESERVOIR_SIZE': 500,                  # recent samples kept per URL name for percentiles
+    'SERVER_TIMING_HEADER': DEBUG,
+}
+
+# Session users are loaded with their profile (avatar) in a single query
+AUTHENTICATION_BACKENDS = ['baseconnaissance.backends.ProfileModelBackend']
+
+# Seconds a user's group names stay cached. The cache key carries Profile.version_roles,
+# bumped in the database when groups change, so revocations reach every worker process
+# at their next request even with a per-process cache.
+ROLES_CACHE_TIMEOUT = 3600
+
 ROOT_URLCONF = 'BaseDeConnaissance.urls'
 
 TEMPLATES = [
@@ -73,6 +197,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'baseconnaissance.context_processors.user_roles',
             ],
         },
     },
@@ -84,11 +209,53 @@ WSGI_APPLICATION = 'BaseDeConnaissance.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Pragmas run on every new SQLite connection: WAL lets readers work alongside the
+# single writer, synchronous=NORMAL is durable enough under WAL, and a memory map
+# plus a 64 MiB page cache keep hot pages out of read() calls.
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA temp_store=MEMORY',
+]
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # Persistent connections, checked before reuse
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(SQLITE_PRAGMAS),
+            # Writers take the lock at BEGIN instead of failing on lock upgrade
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    },
+    # Read connection (see DATABASE_ROUTING): the same file opened read-only, so readers
+    # never wait for the write lock. Point it at a real replica in production.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(SQLITE_PRAGMAS[2:] + ['PRAGMA query_only=1']),
+            'timeout': 20,
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+# Writes go to 'default', reads to READ_ALIASES (baseconnaissance/routers.py).
+# After a write, the browser session reads from 'default' for PIN_SECONDS so that
+# it sees its own changes even if a replica lags behind.
+DATABASE_ROUTERS = ['baseconnaissance.routers.PrimaryReplicaRouter']
+DATABASE_ROUTING = {
+    'READ_ALIASES': ['replica'],
+    'PIN_SECONDS': 5,
 }
 
 
@@ -27,8 +27,13 @@ urlpatterns = [
     path('', project_views.home, name='home'),
     # Search uses the knowledge base app view
     path('search/', kb_views.search_view, name='search'),
+    path('search/ai/', kb_views.ai_answer_stream, name='ai_answer_stream'),
+    path('search/suggestions/', kb_views.search_suggestions, name='search_suggestions'),
     # Admin dashboard (protected in view)
     path('dashboard/', kb_views.admin_dashboard, name='admin_dashboard'),
+    path('dashboard/ai-cache/', kb_views.ai_cache_stats, name='ai_cache_stats'),
+    path('dashboard/sql-stats/', kb_views.sql_stats, name='sql_stats'),
+    path('dashboard/export/', kb_views.exporter_articles, name='exporter_articles'),
     # Auth
     path('login/', auth_views.LoginView.as_view(template_name='login.html'), name='login'),
     path('logout/', project_views.logout_view, name='logout'),
@@ -1,3 +1,4 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 from django.shortcuts import redirect
 from django.views.decorators.http import require_http_methods
@@ -5,10 +6,16 @@ from django.contrib.auth import logout as auth_logout
 from django.contrib.auth.decorators import login_required
 from baseconnaissance.models import Article, AdminNote
 from django.contrib.auth import get_user_model
-import google.generativeai as genai
+from django.template.loader import render_to_string
+from baseconnaissance.utils import ai, avatars, page_cache, roles
 
-def home(request):
+def _articles_populaires_html():
     articles_populaires = Article.objects.filter(statut='publie').order_by('-date_creation')[:4]
+    return render_to_string('fragments/articles_populaires.html', {'articles_populaires': articles_populaires})
+
+def home(request):
+    # Liste mise en cache ; notes et avatar, propres à l'utilisateur, restent hors du fragment
+    articles_populaires_html = page_cache.fragment('home', 'home:articles_populaires', _articles_populaires_html)
     unseen_notes_count = 0
     avatar_url = None
     if request.user.is_authenticated:
@@ -16,28 +23,26 @@ def home(request):
         profile = getattr(request.user, 'profile', None)
         if profile and getattr(profile, 'avatar', None):
             try:
-                avatar_url = profile.avatar.url
+                avatar_url = avatars.variant_url(profile, 36)
             except Exception:
                 avatar_url = None
     return render(request, 'home.html', {
-        'articles_populaires': articles_populaires,
+        'articles_populaires_html': articles_populaires_html,
         'unseen_notes_count': unseen_notes_count,
         'avatar_url': avatar_url,
     })
 
-def recherche_ai(request):
+async def recherche_ai(request):
     response_text = None
     if request.method == "POST":
         query = request.POST.get("query")
         if query:
             try:
-                genai.configure()
-                model = genai.GenerativeModel("gemini-1.5-flash")
-                completion = model.generate_content(query)
-                response_text = completion.text
+                response_text = await ai.answer_async(query)
             except Exception as e:
                 response_text = f"Error: {e}"
-    return render(request, 'recherche_ai.html', {"response": response_text}) 
+    # Le rendu charge request.user (processeurs de contexte) : accès ORM synchrone
+    return await sync_to_async(render)(request, 'recherche_ai.html', {"response": response_text})
 
 @require_http_methods(["GET", "POST"])
 def logout_view(request):
@@ -47,11 +52,11 @@ def logout_view(request):
 @login_required
 def profile_view(request):
     User = get_user_model()
-    is_admin_user = request.user.is_superuser or request.user.groups.filter(name='Administrateurs').exists()
+    is_admin_user = roles.is_admin(request.user)
     if request.method == 'POST':
         if request.FILES.get('avatar'):
             profile = getattr(request.user, 'profile', None)
-            if profile is not None:
+            if profile is not None and avatars.accept_upload(request.FILES['avatar']):
                 profile.avatar = request.FILES['avatar']
                 profile.save()
         elif request.POST.get('update_info'):
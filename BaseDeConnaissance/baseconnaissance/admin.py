@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Categorie, Article, ArticleVue, Recherche, Feedback, Profile, AdminNote
+from .models import (
+    Categorie, Article, ArticleVue, Recherche, Feedback, Profile, AdminNote, Statistique,
+    VueJournaliere, RechercheJournaliere, DocumentPdf,
+)
 
 admin.site.register(Categorie)
 admin.site.register(Article)
@@ -8,3 +11,7 @@ admin.site.register(Recherche)
 admin.site.register(Feedback)
 admin.site.register(Profile)
 admin.site.register(AdminNote)
+admin.site.register(Statistique)
+admin.site.register(VueJournaliere)
+admin.site.register(RechercheJournaliere)
+admin.site.register(DocumentPdf)
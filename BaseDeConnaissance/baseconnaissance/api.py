@@ -0,0 +1,225 @@
+"""API JSON en lecture seule : articles publiés, catégories, recherche et synchronisation.
+
+Les réponses portent un ETag ; un GET conditionnel (If-None-Match) reçoit un
+304 sans corps. Pour les articles et les catégories, l'ETag est calculé sans
+charger le contenu (version et date_modification, génération de l'arbre).
+Les réponses sont compressées en gzip si le client l'accepte, et ``?fields=``
+limite les champs lus en base et renvoyés.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_safe
+
+from .models import Article
+from .utils import article_sync, category_tree, search_index
+from .utils.pagination import InvalidCursor, decode_position, encode_cursor, keyset_page
+
+# Champ exposé -> champ lu par values() ; ``url`` est calculé depuis l'identifiant
+CHAMPS = {
+    'id': 'id',
+    'titre': 'titre',
+    'contenu': 'contenu',
+    'categorie': 'categorie_id',
+    'auteur': 'auteur__username',
+    'date_creation': 'date_creation',
+    'date_modification': 'date_modification',
+    'version': 'version',
+    'url': 'id',
+}
+CHAMPS_LISTE = ['id', 'titre', 'categorie', 'auteur', 'date_modification', 'version', 'url']
+RECHERCHE_QUERY_MAX = 200
+
+
+def _options():
+    return getattr(settings, 'API', {})
+
+
+def _json(data, status=200):
+    response = JsonResponse(data, status=status, json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False})
+    # Stockable, mais toujours revalidé par l'ETag
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def _erreur(message):
+    return _json({'erreur': message}, status=400)
+
+
+def _fields(request, defaut):
+    """Champs demandés par ``?fields=a,b`` ; None si un champ est inconnu."""
+    demande = request.GET.get('fields')
+    if not demande:
+        return defaut
+    fields = [field for field in demande.split(',') if field]
+    if not fields or any(field not in CHAMPS for field in fields):
+        return None
+    return fields
+
+
+def _lookups(fields):
+    return list(dict.fromkeys(CHAMPS[field] for field in fields))
+
+
+def _serialize(ligne, fields):
+    """Une ligne ``values()`` ou un article (résultats de recherche) en dictionnaire."""
+    data = {}
+    for field in fields:
+        if field == 'url':
+            pk = ligne['id'] if isinstance(ligne, dict) else ligne.pk
+            data[field] = reverse('article_detail', args=[pk])
+        elif isinstance(ligne, dict):
+            data[field] = ligne[CHAMPS[field]]
+        else:
+            valeur = ligne
+            for attr in CHAMPS[field].split('__'):
+                valeur = getattr(valeur, attr) if valeur is not None else None
+            data[field] = valeur
+    return data
+
+
+def _etag(*parts):
+    return hashlib.md5('|'.join(str(part) for part in parts).encode('utf-8'), usedforsecurity=False).hexdigest()
+
+
+def _conditional(request, response):
+    # ETag du contenu : le calcul est fait, seul le transfert est évité
+    set_response_etag(response)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+# --- Articles ---
+
+def _articles_etag(request):
+    etat = Article.objects.filter(statut='publie').aggregate(modif=Max('date_modification'), total=Count('id'))
+    return _etag('articles', etat['modif'], etat['total'], request.GET.urlencode())
+
+
+@gzip_page
+@require_safe
+@condition(etag_func=_articles_etag)
+def articles(request):
+    """Articles publiés, du plus récent au plus ancien, par pages (curseur ``apres``)."""
+    fields = _fields(request, CHAMPS_LISTE)
+    if fields is None:
+        return _erreur("Champ inconnu dans fields.")
+    queryset = Article.objects.filter(statut='publie')
+    categorie_id = request.GET.get('categorie', '')
+    if categorie_id:
+        arbre = category_tree.get_tree()
+        if not categorie_id.isdigit() or int(categorie_id) not in arbre.nodes:
+            return _erreur("Catégorie inconnue.")
+        queryset = queryset.filter(**category_tree.subtree_filter(arbre.nodes[int(categorie_id)].chemin, 'categorie__'))
+    lookups = _lookups(fields)
+    queryset = queryset.values(*dict.fromkeys(['id', 'date_creation', *lookups]))
+    try:
+        lignes, apres = keyset_page(queryset, request.GET.get('apres'), _options().get('PAGE_SIZE', 50))
+    except InvalidCursor:
+        return _erreur("Curseur invalide.")
+    return _json({'articles': [_serialize(ligne, fields) for ligne in lignes], 'apres': apres})
+
+
+def _article_etag(request, article_id):
+    etat = Article.objects.filter(pk=article_id, statut='publie').values_list('version', 'date_modification').first()
+    if etat is None:
+        return None
+    return _etag('article', article_id, *etat, request.GET.urlencode())
+
+
+@gzip_page
+@require_safe
+@condition(etag_func=_article_etag)
+def article(request, article_id):
+    fields = _fields(request, list(CHAMPS))
+    if fields is None:
+        return _erreur("Champ inconnu dans fields.")
+    ligne = Article.objects.filter(pk=article_id, statut='publie').values('id', *_lookups(fields)).first()
+    if ligne is None:
+        return _json({'erreur': "Article introuvable."}, status=404)
+    return _json(_serialize(ligne, fields))
+
+
+# --- Catégories ---
+
+@gzip_page
+@require_safe
+@condition(etag_func=lambda request: _etag('categories', category_tree.generation()))
+def categories(request):
+    """Arbre des catégories en ordre d'affichage, depuis l'arbre en mémoire (aucune requête SQL)."""
+    return _json({'categories': [
+        {'id': noeud.pk, 'nom': noeud.nom, 'parent': noeud.parent_id, 'profondeur': noeud.profondeur}
+        for noeud in category_tree.get_tree().walk()
+    ]})
+
+
+# --- Recherche ---
+
+@gzip_page
+@require_safe
+def recherche(request):
+    """Même classement que search_view ; ces recherches ne sont pas journalisées."""
+    query = request.GET.get('q', '')[:RECHERCHE_QUERY_MAX]
+    fields = _fields(request, CHAMPS_LISTE)
+    if fields is None:
+        return _erreur("Champ inconnu dans fields.")
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return _erreur("Page invalide.")
+    taille = _options().get('PAGE_SIZE', 50)
+    results, total = [], 0
+    if query:
+        search = search_index.hybrid_search if settings.SEARCH_HYBRID else search_index.search
+        results, total = search(query, offset=(page - 1) * taille, limit=taille)
+    return _conditional(request, _json({
+        'query': query,
+        'total': total,
+        'page': page,
+        'articles': [_serialize(resultat, fields) for resultat in results],
+    }))
+
+
+# --- Synchronisation ---
+
+@gzip_page
+@require_safe
+def modifications(request):
+    """Articles publiés modifiés et articles retirés depuis une position.
+
+    Premier appel sans paramètre (ou ``?depuis=<date ISO>``) ; les appels
+    suivants passent le ``curseur`` de la réponse précédente jusqu'à
+    ``complet`` vrai. Le client applique les retraits puis les articles.
+    """
+    fields = _fields(request, CHAMPS_LISTE)
+    if fields is None:
+        return _erreur("Champ inconnu dans fields.")
+    depuis, apres_id = None, 0
+    if request.GET.get('curseur'):
+        try:
+            depuis, apres_id = decode_position(request.GET['curseur'])
+        except InvalidCursor:
+            return _erreur("Curseur invalide.")
+    elif request.GET.get('depuis'):
+        try:
+            depuis = parse_datetime(request.GET['depuis'])
+        except ValueError:
+            depuis = None
+        if depuis is None:
+            return _erreur("Date invalide (format ISO 8601 attendu).")
+        if timezone.is_naive(depuis):
+            depuis = timezone.make_aware(depuis)
+    limit = _options().get('SYNC_BATCH_SIZE', 500)
+    lignes, retires, position, complet = article_sync.changes(depuis, apres_id, _lookups(fields), limit)
+    return _conditional(request, _json({
+        'articles': [_serialize(ligne, fields) for ligne in lignes],
+        'retires': retires,
+        'curseur': encode_cursor(position[0].isoformat(), position[1]),
+        'complet': complet,
+    }))
@@ -0,0 +1,12 @@
+from .utils import roles
+
+
+def user_roles(request):
+    """Rôles de l'utilisateur courant, sans requête SQL une fois le cache chaud."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {'user_is_admin': False, 'user_is_redacteur': False}
+    return {
+        'user_is_admin': roles.is_admin(user),
+        'user_is_redacteur': roles.is_redacteur(user),
+    }
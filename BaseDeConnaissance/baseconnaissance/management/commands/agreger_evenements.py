@@ -0,0 +1,40 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from baseconnaissance.utils import rollups
+
+
+class Command(BaseCommand):
+    help = ("Agrège ArticleVue et Recherche en totaux journaliers puis purge les "
+            "événements bruts plus anciens que la période de rétention.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=settings.RAW_EVENTS_RETENTION_DAYS,
+                            help="Jours de données brutes conservés (0 : ne rien purger).")
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Lignes supprimées par requête lors de la purge.")
+        parser.add_argument('--depuis', help="Recalculer à partir de cette date (AAAA-MM-JJ).")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['depuis']:
+            try:
+                since = datetime.date.fromisoformat(options['depuis'])
+            except ValueError:
+                raise CommandError("Date invalide, format attendu : AAAA-MM-JJ.")
+        days = rollups.run(since=since)
+        if since and days and days[0] > since:
+            self.stdout.write(self.style.WARNING(
+                f"Données brutes purgées avant le {days[0]} : les totaux de ces jours sont conservés."
+            ))
+        if days:
+            self.stdout.write(f"{len(days)} jour(s) agrégé(s) du {days[0]} au {days[-1]}.")
+        else:
+            self.stdout.write("Aucun événement à agréger.")
+        if options['retention_days'] > 0:
+            deleted = rollups.purge(options['retention_days'], options['batch_size'])
+            for model, total in deleted.items():
+                self.stdout.write(f"{model} : {total} ligne(s) purgée(s).")
+        self.stdout.write(self.style.SUCCESS("Agrégation terminée."))
@@ -0,0 +1,139 @@
+import json
+import platform
+import random
+import statistics
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.test import Client
+from django.urls import reverse
+
+from baseconnaissance.middleware import record_queries
+from baseconnaissance.models import Article
+from baseconnaissance.utils import roles, stats
+
+PAGES = ['home', 'search', 'article_detail', 'admin_dashboard', 'redacteur_dashboard', 'articles_a_valider']
+TERMES = ['vpn', 'imprimante reseau', 'outlook', 'mot de passe', 'certificat', 'synchronisation onedrive']
+
+
+def percentiles(values):
+    if len(values) < 2:
+        value = values[0] if values else None
+        return {'p50': value, 'p95': value, 'p99': value}
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {'p50': cuts[49], 'p95': cuts[94], 'p99': cuts[98]}
+
+
+class Command(BaseCommand):
+    help = ("Mesure les pages principales via le client de test (latence p50/p95/p99 et nombre "
+            "de requêtes SQL) et compare le résultat JSON à une référence enregistrée.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3, help="Requêtes d'échauffement non mesurées par page.")
+        parser.add_argument('--pages', nargs='+', choices=PAGES, default=PAGES)
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'benchmark_baseline.json'),
+                            help="Fichier de référence à comparer (ou à écrire avec --save-baseline).")
+        parser.add_argument('--save-baseline', action='store_true', help="Enregistrer ce résultat comme référence.")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Dégradation relative de p95 tolérée avant échec (0.25 = +25 %%).")
+        parser.add_argument('--output', help="Écrire le rapport JSON dans ce fichier plutôt que sur la sortie.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        article_ids = list(Article.objects.filter(statut='publie').order_by('?')
+                           .values_list('id', flat=True)[:200])
+        if not article_ids:
+            raise CommandError("Aucun article publié : générer un jeu de données avec generer_donnees.")
+        admin = User.objects.filter(Q(is_superuser=True) | Q(groups__name=roles.ADMINISTRATEURS)).first()
+        redacteur = User.objects.filter(groups__name=roles.REDACTEURS).first()
+        if admin is None or redacteur is None:
+            raise CommandError("Il faut au moins un administrateur et un rédacteur.")
+
+        scenarios = {
+            'home': (None, lambda: reverse('home')),
+            'search': (None, lambda: f"{reverse('search')}?q={rng.choice(TERMES)}"),
+            'article_detail': (None, lambda: reverse('article_detail', args=[rng.choice(article_ids)])),
+            'admin_dashboard': (admin, lambda: reverse('admin_dashboard')),
+            'redacteur_dashboard': (redacteur, lambda: reverse('redacteur_dashboard')),
+            'articles_a_valider': (admin, lambda: reverse('articles_a_valider')),
+        }
+        results = {}
+        for page in options['pages']:
+            user, url = scenarios[page]
+            results[page] = self.measure(user, url, options['iterations'], options['warmup'])
+            self.stderr.write(f"{page} : p95 {results[page]['latency_ms']['p95']:.1f} ms, "
+                              f"{results[page]['queries']['max']} requêtes")
+
+        report = {
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'debug': settings.DEBUG,
+            },
+            'dataset': stats.read(),
+            'iterations': options['iterations'],
+            'pages': results,
+        }
+        output = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False)
+        if options['output']:
+            Path(options['output']).write_text(output, encoding='utf-8')
+        else:
+            self.stdout.write(output)
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.write_text(output, encoding='utf-8')
+            self.stderr.write(self.style.SUCCESS(f"Référence enregistrée dans {baseline_path}."))
+            return
+        if baseline_path.exists():
+            baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+            regressions = self.compare(baseline.get('pages', {}), results, options['tolerance'])
+            if regressions:
+                raise CommandError("Régressions détectées :\n" + '\n'.join(regressions))
+            self.stderr.write(self.style.SUCCESS("Aucune régression par rapport à la référence."))
+
+    def measure(self, user, url, iterations, warmup):
+        # HTTP_HOST : 'testserver' n'est accepté que sous le lanceur de tests
+        client = Client(HTTP_HOST='localhost')
+        if user is not None:
+            client.force_login(user)
+        for _ in range(warmup):
+            client.get(url())
+        latencies, queries = [], []
+        for _ in range(iterations):
+            # Toutes les connexions : les lectures peuvent partir vers un réplica (routers.py)
+            with record_queries() as recorder:
+                path = url()
+                start = time.perf_counter()
+                response = client.get(path)
+                latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f"{path} a répondu {response.status_code}.")
+            queries.append(recorder.count)
+        return {
+            'latency_ms': percentiles(latencies),
+            'queries': {'median': statistics.median(queries), 'max': max(queries)},
+        }
+
+    def compare(self, baseline, results, tolerance):
+        regressions = []
+        for page, result in results.items():
+            reference = baseline.get(page)
+            if reference is None:
+                continue
+            p95, ref_p95 = result['latency_ms']['p95'], reference['latency_ms']['p95']
+            if ref_p95 and p95 > ref_p95 * (1 + tolerance):
+                regressions.append(f"{page} : p95 {p95:.1f} ms (référence {ref_p95:.1f} ms)")
+            if result['queries']['max'] > reference['queries']['max']:
+                regressions.append(f"{page} : {result['queries']['max']} requêtes "
+                                   f"(référence {reference['queries']['max']})")
+        return regressions
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from baseconnaissance.models import Revision
+from baseconnaissance.utils import revisions
+
+
+class Command(BaseCommand):
+    help = ("Réécrit l'historique des articles : instantanés replacés tous les N versions, "
+            "deltas recompressés et, en option, suppression des versions les plus anciennes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--garder', type=int,
+                            help="Nombre de versions conservées par article (toutes par défaut).")
+        parser.add_argument('--intervalle', type=int,
+                            help="Versions entre deux instantanés (settings.REVISIONS par défaut).")
+        parser.add_argument('--article', type=int, action='append', help="Limiter à un article (répétable).")
+        parser.add_argument('--dry-run', action='store_true', help="Calculer le gain sans rien écrire.")
+
+    def handle(self, *args, **options):
+        if options['garder'] is not None and options['garder'] < 1:
+            raise CommandError("--garder doit être au moins 1.")
+        if options['intervalle'] is not None and options['intervalle'] < 1:
+            raise CommandError("--intervalle doit être au moins 1.")
+        article_ids = Revision.objects.values_list('article_id', flat=True).distinct().order_by('article_id')
+        if options['article']:
+            article_ids = article_ids.filter(article_id__in=options['article'])
+        total_avant = total_apres = total_supprimees = articles = 0
+        for article_id in article_ids.iterator():
+            avant, apres, supprimees = revisions.compact(
+                article_id, options['garder'], options['intervalle'], options['dry_run'],
+            )
+            total_avant += avant
+            total_apres += apres
+            total_supprimees += supprimees
+            articles += 1
+        gain = 100 * (1 - total_apres / total_avant) if total_avant else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{articles} article(s), {total_supprimees} révision(s) supprimée(s), "
+            f"{total_avant} → {total_apres} octets ({gain:.0f} % de gain)"
+            + (" [simulation]" if options['dry_run'] else "")
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from baseconnaissance.models import Article, DocumentPdf
+from baseconnaissance.utils import pdf_text
+
+
+class Command(BaseCommand):
+    help = ("Extrait le texte des PDF joints aux articles et l'ajoute à l'index de recherche. "
+            "Un fichier déjà extrait (même empreinte) n'est pas retraité ; une extraction en erreur "
+            "ou interrompue est reprise.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Supprimer les textes déjà extraits et tout recommencer.")
+        parser.add_argument('--purger', action='store_true',
+                            help="Supprimer les textes extraits qui ne sont plus rattachés à aucun article.")
+
+    def handle(self, *args, **options):
+        if not pdf_text.is_available():
+            raise CommandError("pypdf n'est pas installé (pip install pypdf).")
+        if options['force']:
+            DocumentPdf.objects.all().delete()
+        articles = Article.objects.exclude(Q(fichier_pdf='') | Q(fichier_pdf__isnull=True))
+        if not options['force']:
+            articles = articles.filter(Q(document_pdf__isnull=True) | pdf_text.to_retry('document_pdf__'))
+        traites = erreurs = 0
+        for pk in articles.order_by('pk').values_list('pk', flat=True).iterator():
+            try:
+                document = pdf_text.process_article(pk, progress=self.stdout.write)
+            except OSError as exc:
+                self.stderr.write(f"Article #{pk} : {exc}")
+                erreurs += 1
+                continue
+            traites += 1
+            if document is not None and document.statut == 'erreur':
+                self.stderr.write(f"Article #{pk} : extraction impossible")
+                erreurs += 1
+        if options['purger']:
+            _, supprimes = DocumentPdf.objects.filter(articles__isnull=True).delete()
+            self.stdout.write(f"{supprimes.get('baseconnaissance.DocumentPdf', 0)} document(s) purgé(s).")
+        self.stdout.write(self.style.SUCCESS(f"{traites} article(s) traité(s), {erreurs} erreur(s)."))
@@ -0,0 +1,43 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from baseconnaissance.models import Profile
+from baseconnaissance.utils import avatars
+
+
+class Command(BaseCommand):
+    help = ("Génère les variantes des avatars déjà téléversés (originaux réduits, sans "
+            "métadonnées) et supprime en option les fichiers de variantes inutilisés.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Régénérer aussi les avatars qui ont déjà leurs variantes.")
+        parser.add_argument('--purger', action='store_true',
+                            help=f"Supprimer les fichiers de {avatars.DOSSIER_VARIANTES}/ qui ne sont plus référencés.")
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.exclude(Q(avatar='') | Q(avatar__isnull=True))
+        if not options['force']:
+            profiles = profiles.filter(avatar_variantes={})
+        traites = refuses = 0
+        for pk in profiles.order_by('pk').values_list('pk', flat=True).iterator():
+            if avatars.process_profile(pk) is None:
+                refuses += 1
+            else:
+                traites += 1
+        self.stdout.write(f"{traites} avatar(s) traité(s), {refuses} refusé(s) ou absent(s).")
+        if options['purger']:
+            utilises = avatars.referenced_names()
+            try:
+                _, fichiers = default_storage.listdir(avatars.DOSSIER_VARIANTES)
+            except FileNotFoundError:
+                fichiers = []
+            supprimes = 0
+            for fichier in fichiers:
+                name = f'{avatars.DOSSIER_VARIANTES}/{fichier}'
+                if name not in utilises:
+                    default_storage.delete(name)
+                    supprimes += 1
+            self.stdout.write(f"{supprimes} fichier(s) inutilisé(s) supprimé(s).")
+        self.stdout.write(self.style.SUCCESS("Terminé."))
@@ -0,0 +1,294 @@
+import datetime
+import random
+from collections import Counter
+from contextlib import contextmanager
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from baseconnaissance.models import (
+    Article, ArticleVue, Categorie, Commentaire, Feedback, Profile, Recherche, Solution,
+)
+from baseconnaissance.utils import category_tree, engagement, roles, rollups, search_index, stats
+
+DOMAINES = [
+    'Réseau', 'Messagerie', 'Impression', 'Postes de travail', 'Téléphonie', 'Sécurité',
+    'Applications métier', 'Stockage', 'Comptes et accès', 'Serveurs', 'Sauvegarde', 'Mobilité',
+]
+THEMES = [
+    'Configuration', 'Dépannage', 'Installation', 'Mise à jour', 'Procédures', 'Questions fréquentes',
+    'Incidents connus', 'Bonnes pratiques',
+]
+SYSTEMES = ['Windows 11', 'Windows 10', 'Ubuntu 22.04', 'macOS', 'Android', 'iOS', 'Debian 12']
+OBJETS = [
+    'le VPN', "l'imprimante réseau", 'Outlook', 'le lecteur partagé', 'le Wi-Fi', 'Teams',
+    'le proxy', 'la carte graphique', 'le certificat SSL', "l'antivirus", 'le pare-feu',
+    'la boîte aux lettres partagée', 'le scanner', 'la session itinérante', 'le serveur de fichiers',
+    "l'authentification à deux facteurs", 'le pilote audio', 'la synchronisation OneDrive',
+]
+PROBLEMES = [
+    'Impossible de se connecter à {objet} sous {systeme}',
+    '{objet} ne répond plus après la mise à jour de {systeme}',
+    'Configurer {objet} sur un poste {systeme}',
+    'Erreur 0x{code:04X} lors du démarrage de {objet}',
+    'Lenteurs de {objet} en télétravail',
+    'Réinitialiser {objet} sans perdre les données',
+    '{objet} refuse le mot de passe sous {systeme}',
+    'Message « accès refusé » en ouvrant {objet}',
+]
+PHRASES = [
+    "Vérifiez d'abord que {objet} est bien à jour et que le poste est connecté au réseau de l'entreprise.",
+    "Le problème apparaît généralement après une mise à jour de {systeme} ou un changement de mot de passe.",
+    "Ouvrez le panneau de configuration, puis supprimez les identifiants enregistrés pour {objet}.",
+    "Redémarrez le service concerné et patientez quelques minutes avant de réessayer.",
+    "Si l'erreur persiste, consultez le journal des événements et notez le code d'erreur affiché.",
+    "Cette procédure nécessite des droits d'administrateur local sur le poste.",
+    "Sous {systeme}, le paramètre se trouve dans les options avancées de la connexion.",
+    "Contactez le support de niveau 2 si plusieurs utilisateurs du même site sont touchés.",
+    "Pensez à sauvegarder vos fichiers avant de réinstaller {objet}.",
+    "Le correctif a été déployé automatiquement sur les postes gérés depuis la dernière campagne.",
+    "Videz le cache du navigateur et reconnectez-vous avec votre compte professionnel.",
+    "Une coupure du proxy peut provoquer le même symptôme : vérifiez l'accès aux sites internes.",
+]
+COMMENTAIRES = [
+    "Merci, cela a réglé mon problème.", "La procédure ne fonctionne pas sous {systeme}.",
+    "Est-ce valable aussi pour {objet} ?", "Article très clair, merci !",
+    "J'ai dû redémarrer deux fois avant que cela fonctionne.", "Il manque une capture d'écran pour l'étape 3.",
+]
+RECHERCHES = [
+    'vpn', 'imprimante', 'outlook', 'mot de passe', 'wifi', 'teams', 'proxy', 'certificat',
+    'onedrive', 'scanner', 'erreur connexion', 'lecteur reseau', 'antivirus', 'pilote audio',
+    'double authentification', 'boite partagee', 'lenteur', 'mise a jour windows', 'kerberos',
+    'imprimante bourrage', 'licence office', 'badge', 'messagerie mobile',
+]
+STATUTS_ARTICLE = [('publie', 80), ('en_attente', 8), ('brouillon', 8), ('archive', 4)]
+STATUTS_SOLUTION = [('valide', 70), ('en_attente', 20), ('refuse', 10)]
+
+
+@contextmanager
+def dates_libres(*models):
+    """Désactive auto_now / auto_now_add le temps d'insérer des dates étalées dans le passé."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = ("Génère une base de connaissances synthétique en français (catégories, articles, "
+            "solutions, commentaires, avis, vues, recherches, utilisateurs) pour les mesures "
+            "de performance. Les lignes sont insérées par lots, sans passer par les signaux.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=100000)
+        parser.add_argument('--categories', type=int, default=len(DOMAINES),
+                            help="Nombre de catégories racines.")
+        parser.add_argument('--profondeur', type=int, default=3, help="Profondeur de l'arbre de catégories.")
+        parser.add_argument('--largeur', type=int, default=4, help="Sous-catégories par catégorie.")
+        parser.add_argument('--solutions', type=float, default=1.5, help="Solutions par article (moyenne).")
+        parser.add_argument('--commentaires', type=float, default=2.0, help="Commentaires par article (moyenne).")
+        parser.add_argument('--feedbacks', type=float, default=1.0, help="Avis par article (moyenne).")
+        parser.add_argument('--vues', type=int, default=2000000)
+        parser.add_argument('--recherches', type=int, default=1000000)
+        parser.add_argument('--lecteurs', type=int, default=2000)
+        parser.add_argument('--redacteurs', type=int, default=100)
+        parser.add_argument('--administrateurs', type=int, default=5)
+        parser.add_argument('--jours', type=int, default=180, help="Période couverte par les dates générées.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--ajouter', action='store_true',
+                            help="Autoriser la génération dans une base contenant déjà des articles.")
+
+    def handle(self, *args, **options):
+        if Article.objects.exists() and not options['ajouter']:
+            raise CommandError("La base contient déjà des articles ; relancer avec --ajouter pour compléter.")
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.jours = options['jours']
+
+        with transaction.atomic():
+            lecteurs, redacteurs, admins = self.create_users(options)
+            categories = self.create_categories(options)
+            articles = self.create_articles(options['articles'], categories, redacteurs + admins)
+            publies = [article for article in articles if article.statut == 'publie']
+            membres = lecteurs + redacteurs + admins
+            self.create_solutions(articles, options['solutions'], membres)
+            self.create_commentaires(publies, options['commentaires'], membres)
+            self.create_feedbacks(publies, options['feedbacks'], membres)
+            self.create_vues(publies, options['vues'], membres)
+            self.create_recherches(options['recherches'], membres)
+
+        self.stdout.write("Reconstruction de l'index plein texte…")
+        search_index.rebuild()
+        days = rollups.run()
+        self.stdout.write(f"{len(days)} jour(s) agrégé(s).")
+        drift = stats.verify(repair=True)
+        self.stdout.write(f"{len(drift)} compteur(s) recalculé(s).")
+        # bulk_create ne déclenche pas les signaux qui tiennent les compteurs des articles
+        self.stdout.write(f"{engagement.recompute()} article(s) avec compteurs recalculés.")
+        self.stdout.write(self.style.SUCCESS("Jeu de données généré."))
+
+    def date_passee(self):
+        return self.now - datetime.timedelta(seconds=self.rng.randrange(self.jours * 86400))
+
+    def texte(self, modele):
+        return modele.format(objet=self.rng.choice(OBJETS), systeme=self.rng.choice(SYSTEMES),
+                             code=self.rng.randrange(0x10000))
+
+    def bulk(self, model, objects):
+        with dates_libres(model):
+            created = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.stdout.write(f"{model.__name__} : {len(created)}")
+        return created
+
+    def create_users(self, options):
+        password = make_password('benchmark')
+        redacteurs_group, _ = Group.objects.get_or_create(name=roles.REDACTEURS)
+        admins_group, _ = Group.objects.get_or_create(name=roles.ADMINISTRATEURS)
+        start = User.objects.filter(username__startswith='bench_').count()
+        groups = {}
+        users = []
+        for role, total, group in (('lecteur', options['lecteurs'], None),
+                                   ('redacteur', options['redacteurs'], redacteurs_group),
+                                   ('admin', options['administrateurs'], admins_group)):
+            for i in range(total):
+                user = User(username=f'bench_{role}_{start + len(users)}', password=password,
+                            email=f'{role}{start + len(users)}@exemple.fr', date_joined=self.date_passee())
+                users.append(user)
+                groups[user.username] = (role, group)
+        users = self.bulk(User, users)
+        # bulk_create ne déclenche pas post_save : profils et groupes créés ici
+        Profile.objects.bulk_create([Profile(user=user) for user in users], batch_size=self.batch_size)
+        Membership = User.groups.through
+        Membership.objects.bulk_create([
+            Membership(user_id=user.pk, group_id=groups[user.username][1].pk)
+            for user in users if groups[user.username][1] is not None
+        ], batch_size=self.batch_size)
+        by_role = {'lecteur': [], 'redacteur': [], 'admin': []}
+        for user in users:
+            by_role[groups[user.username][0]].append(user)
+        return by_role['lecteur'], by_role['redacteur'], by_role['admin']
+
+    def create_categories(self, options):
+        """Arbre de catégories créé niveau par niveau ; renvoie les feuilles et nœuds."""
+        racines = []
+        for i in range(options['categories']):
+            nom = DOMAINES[i % len(DOMAINES)]
+            racines.append(Categorie(nom=nom if i < len(DOMAINES) else f'{nom} {i // len(DOMAINES) + 1}'))
+        niveau = self.bulk(Categorie, racines)
+        categories = list(niveau)
+        for _ in range(1, options['profondeur']):
+            enfants = [
+                Categorie(nom=f'{parent.nom} – {THEMES[j % len(THEMES)]}', parent=parent)
+                for parent in niveau for j in range(options['largeur'])
+            ]
+            niveau = self.bulk(Categorie, enfants)
+            categories += niveau
+        # bulk_create ne déclenche pas les signaux qui tiennent les chemins à jour
+        category_tree.rebuild_paths()
+        return categories
+
+    def create_articles(self, total, categories, auteurs):
+        statuts, poids = zip(*STATUTS_ARTICLE)
+        articles = []
+        for _ in range(total):
+            created = self.date_passee()
+            paragraphes = [
+                ' '.join(self.texte(phrase) for phrase in self.rng.sample(PHRASES, self.rng.randint(3, 6)))
+                for _ in range(self.rng.randint(2, 5))
+            ]
+            articles.append(Article(
+                titre=self.texte(self.rng.choice(PROBLEMES))[:200],
+                contenu='\n\n'.join(paragraphes),
+                categorie=self.rng.choice(categories),
+                auteur=self.rng.choice(auteurs),
+                statut=self.rng.choices(statuts, poids)[0],
+                version=self.rng.randint(1, 4),
+                date_creation=created,
+                date_modification=created + datetime.timedelta(hours=self.rng.randrange(0, 24 * 30)),
+            ))
+        return self.bulk(Article, articles)
+
+    def _par_article(self, articles, moyenne):
+        """Répartition aléatoire d'environ ``moyenne`` objets par article."""
+        for article in articles:
+            nombre = int(moyenne) + (self.rng.random() < moyenne - int(moyenne))
+            for _ in range(nombre):
+                yield article
+
+    def create_solutions(self, articles, moyenne, auteurs):
+        statuts, poids = zip(*STATUTS_SOLUTION)
+        self.bulk(Solution, [
+            Solution(article=article, auteur=self.rng.choice(auteurs), date_creation=self.date_passee(),
+                     statut=self.rng.choices(statuts, poids)[0],
+                     contenu=' '.join(self.texte(phrase) for phrase in self.rng.sample(PHRASES, 3)))
+            for article in self._par_article(articles, moyenne)
+        ])
+
+    def create_commentaires(self, articles, moyenne, auteurs):
+        self.bulk(Commentaire, [
+            Commentaire(article=article, auteur=self.rng.choice(auteurs), date_creation=self.date_passee(),
+                        contenu=self.texte(self.rng.choice(COMMENTAIRES)))
+            for article in self._par_article(articles, moyenne)
+        ])
+
+    def create_feedbacks(self, articles, moyenne, auteurs):
+        self.bulk(Feedback, [
+            Feedback(article=article, utilisateur=self.rng.choice(auteurs), date_feedback=self.date_passee(),
+                     note=self.rng.choices([1, 2, 3, 4, 5], [5, 8, 20, 35, 32])[0])
+            for article in self._par_article(articles, moyenne)
+        ])
+
+    def create_vues(self, articles, total, utilisateurs):
+        """Vues réparties selon une loi de popularité ; Article.vues est mis en cohérence."""
+        if not articles or not total:
+            return
+        cumul = list(accumulate(1.0 / (rang + 1) for rang in range(len(articles))))
+        populaires = self.rng.sample(articles, len(articles))
+        compteur = Counter()
+        for debut in range(0, total, self.batch_size):
+            lot = []
+            for article in self.rng.choices(populaires, cum_weights=cumul, k=min(self.batch_size, total - debut)):
+                compteur[article.pk] += 1
+                lot.append(ArticleVue(
+                    article_id=article.pk, date_vue=self.date_passee(),
+                    utilisateur=self.rng.choice(utilisateurs) if self.rng.random() < 0.4 else None,
+                    ip_address=f'10.{self.rng.randrange(256)}.{self.rng.randrange(256)}.{self.rng.randrange(1, 255)}',
+                ))
+            with dates_libres(ArticleVue):
+                ArticleVue.objects.bulk_create(lot)
+        for article in articles:
+            article.vues = compteur[article.pk]
+        Article.objects.bulk_update(articles, ['vues'], batch_size=self.batch_size)
+        self.stdout.write(f"ArticleVue : {total}")
+
+    def create_recherches(self, total, utilisateurs):
+        mots = [mot for objet in OBJETS for mot in objet.split() if len(mot) > 3]
+        for debut in range(0, total, self.batch_size):
+            lot = []
+            for _ in range(min(self.batch_size, total - debut)):
+                if self.rng.random() < 0.85:
+                    terme = self.rng.choice(RECHERCHES)
+                else:
+                    terme = ' '.join(self.rng.sample(mots, 2))
+                lot.append(Recherche(
+                    terme=terme, date_recherche=self.date_passee(),
+                    resultats_trouves=0 if self.rng.random() < 0.1 else self.rng.randint(1, 200),
+                    utilisateur=self.rng.choice(utilisateurs) if self.rng.random() < 0.3 else None,
+                ))
+            with dates_libres(Recherche):
+                Recherche.objects.bulk_create(lot)
+        self.stdout.write(f"Recherche : {total}")
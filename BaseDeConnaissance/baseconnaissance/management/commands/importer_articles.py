@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from baseconnaissance.models import Article
+from baseconnaissance.utils import article_io
+
+
+class Command(BaseCommand):
+    help = ("Importe des articles (et leurs solutions) depuis un fichier JSONL ou CSV, ou un "
+            "dossier de fichiers Markdown, en flux et par lots transactionnels.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Fichier .jsonl/.csv ou dossier de fichiers .md.")
+        parser.add_argument('--format', choices=sorted(article_io.READERS),
+                            help="Format de la source (déduit de l'extension par défaut).")
+        parser.add_argument('--auteur', required=True,
+                            help="Utilisateur attribué aux articles sans auteur connu.")
+        parser.add_argument('--statut', choices=[statut for statut, _ in Article.STATUT_CHOIX], default='publie',
+                            help="Statut des articles qui n'en précisent pas.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Articles par transaction.")
+
+    def handle(self, *args, **options):
+        format_ = options['format'] or article_io.detect_format(options['source'])
+        if format_ is None:
+            raise CommandError("Format inconnu : préciser --format.")
+        try:
+            auteur = User.objects.get(username=options['auteur'])
+        except User.DoesNotExist:
+            raise CommandError(f"Utilisateur inconnu : {options['auteur']}")
+        try:
+            records = article_io.READERS[format_](options['source'])
+            importer = article_io.ArticleImporter(
+                auteur, statut=options['statut'], batch_size=options['batch_size'], progress=self.stdout.write,
+            )
+            result = importer.run(records)
+        except OSError as exc:
+            raise CommandError(str(exc))
+        for erreur in result.erreurs:
+            self.stderr.write(erreur)
+        self.stdout.write(self.style.SUCCESS(f"Import terminé : {result}."))
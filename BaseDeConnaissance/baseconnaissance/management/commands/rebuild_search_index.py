@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from baseconnaissance.utils import search_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index plein texte (FTS5) des articles publiés."
+
+    def handle(self, *args, **options):
+        if not search_index.is_available():
+            self.stdout.write(self.style.WARNING("Index plein texte indisponible sur cette base (SQLite requis)."))
+            return
+        total = search_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"{total} article(s) indexé(s)."))
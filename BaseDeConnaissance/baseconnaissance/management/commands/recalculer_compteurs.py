@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from baseconnaissance.utils import engagement
+
+
+class Command(BaseCommand):
+    help = ("Recalcule les compteurs dénormalisés des articles (solutions, commentaires, avis) "
+            "depuis les tables sources et corrige ceux qui ont divergé.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--article', type=int, action='append', dest='articles',
+                            help="Limiter à cet article (option répétable).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Compter les écarts sans rien écrire.")
+
+    def handle(self, *args, **options):
+        corriges = engagement.recompute(options['articles'], options['batch_size'], options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f"{corriges} article(s) avec des compteurs divergents.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{corriges} article(s) corrigé(s)."))
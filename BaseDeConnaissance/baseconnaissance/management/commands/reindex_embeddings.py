@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from baseconnaissance.utils.embedding_pipeline import SOURCES, EmbeddingPipeline
+
+
+class Command(BaseCommand):
+    help = ("Met à jour l'index vectoriel : seuls les articles publiés et les solutions "
+            "validées dont le texte a changé sont recalculés, par lots.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=64,
+                            help="Nombre de textes par appel au backend d'embedding.")
+        parser.add_argument('--checkpoint-every', type=int, default=2048,
+                            help="Fréquence d'écriture de l'index et du point de reprise.")
+        parser.add_argument('--only', choices=sorted(SOURCES), action='append',
+                            help="Limiter à une source (répétable).")
+        parser.add_argument('--full', action='store_true',
+                            help="Tout recalculer, même les textes inchangés.")
+        parser.add_argument('--reset', action='store_true',
+                            help="Ignorer le point de reprise d'une exécution interrompue.")
+
+    def handle(self, *args, **options):
+        pipeline = EmbeddingPipeline(
+            batch_size=options['batch_size'],
+            checkpoint_every=options['checkpoint_every'],
+            progress=self.stdout.write,
+        )
+        if options['reset']:
+            pipeline.reset_checkpoint()
+        stats = pipeline.run(options['only'] or list(SOURCES), full=options['full'])
+        for name, source_stats in stats.items():
+            self.stdout.write(self.style.SUCCESS(f"{name} : {source_stats}"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from baseconnaissance.utils import stats
+
+
+class Command(BaseCommand):
+    help = ("Compare les compteurs pré-agrégés du tableau de bord aux tables sources "
+            "et corrige les écarts avec --repair.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help="Corriger les compteurs divergents.")
+
+    def handle(self, *args, **options):
+        drift = stats.verify(repair=options['repair'])
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Statistiques à jour."))
+            return
+        for cle, (stocke, attendu) in sorted(drift.items()):
+            self.stdout.write(f"{cle} : stocké {stocke}, attendu {attendu}")
+        if options['repair']:
+            self.stdout.write(self.style.SUCCESS(f"{len(drift)} compteur(s) corrigé(s)."))
+        else:
+            raise CommandError(f"{len(drift)} compteur(s) divergent(s) ; relancer avec --repair.")
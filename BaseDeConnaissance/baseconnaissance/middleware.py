@@ -0,0 +1,218 @@
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from . import routers
+
+logger = logging.getLogger('baseconnaissance.sql')
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+_SPACES_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """Forme canonique d'une requête : littéraux et listes IN (...) remplacés par ?."""
+    sql = _LITERAL_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(?)', sql)
+    return _SPACES_RE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """Hook ``connection.execute_wrapper`` : compte, chronomètre et regroupe les requêtes."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[sql] += 1
+
+    def repeated(self, threshold):
+        """Requêtes de même forme exécutées au moins ``threshold`` fois (N+1 probable)."""
+        totals = Counter()
+        for sql, count in self.fingerprints.items():
+            totals[fingerprint(sql)] += count
+        return {sql: count for sql, count in totals.items() if count >= threshold}
+
+
+@contextmanager
+def record_queries():
+    """QueryRecorder installé sur toutes les connexions : les lectures routées vers un réplica comptent aussi."""
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+class ViewStats:
+    """Échantillons récents (réservoir borné) d'une vue nommée."""
+
+    def __init__(self, size):
+        self.samples = deque(maxlen=size)
+        self.requests = 0
+        self.n_plus_one = 0
+        self.repeated = Counter()
+
+    def add(self, duration_ms, queries, sql_ms, repeated):
+        self.requests += 1
+        self.samples.append((duration_ms, queries, sql_ms))
+        if repeated:
+            self.n_plus_one += 1
+            self.repeated.update(repeated)
+
+    def summary(self):
+        columns = list(zip(*self.samples)) or [(), (), ()]
+        summary = {'requests': self.requests, 'n_plus_one': self.n_plus_one}
+        for name, values in zip(('duration_ms', 'queries', 'sql_ms'), columns):
+            summary[name] = {f'p{pct}': _percentile(values, pct) for pct in (50, 95, 99)}
+        summary['repeated'] = [
+            {'sql': sql, 'count': count} for sql, count in self.repeated.most_common(5)
+        ]
+        return summary
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def record(view_name, duration_ms, queries, sql_ms, repeated, size):
+    with _stats_lock:
+        stats = _stats.get(view_name)
+        if stats is None:
+            stats = _stats[view_name] = ViewStats(size)
+        stats.add(duration_ms, queries, sql_ms, repeated)
+
+
+def get_stats():
+    with _stats_lock:
+        return {name: stats.summary() for name, stats in sorted(_stats.items())}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class SQLInstrumentationMiddleware:
+    """Mesure les requêtes SQL d'un échantillon de requêtes HTTP.
+
+    Pour chaque requête échantillonnée (SQL_INSTRUMENTATION['SAMPLE_RATE']) :
+    nombre de requêtes, temps SQL cumulé et formes répétées, signalées comme
+    N+1 probables dans le journal ``baseconnaissance.sql``. Les percentiles par
+    nom d'URL sont servis par la vue ``sql_stats``. Les vues asynchrones sont
+    transmises sans mesure : leurs requêtes s'exécutent dans d'autres threads.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = getattr(settings, 'SQL_INSTRUMENTATION', {})
+        self.enabled = options.get('ENABLED', True)
+        self.sample_rate = options.get('SAMPLE_RATE', 0.1)
+        self.threshold = options.get('N_PLUS_ONE_THRESHOLD', 5)
+        self.reservoir = options.get('RESERVOIR_SIZE', 500)
+        self.header = options.get('SERVER_TIMING_HEADER', settings.DEBUG)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        duration_ms = (time.perf_counter() - start) * 1000
+        sql_ms = recorder.duration * 1000
+
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        repeated = recorder.repeated(self.threshold)
+        if repeated:
+            logger.warning(
+                "N+1 probable sur %s (%s requêtes) : %s",
+                view_name, recorder.count,
+                '; '.join(f"{count}x {sql[:200]}" for sql, count in repeated.items()),
+            )
+        record(view_name, duration_ms, recorder.count, sql_ms, repeated, self.reservoir)
+        if self.header:
+            response['Server-Timing'] = f'sql;dur={sql_ms:.1f};desc="{recorder.count} queries"'
+        return response
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+
+class ReadYourWritesMiddleware:
+    """Lectures sur la base principale pour la session qui vient d'écrire.
+
+    Une requête qui écrit dépose un cookie valable
+    DATABASE_ROUTING['PIN_SECONDS'] secondes ; tant qu'il est présent, le
+    routeur n'envoie pas les lectures de ce navigateur vers les réplicas, qui
+    peuvent avoir du retard sur la base principale.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = getattr(settings, 'DATABASE_ROUTING', {})
+        self.cookie = options.get('PIN_COOKIE', 'db_pin')
+        self.pin_seconds = options.get('PIN_SECONDS', 5)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _finish(self, request, tokens, response):
+        if routers.end_request(tokens):
+            response.set_cookie(self.cookie, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tokens = routers.begin_request(self.cookie in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            routers.end_request(tokens)
+            raise
+        return self._finish(request, tokens, response)
+
+    async def __acall__(self, request):
+        tokens = routers.begin_request(self.cookie in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            routers.end_request(tokens)
+            raise
+        return self._finish(request, tokens, response)
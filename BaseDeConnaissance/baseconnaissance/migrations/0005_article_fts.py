@@ -0,0 +1,33 @@
+from django.db import migrations
+
+FTS_TABLE = 'baseconnaissance_article_fts'
+
+
+def create_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "titre, contenu, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE}(rowid, titre, contenu) "
+        "SELECT id, titre, contenu FROM baseconnaissance_article WHERE statut = 'publie'"
+    )
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baseconnaissance', '0004_adminnote_commentaire_profile'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
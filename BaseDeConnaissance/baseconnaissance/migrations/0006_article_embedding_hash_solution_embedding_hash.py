@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baseconnaissance', '0005_article_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='embedding_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='solution',
+            name='embedding_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:07
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def initialiser_statistiques(apps, schema_editor):
+    Article = apps.get_model('baseconnaissance', 'Article')
+    Categorie = apps.get_model('baseconnaissance', 'Categorie')
+    Feedback = apps.get_model('baseconnaissance', 'Feedback')
+    Statistique = apps.get_model('baseconnaissance', 'Statistique')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    values = {
+        'articles': Article.objects.count(),
+        'categories': Categorie.objects.count(),
+        'utilisateurs': User.objects.count(),
+    }
+    for statut in ('brouillon', 'en_attente', 'publie', 'archive'):
+        values[f'articles.statut.{statut}'] = 0
+    for statut, total in Article.objects.values_list('statut').annotate(total=Count('id')).order_by():
+        values[f'articles.statut.{statut}'] = total
+    for categorie_id, total in Categorie.objects.values_list('id').annotate(total=Count('articles')).order_by():
+        values[f'articles.categorie.{categorie_id}'] = total
+    feedbacks = Feedback.objects.aggregate(total=Count('id'), somme=Sum('note'))
+    values['feedbacks'] = feedbacks['total']
+    values['feedbacks.somme_notes'] = feedbacks['somme'] or 0
+    Statistique.objects.bulk_create([Statistique(cle=cle, valeur=valeur) for cle, valeur in values.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baseconnaissance', '0006_article_embedding_hash_solution_embedding_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Statistique',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=100, unique=True)),
+                ('valeur', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(initialiser_statistiques, migrations.RunPython.noop),
+    ]
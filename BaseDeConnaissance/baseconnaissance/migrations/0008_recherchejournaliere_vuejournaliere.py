@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baseconnaissance', '0007_statistique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RechercheJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('terme', models.CharField(max_length=255)),
+                ('nb_recherches', models.PositiveIntegerField(default=0)),
+                ('nb_sans_resultat', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('jour', 'terme'), name='recherche_journaliere_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VueJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('nb_vues', models.PositiveIntegerField(default=0)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vues_journalieres', to='baseconnaissance.article')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('jour', 'article'), name='vue_journaliere_unique')],
+            },
+        ),
+    ]
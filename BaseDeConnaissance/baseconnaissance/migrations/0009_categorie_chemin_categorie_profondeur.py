@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+def calculer_chemins(apps, schema_editor):
+    Categorie = apps.get_model('baseconnaissance', 'Categorie')
+    categories = list(Categorie.objects.all())
+    enfants = {}
+    for categorie in categories:
+        enfants.setdefault(categorie.parent_id, []).append(categorie)
+    pile = [(categorie, '', 0) for categorie in enfants.get(None, [])]
+    while pile:
+        categorie, chemin_parent, profondeur = pile.pop()
+        categorie.chemin = f'{chemin_parent}{categorie.pk}/'
+        categorie.profondeur = profondeur
+        pile.extend((enfant, categorie.chemin, profondeur + 1) for enfant in enfants.get(categorie.pk, []))
+    Categorie.objects.bulk_update(categories, ['chemin', 'profondeur'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baseconnaissance', '0008_recherchejournaliere_vuejournaliere'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categorie',
+            name='chemin',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='categorie',
+            name='profondeur',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(calculer_chemins, migrations.RunPython.noop),
+    ]
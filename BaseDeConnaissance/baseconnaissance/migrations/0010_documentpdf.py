@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS_TABLE = 'baseconnaissance_article_fts'
+
+
+def recreate_fts_index(columns, select):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"{columns}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) "
+            f"SELECT {select} FROM baseconnaissance_article WHERE statut = 'publie'"
+        )
+    return operation
+
+
+# Colonne « pdf » ajoutée à l'index plein texte (vide tant qu'aucun PDF n'est extrait)
+add_pdf_column = recreate_fts_index('titre, contenu, pdf', 'id, titre, contenu, NULL')
+remove_pdf_column = recreate_fts_index('titre, contenu', 'id, titre, contenu')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baseconnaissance', '0009_categorie_chemin_categorie_profondeur'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentPdf',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('empreinte', models.CharField(max_length=64, unique=True)),
+                ('statut', models.CharField(choices=[('en_cours', 'Extraction en cours'), ('extrait', 'Extrait'), ('erreur', 'Erreur')], default='en_cours', max_length=20)),
+                ('nb_pages', models.PositiveIntegerField(default=0)),
+                ('pages_extraites', models.PositiveIntegerField(default=0)),
+                ('erreur', models.TextField(blank=True, default='')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='document_pdf',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='articles', to='baseconnaissance.documentpdf'),
+        ),
+        migrations.CreateModel(
+            name='PassagePdf',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page', models.PositiveIntegerField()),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('texte', models.TextField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='passages', to='baseconnaissance.documentpdf')),
+            ],
+            options={
+                'ordering': ['document', 'page', 'position'],
+                'constraints': [models.UniqueConstraint(fields=('document', 'page', 'position'), name='passage_pdf_unique')],
+            },
+        ),
+        migrations.RunPython(add_pdf_column, remove_pdf_column),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baseconnaissance', '0010_documentpdf'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Revision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('titre', models.CharField(max_length=200)),
+                ('est_instantane', models.BooleanField(default=False)),
+                ('profondeur', models.PositiveSmallIntegerField(default=0)),
+                ('donnees', models.BinaryField()),
+                ('taille', models.PositiveIntegerField(default=0)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='baseconnaissance.article')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('article', 'version'), name='revision_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baseconnaissance', '0011_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='avatar_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
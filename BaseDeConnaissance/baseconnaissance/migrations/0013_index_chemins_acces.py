@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baseconnaissance', '0012_profile_avatar_variantes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adminnote',
+            index=models.Index(fields=['user', 'date_creation'], name='admin_note_user_date'),
+        ),
+        migrations.AddIndex(
+            model_name='adminnote',
+            index=models.Index(condition=models.Q(('est_vu', False)), fields=['user'], name='admin_note_non_vue'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['statut', 'vues'], name='article_statut_vues'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['statut', 'date_creation'], name='article_statut_date'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['auteur', 'statut', 'vues'], name='article_auteur_statut_vues'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['auteur', 'date_creation'], name='article_auteur_date'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['date_creation'], name='article_date'),
+        ),
+        migrations.AddIndex(
+            model_name='articlevue',
+            index=models.Index(fields=['date_vue'], name='article_vue_date'),
+        ),
+        migrations.AddIndex(
+            model_name='commentaire',
+            index=models.Index(fields=['article', 'date_creation'], name='commentaire_article_date'),
+        ),
+        migrations.AddIndex(
+            model_name='recherche',
+            index=models.Index(fields=['date_recherche'], name='recherche_date'),
+        ),
+        migrations.AddIndex(
+            model_name='solution',
+            index=models.Index(fields=['statut', 'article', 'date_creation'], name='solution_statut_article'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:38
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def calculer_compteurs(apps, schema_editor):
+    Article = apps.get_model('baseconnaissance', 'Article')
+    Solution = apps.get_model('baseconnaissance', 'Solution')
+    Commentaire = apps.get_model('baseconnaissance', 'Commentaire')
+    Feedback = apps.get_model('baseconnaissance', 'Feedback')
+    valeurs = {}
+    champs = {'valide': 'nb_solutions_validees', 'en_attente': 'nb_solutions_en_attente'}
+    for article_id, statut, total in (Solution.objects.filter(statut__in=champs).values_list('article_id', 'statut')
+                                      .annotate(total=Count('id')).order_by()):
+        valeurs.setdefault(article_id, {})[champs[statut]] = total
+    for article_id, total in Commentaire.objects.values_list('article_id').annotate(total=Count('id')).order_by():
+        valeurs.setdefault(article_id, {})['nb_commentaires'] = total
+    for article_id, total, somme in (Feedback.objects.values_list('article_id')
+                                     .annotate(total=Count('id'), somme=Sum('note')).order_by()):
+        valeurs.setdefault(article_id, {}).update(nb_feedbacks=total, somme_notes=somme or 0)
+    articles = list(Article.objects.filter(pk__in=valeurs).only('id'))
+    for article in articles:
+        for champ, valeur in valeurs[article.pk].items():
+            setattr(article, champ, valeur)
+    Article.objects.bulk_update(articles, [
+        'nb_solutions_validees', 'nb_solutions_en_attente', 'nb_commentaires', 'nb_feedbacks', 'somme_notes',
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baseconnaissance', '0013_index_chemins_acces'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='nb_commentaires',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='nb_feedbacks',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='nb_solutions_en_attente',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='nb_solutions_validees',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='somme_notes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(calculer_compteurs, migrations.RunPython.noop),
+    ]
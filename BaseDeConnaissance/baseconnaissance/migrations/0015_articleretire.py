@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baseconnaissance', '0014_compteurs_article'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleRetire',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('article_id', models.PositiveIntegerField(unique=True)),
+                ('date_retrait', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['statut', 'date_modification'], name='article_statut_modif'),
+        ),
+    ]
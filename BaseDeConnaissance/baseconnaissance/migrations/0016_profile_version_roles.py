@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baseconnaissance', '0015_articleretire'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='version_roles',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
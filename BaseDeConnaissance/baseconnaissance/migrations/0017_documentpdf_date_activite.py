@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('baseconnaissance', '0016_profile_version_roles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentpdf',
+            name='date_activite',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
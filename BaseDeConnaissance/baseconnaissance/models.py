@@ -1,16 +1,64 @@
-from django.db import models
-from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.core.exceptions import ValidationError
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
 
+class TrackedFieldsMixin:
+    """Mémorise les valeurs lues en base pour détecter les changements à la sauvegarde.
+
+    Les receivers post_save voient encore les anciennes valeurs via
+    ``initial_value()`` ; elles sont rafraîchies une fois la sauvegarde terminée,
+    ainsi qu'après ``refresh_from_db()`` pour les champs relus.
+    Pour un fichier, c'est le nom (comme en base) : le FieldFile est modifié sur place.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def initial_value(self, attname, default=None):
+        return getattr(self, '_loaded_values', {}).get(attname, default)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = self._current_values()
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using, fields, **kwargs)
+        valeurs = self._current_values(fields)
+        self._loaded_values = {**getattr(self, '_loaded_values', {}), **valeurs} if fields else valeurs
+
+    def _current_values(self, fields=None):
+        deferred = self.get_deferred_fields()
+        return {
+            field.attname: field.value_to_string(self) if isinstance(field, models.FileField)
+            else getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred and (fields is None or {field.name, field.attname} & set(fields))
+        }
+
+
 class Categorie(models.Model):
     nom = models.CharField(max_length=100)
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='sous_categories')
+    # Chemin matérialisé « <id racine>/…/<id>/ » tenu à jour par les signaux (utils/category_tree.py)
+    chemin = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True)
+    profondeur = models.PositiveSmallIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.nom
 
-class Article(models.Model):
+    def clean(self):
+        from .utils import category_tree
+        if category_tree.creates_cycle(self):
+            raise ValidationError({
+                'parent': "Une catégorie ne peut pas être placée sous elle-même ni sous l'une de ses sous-catégories.",
+            })
+
+class Article(TrackedFieldsMixin, models.Model):
     STATUT_CHOIX = [
         ('brouillon', 'Brouillon'),
         ('en_attente', 'En attente de validation'),
@@ -26,12 +74,42 @@ class Article(models.Model):
     statut = models.CharField(max_length=20, choices=STATUT_CHOIX, default='brouillon')
     version = models.IntegerField(default=1)
     fichier_pdf = models.FileField(upload_to='articles/', null=True, blank=True)
+    # Texte extrait de fichier_pdf, partagé entre fichiers identiques (voir utils/pdf_text.py)
+    document_pdf = models.ForeignKey('DocumentPdf', null=True, blank=True, on_delete=models.SET_NULL,
+                                     editable=False, related_name='articles')
     vues = models.IntegerField(default=0)
+    # Empreinte du texte indexé dans l'index vectoriel (voir utils/embedding_pipeline)
+    embedding_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    # Compteurs dénormalisés tenus à jour par les signaux (voir utils/engagement.py)
+    nb_solutions_validees = models.PositiveIntegerField(default=0, editable=False)
+    nb_solutions_en_attente = models.PositiveIntegerField(default=0, editable=False)
+    nb_commentaires = models.PositiveIntegerField(default=0, editable=False)
+    nb_feedbacks = models.PositiveIntegerField(default=0, editable=False)
+    somme_notes = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        # Chemins d'accès des listes : tri par date ou par vues, filtré par statut
+        # et/ou auteur (vérifiés par EXPLAIN QUERY PLAN dans tests.py). Colonnes
+        # en ordre croissant : parcouru à l'envers, l'index donne aussi l'ordre
+        # (date_creation, id) décroissant de keyset_page, sans tri temporaire.
+        indexes = [
+            models.Index(fields=['statut', 'vues'], name='article_statut_vues'),
+            models.Index(fields=['statut', 'date_creation'], name='article_statut_date'),
+            models.Index(fields=['auteur', 'statut', 'vues'], name='article_auteur_statut_vues'),
+            models.Index(fields=['auteur', 'date_creation'], name='article_auteur_date'),
+            models.Index(fields=['date_creation'], name='article_date'),
+            # Synchronisation incrémentale de l'API (``api/modifications/``)
+            models.Index(fields=['statut', 'date_modification'], name='article_statut_modif'),
+        ]
 
     def __str__(self):
         return self.titre
 
-class Solution(models.Model):
+    @property
+    def note_moyenne(self):
+        return round(self.somme_notes / self.nb_feedbacks, 1) if self.nb_feedbacks else None
+
+class Solution(TrackedFieldsMixin, models.Model):
     STATUT_CHOIX = [
         ("en_attente", "En attente de validation"),
         ("valide", "Validée"),
@@ -42,6 +120,13 @@ class Solution(models.Model):
     auteur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     statut = models.CharField(max_length=20, choices=STATUT_CHOIX, default="en_attente")
     date_creation = models.DateTimeField(auto_now_add=True)
+    embedding_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            # Solutions validées d'un article, et file de modération (statut seul)
+            models.Index(fields=['statut', 'article', 'date_creation'], name='solution_statut_article'),
+        ]
 
     def __str__(self):
         return f"Solution pour {self.article.titre} ({self.statut})"
@@ -51,6 +136,10 @@ class ArticleVue(models.Model):
     utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     date_vue = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Agrégation journalière et purge par intervalle de dates (utils/rollups.py)
+        indexes = [models.Index(fields=['date_vue'], name='article_vue_date')]
     
     def __str__(self):
         return f"Vue de {self.article.titre} le {self.date_vue}"
@@ -61,6 +150,9 @@ class Commentaire(models.Model):
     contenu = models.TextField()
     date_creation = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['article', 'date_creation'], name='commentaire_article_date')]
+
     def __str__(self):
         return f"Commentaire sur {self.article.titre} par {self.auteur or 'Anonyme'}"
 
@@ -70,11 +162,14 @@ class Recherche(models.Model):
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     date_recherche = models.DateTimeField(auto_now_add=True)
     resultats_trouves = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['date_recherche'], name='recherche_date')]
     
     def __str__(self):
         return f"Recherche: {self.terme} ({self.resultats_trouves} résultats)"
 
-class Feedback(models.Model):
+class Feedback(TrackedFieldsMixin, models.Model):
     article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='feedbacks')
     utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     note = models.IntegerField(choices=[(i, i) for i in range(1, 6)])  # 1-5 étoiles
@@ -84,14 +179,130 @@ class Feedback(models.Model):
     def __str__(self):
         return f"Feedback {self.note}/5 sur {self.article.titre}"
 
-class Profile(models.Model):
+class Profile(TrackedFieldsMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    # {'<taille>.<format>': nom du fichier} généré après téléversement (voir utils/avatars.py)
+    avatar_variantes = models.JSONField(default=dict, blank=True, editable=False)
+    # Incrémentée quand les groupes de l'utilisateur changent : clé du cache des rôles (voir utils/roles.py)
+    version_roles = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"Profil de {self.user.username}"
 
 
+class Revision(models.Model):
+    """Version d'un article : texte complet compressé (instantané) ou delta avec la précédente.
+
+    ``profondeur`` est le nombre de deltas depuis le dernier instantané ; la
+    reconstruction d'une version applique au plus SNAPSHOT_INTERVAL - 1 deltas
+    (voir utils/revisions.py).
+    """
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='revisions')
+    version = models.PositiveIntegerField()
+    titre = models.CharField(max_length=200)
+    est_instantane = models.BooleanField(default=False)
+    profondeur = models.PositiveSmallIntegerField(default=0)
+    donnees = models.BinaryField()
+    taille = models.PositiveIntegerField(default=0)
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'version'], name='revision_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.article_id} v{self.version}"
+
+
+class DocumentPdf(models.Model):
+    """Texte extrait d'un PDF, identifié par l'empreinte SHA-256 du fichier."""
+    STATUT_CHOIX = [
+        ('en_cours', 'Extraction en cours'),
+        ('extrait', 'Extrait'),
+        ('erreur', 'Erreur'),
+    ]
+    empreinte = models.CharField(max_length=64, unique=True)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOIX, default='en_cours')
+    nb_pages = models.PositiveIntegerField(default=0)
+    pages_extraites = models.PositiveIntegerField(default=0)
+    erreur = models.TextField(blank=True, default='')
+    date_creation = models.DateTimeField(auto_now_add=True)
+    # Début de l'extraction puis dernier lot de pages écrit : une extraction « en cours »
+    # sans activité depuis PDF_EXTRACTION['STALE_AFTER'] secondes est reprise (utils/pdf_text.py)
+    date_activite = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"PDF {self.empreinte[:12]} ({self.pages_extraites}/{self.nb_pages} pages)"
+
+
+class PassagePdf(models.Model):
+    """Passage de texte d'une page ; une page longue est découpée en plusieurs passages."""
+    document = models.ForeignKey(DocumentPdf, on_delete=models.CASCADE, related_name='passages')
+    page = models.PositiveIntegerField()
+    position = models.PositiveSmallIntegerField(default=0)
+    texte = models.TextField()
+
+    class Meta:
+        ordering = ['document', 'page', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'page', 'position'], name='passage_pdf_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.document_id} p.{self.page + 1} #{self.position}"
+
+
+class ArticleRetire(models.Model):
+    """Article publié puis supprimé ou dépublié, signalé aux clients de ``api/modifications/``."""
+    article_id = models.PositiveIntegerField(unique=True)
+    date_retrait = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Article #{self.article_id} retiré le {self.date_retrait}"
+
+
+class VueJournaliere(models.Model):
+    """Nombre de consultations d'un article sur une journée (agrégat d'ArticleVue)."""
+    jour = models.DateField()
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='vues_journalieres')
+    nb_vues = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['jour', 'article'], name='vue_journaliere_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.article_id} le {self.jour} : {self.nb_vues} vues"
+
+
+class RechercheJournaliere(models.Model):
+    """Recherches d'un terme normalisé sur une journée (agrégat de Recherche)."""
+    jour = models.DateField()
+    terme = models.CharField(max_length=255)
+    nb_recherches = models.PositiveIntegerField(default=0)
+    nb_sans_resultat = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['jour', 'terme'], name='recherche_journaliere_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.terme} le {self.jour} : {self.nb_recherches} recherches"
+
+
+class Statistique(models.Model):
+    """Compteur pré-agrégé lu par le tableau de bord (voir utils/stats.py)."""
+    cle = models.CharField(max_length=100, unique=True)
+    valeur = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.cle} = {self.valeur}"
+
+
 class AdminNote(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='admin_notes')
     contenu = models.TextField()
@@ -100,6 +311,11 @@ class AdminNote(models.Model):
 
     class Meta:
         ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['user', 'date_creation'], name='admin_note_user_date'),
+            # Compteur des notes non lues affiché sur chaque page d'accueil
+            models.Index(fields=['user'], condition=models.Q(est_vu=False), name='admin_note_non_vue'),
+        ]
 
     def __str__(self):
         return f"Note admin pour {self.user.username} - {'vue' if self.est_vu else 'non vue'}"
@@ -112,3 +328,197 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
     else:
         # Ensure profile exists for existing users
         Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Article)
+def update_article_search_index(sender, instance, **kwargs):
+    from .utils import search_index
+    search_index.index_article(instance)
+
+
+@receiver(post_delete, sender=Article)
+def remove_article_from_search_index(sender, instance, **kwargs):
+    from .utils import search_index
+    search_index.remove_article(instance.pk)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def sync_article_embedding(sender, instance, created=False, **kwargs):
+    from .utils import embedding_pipeline
+    pk = instance.pk
+    transaction.on_commit(lambda: embedding_pipeline.schedule_sync('articles', pk))
+    # Le texte indexé d'une solution commence par le titre de son article
+    if not created and 'titre' in getattr(instance, '_loaded_values', {}) \
+            and instance.titre != instance.initial_value('titre'):
+        transaction.on_commit(lambda: embedding_pipeline.schedule_solutions_sync(pk))
+
+
+@receiver(post_save, sender=Solution)
+@receiver(post_delete, sender=Solution)
+def sync_solution_embedding(sender, instance, **kwargs):
+    from .utils import embedding_pipeline
+    pk = instance.pk
+    transaction.on_commit(lambda: embedding_pipeline.schedule_sync('solutions', pk))
+
+
+@receiver(post_save, sender=Article)
+def update_article_statistics(sender, instance, created, **kwargs):
+    from .utils import stats
+    stats.article_saved(instance, created)
+
+
+@receiver(post_delete, sender=Article)
+def remove_article_statistics(sender, instance, **kwargs):
+    from .utils import stats
+    stats.article_deleted(instance)
+
+
+@receiver(post_save, sender=Categorie)
+@receiver(post_save, sender=User)
+def count_created_object(sender, instance, created, **kwargs):
+    from .utils import stats
+    if created:
+        stats.adjust({stats.MODEL_KEYS[sender]: 1})
+
+
+@receiver(post_delete, sender=Categorie)
+@receiver(post_delete, sender=User)
+def count_deleted_object(sender, instance, **kwargs):
+    from .utils import stats
+    stats.adjust({stats.MODEL_KEYS[sender]: -1})
+    if sender is Categorie:
+        stats.forget(stats.categorie_key(instance.pk))
+
+
+@receiver(post_save, sender=Solution)
+@receiver(post_save, sender=Commentaire)
+@receiver(post_save, sender=Feedback)
+def update_article_counters(sender, instance, created, **kwargs):
+    from .utils import engagement
+    engagement.child_saved(instance, created)
+
+
+@receiver(post_delete, sender=Solution)
+@receiver(post_delete, sender=Commentaire)
+@receiver(post_delete, sender=Feedback)
+def remove_from_article_counters(sender, instance, **kwargs):
+    from .utils import engagement
+    engagement.child_deleted(instance, kwargs.get('origin'))
+
+
+@receiver(post_save, sender=Feedback)
+def update_feedback_statistics(sender, instance, created, **kwargs):
+    from .utils import stats
+    stats.feedback_saved(instance, created)
+
+
+@receiver(post_delete, sender=Feedback)
+def remove_feedback_statistics(sender, instance, **kwargs):
+    from .utils import stats
+    stats.adjust({'feedbacks': -1, 'feedbacks.somme_notes': -instance.note})
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_user_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    from .utils import roles
+    if not reverse:
+        # user.groups.add/remove/clear : une seule entrée à invalider
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            roles.invalidate([instance.pk])
+    elif action == 'pre_clear':
+        # group.user_set.clear() : pk_set est vide, les membres sont lus avant suppression
+        instance._cleared_user_ids = roles.group_member_ids(instance)
+    elif action == 'post_clear':
+        roles.invalidate(getattr(instance, '_cleared_user_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        roles.invalidate(pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group_roles(sender, instance, created=False, **kwargs):
+    from .utils import roles
+    if not created:
+        roles.invalidate(roles.group_member_ids(instance))
+
+
+@receiver(post_save, sender=Article)
+def track_article_publication(sender, instance, created, **kwargs):
+    from .utils import article_sync
+    article_sync.article_saved(instance, created)
+
+
+@receiver(post_delete, sender=Article)
+def record_article_removal(sender, instance, **kwargs):
+    from .utils import article_sync
+    article_sync.article_deleted(instance)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def invalidate_article_pages(sender, instance, **kwargs):
+    from .utils import page_cache
+    page_cache.article_saved(instance)
+
+
+@receiver(post_save, sender=Solution)
+@receiver(post_delete, sender=Solution)
+@receiver(post_save, sender=Commentaire)
+@receiver(post_delete, sender=Commentaire)
+def invalidate_article_page_children(sender, instance, **kwargs):
+    from .utils import page_cache
+    page_cache.bump(f'article:{instance.article_id}')
+
+
+@receiver(pre_save, sender=Categorie)
+def check_category_parent(sender, instance, raw=False, **kwargs):
+    from .utils import category_tree
+    if not raw:
+        category_tree.check_parent(instance)
+
+
+@receiver(post_save, sender=Categorie)
+def update_category_tree(sender, instance, raw=False, **kwargs):
+    from .utils import category_tree
+    if not raw:
+        category_tree.categorie_saved(instance)
+
+
+@receiver(post_delete, sender=Categorie)
+def remove_category_from_tree(sender, instance, **kwargs):
+    from .utils import category_tree
+    category_tree.categorie_deleted(instance)
+
+
+@receiver(post_save, sender=Article)
+def update_article_suggestions(sender, instance, **kwargs):
+    from .utils import suggestions
+    suggestions.article_saved(instance)
+
+
+@receiver(post_delete, sender=Article)
+def remove_article_suggestions(sender, instance, **kwargs):
+    from .utils import suggestions
+    suggestions.article_deleted(instance)
+
+
+@receiver(post_save, sender=Article)
+def schedule_pdf_extraction(sender, instance, created, raw=False, **kwargs):
+    from .utils import pdf_text
+    if not raw:
+        pdf_text.article_saved(instance, created)
+
+
+@receiver(post_save, sender=Article)
+def record_article_revision(sender, instance, created, raw=False, **kwargs):
+    from .utils import revisions
+    if not raw:
+        revisions.article_saved(instance, created)
+
+
+@receiver(post_save, sender=Profile)
+def schedule_avatar_variants(sender, instance, raw=False, **kwargs):
+    from .utils import avatars
+    if not raw:
+        avatars.profile_saved(instance)
@@ -0,0 +1,69 @@
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Lectures forcées sur la base principale pour la requête en cours :
+# session épinglée par ReadYourWritesMiddleware, ou écriture déjà faite
+_pinned = contextvars.ContextVar('db_pinned', default=False)
+_wrote = contextvars.ContextVar('db_wrote', default=False)
+
+
+def _options():
+    return getattr(settings, 'DATABASE_ROUTING', {})
+
+
+def read_aliases():
+    # Un alias qui ouvre la base principale elle-même (miroir de test) est ignoré :
+    # il ne verrait pas les écritures non validées de la connexion principale
+    primary = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+    return [
+        alias for alias in _options().get('READ_ALIASES', [])
+        if alias in settings.DATABASES and connections[alias].settings_dict['NAME'] != primary
+    ]
+
+
+def begin_request(pinned):
+    """Initialise l'état de la requête ; retourne les jetons à passer à ``end_request``."""
+    return _pinned.set(pinned), _wrote.set(False)
+
+
+def end_request(tokens):
+    """Retourne True si la requête a écrit, et restaure l'état précédent."""
+    wrote = _wrote.get()
+    pinned_token, wrote_token = tokens
+    _pinned.reset(pinned_token)
+    _wrote.reset(wrote_token)
+    return wrote
+
+
+class PrimaryReplicaRouter:
+    """Écritures sur la base principale, lectures réparties sur READ_ALIASES.
+
+    Une lecture reste sur la base principale dans une transaction ouverte
+    (elle doit voir ses propres écritures), après une écriture dans la même
+    requête, et pour une session épinglée par ReadYourWritesMiddleware.
+    """
+
+    def db_for_read(self, model, **hints):
+        aliases = read_aliases()
+        if not aliases or _pinned.get() or _wrote.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas et base principale portent les mêmes données
+        pool = {DEFAULT_DB_ALIAS, *read_aliases()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in read_aliases():
+            return False
+        return None
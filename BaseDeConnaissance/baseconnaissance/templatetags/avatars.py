@@ -0,0 +1,20 @@
+from django import template
+
+from baseconnaissance.utils import avatars
+
+register = template.Library()
+
+
+@register.simple_tag
+def avatar_url(profile, size, format_='webp'):
+    """{% avatar_url user.profile 36 %} : variante adaptée à un affichage de ``size`` pixels."""
+    return avatars.variant_url(profile, size, format_)
+
+
+@register.simple_tag
+def avatar_srcset(profile, size, format_='webp'):
+    """Variantes 1x et 2x pour l'attribut ``srcset``."""
+    if profile is None or not profile.avatar:
+        return ''
+    return (f"{avatars.variant_url(profile, size, format_)} 1x, "
+            f"{avatars.variant_url(profile, 2 * size, format_)} 2x")
@@ -1,3 +1,1327 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.contrib.auth.models import AnonymousUser, Group, User
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from BaseDeConnaissance import settings as project_settings, views as project_views
+from .models import (
+    AdminNote, Article, ArticleVue, Categorie, Commentaire, DocumentPdf, Feedback, Recherche, RechercheJournaliere,
+    Revision, Solution, Statistique, VueJournaliere,
+)
+from . import middleware, routers
+from .backends import ProfileModelBackend
+from .utils import (
+    ai, article_io, avatars, embedding_pipeline, engagement, image_worker, category_tree, page_cache, pdf_text,
+    revisions, roles, rollups, search_index, stats, suggestions, vector_store,
+)
+from .utils.ai_cache import AnswerCache, MemoryBackend, SQLiteBackend
+from .utils.background import PeriodicFlusher
+from .utils.search_log import SearchLogWriter
+from .utils.view_tracking import ViewTracker
+from .utils.pagination import InvalidCursor, encode_cursor, keyset_page
+
+
+def _cache_temporaire(test):
+    """Cache fichier vide propre au test, pour ne pas vider ni remplir BASE_DIR/cache."""
+    directory = test.enterContext(tempfile.TemporaryDirectory())
+    test.enterContext(override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+    }}))
+
+
+class QueryPlanTests(TestCase):
+    """Les requêtes des pages les plus consultées doivent rester indexées.
+
+    Chaque requête est passée à EXPLAIN QUERY PLAN : un parcours complet de
+    table (« SCAN <table> » sans index) ou un tri temporaire pour une requête
+    triée signale un index manquant ou devenu inutilisable.
+    """
+    def assertIndexed(self, queryset, ordered=False):
+        plan = queryset.explain()
+        full_scan = re.search(r'\bSCAN (\w+)$', plan, re.MULTILINE)
+        self.assertIsNone(full_scan, f"Parcours complet de table :\n{plan}\n{queryset.query}")
+        if ordered:
+            self.assertNotIn('TEMP B-TREE', plan, f"Tri sans index :\n{plan}\n{queryset.query}")
+
+    def test_articles_publies(self):
+        # Tableau de bord administrateur et page d'accueil
+        self.assertIndexed(Article.objects.filter(statut='publie').order_by('-vues')[:5], ordered=True)
+        self.assertIndexed(Article.objects.filter(statut='publie').order_by('-date_creation')[:4], ordered=True)
+        self.assertIndexed(Article.objects.order_by('-date_creation')[:5], ordered=True)
+
+    def test_articles_par_auteur(self):
+        # Tableau de bord rédacteur et « mes articles »
+        mes_articles = Article.objects.filter(auteur_id=1)
+        self.assertIndexed(mes_articles.order_by('-date_creation'), ordered=True)
+        self.assertIndexed(mes_articles.filter(statut='en_attente'))
+        self.assertIndexed(mes_articles.filter(statut='publie').order_by('-vues')[:5], ordered=True)
+
+    def test_file_de_moderation(self):
+        # Ordre (date_creation, id) décroissant de keyset_page
+        self.assertIndexed(Article.objects.filter(statut='en_attente').order_by('-date_creation', '-id')[:21],
+                           ordered=True)
+        self.assertIndexed(Solution.objects.filter(statut='en_attente').values('article_id'))
+
+    def test_detail_article(self):
+        self.assertIndexed(Solution.objects.filter(article_id=1, statut='valide').order_by('-date_creation', '-id')[:11],
+                           ordered=True)
+        self.assertIndexed(Commentaire.objects.filter(article_id=1).order_by('-date_creation', '-id')[:20],
+                           ordered=True)
+
+    def test_synchronisation_api(self):
+        # api/modifications/ : ordre (date_modification, id) croissant
+        depuis = timezone.now() - timedelta(days=1)
+        self.assertIndexed(Article.objects.filter(statut='publie', date_modification__gt=depuis)
+                           .order_by('date_modification', 'id')[:501], ordered=True)
+
+    def test_journaux(self):
+        debut = timezone.now() - timedelta(days=7)
+        self.assertIndexed(Recherche.objects.filter(resultats_trouves=0, date_recherche__gte=debut))
+        self.assertIndexed(Recherche.objects.filter(date_recherche__gte=debut, date_recherche__lt=timezone.now()))
+        self.assertIndexed(ArticleVue.objects.filter(date_vue__gte=debut, date_vue__lt=timezone.now()))
+
+    def test_notes_administrateur(self):
+        self.assertIndexed(AdminNote.objects.filter(user_id=1, est_vu=False))
+        self.assertIndexed(AdminNote.objects.filter(user_id=1).order_by('-date_creation')[:10], ordered=True)
+
+
+# Curseurs falsifiés : date impossible, identifiant non entier, base64 ou JSON invalides
+CURSEURS_INVALIDES = [
+    encode_cursor('2024-13-45T00:00:00', 1),
+    encode_cursor('2024-01-01T00:00:00', 'x'),
+    encode_cursor('2024-01-01T00:00:00', [1]),
+    encode_cursor('2024-01-01T00:00:00', True),
+    encode_cursor('pas une date', 1),
+    encode_cursor('2024-01-01T00:00:00'),
+    'pas-du-base64!',
+    'e30',
+]
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        self.auteur = User.objects.create_user('auteur', password='secret')
+        self.categorie = Categorie.objects.create(nom='Réseau')
+        self.articles = [
+            Article.objects.create(titre=f'Article {i}', contenu='...', auteur=self.auteur, categorie=self.categorie,
+                                   statut='en_attente')
+            for i in range(5)
+        ]
+
+    def test_parcours_complet(self):
+        vus, apres = [], None
+        while True:
+            page, apres = keyset_page(Article.objects.all(), apres, 2)
+            vus += [article.pk for article in page]
+            if apres is None:
+                break
+        self.assertEqual(vus, sorted((article.pk for article in self.articles), reverse=True))
+
+    def test_curseur_invalide(self):
+        for curseur in CURSEURS_INVALIDES:
+            with self.subTest(curseur=curseur), self.assertRaises(InvalidCursor):
+                keyset_page(Article.objects.all(), curseur, 2)
+
+    def test_file_de_moderation_curseur_invalide(self):
+        self.client.force_login(self.auteur)
+        url = reverse('articles_a_valider')
+        for curseur in CURSEURS_INVALIDES:
+            with self.subTest(curseur=curseur):
+                self.assertEqual(self.client.get(url, {'apres': curseur}).status_code, 400)
+        _, apres = keyset_page(Article.objects.all(), None, 2)
+        self.assertEqual(self.client.get(url, {'apres': apres}).status_code, 200)
+
+    def test_pages_article_curseur_invalide(self):
+        # Points d'accès publics du chargement progressif (commentaires, solutions)
+        article = self.articles[0]
+        article.statut = 'publie'
+        article.save()
+        for i in range(3):
+            Commentaire.objects.create(article=article, auteur=self.auteur, contenu=f'Commentaire {i}')
+        for nom in ('article_commentaires', 'article_solutions'):
+            url = reverse(nom, args=[article.pk])
+            for curseur in CURSEURS_INVALIDES:
+                with self.subTest(url=url, curseur=curseur):
+                    self.assertEqual(self.client.get(url, {'apres': curseur}).status_code, 400)
+        _, apres = keyset_page(Commentaire.objects.filter(article=article), None, 1)
+        response = self.client.get(reverse('article_commentaires', args=[article.pk]), {'apres': apres})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Commentaire 1', response.json()['html'])
+
+
+@override_settings(API={'PAGE_SIZE': 3, 'SYNC_BATCH_SIZE': 4, 'SYNC_MARGIN': 0})
+class ApiTests(TestCase):
+    def setUp(self):
+        _cache_temporaire(self)
+        self.auteur = User.objects.create_user('auteur', email='auteur@example.com', password='secret')
+        self.categorie = Categorie.objects.create(nom='Imprimantes')
+        self.articles = [
+            Article.objects.create(titre=f'Article {i}', contenu='Imprimante bloquée. ' * 20, auteur=self.auteur,
+                                   categorie=self.categorie, statut='publie')
+            for i in range(5)
+        ]
+
+    def test_get_conditionnel(self):
+        article = self.articles[0]
+        url = reverse('api_article', args=[article.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        article.contenu = 'Redémarrer le spouleur.'
+        article.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        liste = self.client.get(reverse('api_articles'))
+        self.assertEqual(self.client.get(reverse('api_articles'), HTTP_IF_NONE_MATCH=liste['ETag']).status_code, 304)
+
+    def test_selection_des_champs(self):
+        article = self.articles[0]
+        response = self.client.get(reverse('api_article', args=[article.pk]), {'fields': 'titre,url'})
+        self.assertEqual(response.json(), {'titre': 'Article 0', 'url': reverse('article_detail', args=[article.pk])})
+        # Liste par défaut : sans le contenu
+        self.assertNotIn('contenu', self.client.get(reverse('api_articles')).json()['articles'][0])
+        urls = [reverse('api_article', args=[article.pk]), reverse('api_articles'), reverse('api_modifications')]
+        # Champs inconnus ou privés : jamais lus en base
+        for fields in ('titre,inconnu', 'statut', 'auteur__email', 'auteur__password', 'vues', ','):
+            for url in urls:
+                with self.subTest(url=url, fields=fields):
+                    response = self.client.get(url, {'fields': fields})
+                    self.assertEqual(response.status_code, 400)
+                    self.assertNotIn(b'auteur@example.com', response.content)
+
+    def test_modifications_depuis(self):
+        modifie, retire, supprime = self.articles[:3]
+        depuis = timezone.now()
+        modifie.titre = 'Article modifié'
+        modifie.save()
+        retire.statut = 'archive'
+        retire.save()
+        supprime_id = supprime.pk
+        supprime.delete()
+        response = self.client.get(reverse('api_modifications'), {'depuis': depuis.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([ligne['id'] for ligne in data['articles']], [modifie.pk])
+        self.assertEqual(data['articles'][0]['titre'], 'Article modifié')
+        self.assertCountEqual(data['retires'], [retire.pk, supprime_id])
+        self.assertTrue(data['complet'])
+
+        # Reprise au curseur : plus rien de nouveau
+        data = self.client.get(reverse('api_modifications'), {'curseur': data['curseur']}).json()
+        self.assertEqual((data['articles'], data['retires']), ([], []))
+
+    def test_synchronisation_complete_par_lots(self):
+        vus, curseur = set(), None
+        for _ in range(len(self.articles)):
+            data = self.client.get(reverse('api_modifications'), {'curseur': curseur} if curseur else {}).json()
+            vus.update(ligne['id'] for ligne in data['articles'])
+            curseur = data['curseur']
+            if data['complet']:
+                break
+        self.assertEqual(vus, {article.pk for article in self.articles})
+
+    def test_parametres_invalides(self):
+        for params in ({'depuis': '2024-99-99'}, {'depuis': '2024-13-45T00:00:00'}, {'depuis': 'hier'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('api_modifications'), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('erreur', response.json())
+        for curseur in CURSEURS_INVALIDES:
+            with self.subTest(curseur=curseur):
+                self.assertEqual(self.client.get(reverse('api_modifications'), {'curseur': curseur}).status_code, 400)
+                self.assertEqual(self.client.get(reverse('api_articles'), {'apres': curseur}).status_code, 400)
+
+
+class AnswerCacheTests(TestCase):
+    def setUp(self):
+        _cache_temporaire(self)
+        auteur = User.objects.create_user('auteur')
+        self.article = Article.objects.create(titre='VPN', contenu='...', auteur=auteur,
+                                              categorie=Categorie.objects.create(nom='Réseau'), statut='publie')
+        self.cache = AnswerCache(MemoryBackend())
+
+    def test_question_normalisee(self):
+        self.cache.set('Comment configurer le VPN ?', 'Réponse', [self.article])
+        self.assertEqual(self.cache.get('comment  CONFIGURER vpn', [self.article]), 'Réponse')
+        self.assertIsNone(self.cache.get('comment configurer vpn', [self.article], model='autre'))
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_contexte_modifie(self):
+        self.cache.set('vpn', 'Réponse', [self.article])
+        self.assertIsNone(self.cache.get('vpn', []))
+        self.cache.set('vpn', 'Réponse', [self.article])
+        self.article.contenu = 'Nouvelle procédure'
+        self.article.save()
+        self.assertIsNone(self.cache.get('vpn', [self.article]))
+        self.assertEqual(self.cache.stats()['stale'], 2)
+
+    def test_lru_et_expiration(self):
+        backend = MemoryBackend(max_entries=2, ttl=60)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+        self.assertEqual((backend.get('a'), backend.get('b'), backend.get('c')), (1, None, 3))
+        with mock.patch('baseconnaissance.utils.ai_cache.time.time', return_value=time.time() + 61):
+            self.assertIsNone(backend.get('a'))
+
+    def test_sqlite_partage(self):
+        with tempfile.TemporaryDirectory() as directory:
+            premier = SQLiteBackend(path=f'{directory}/cache.sqlite3', max_entries=2)
+            for cle in 'abc':
+                premier.set(cle, {'answer': cle})
+            # Un autre processus lit le même fichier ; la plus ancienne entrée a été évincée
+            second = SQLiteBackend(path=f'{directory}/cache.sqlite3')
+            self.assertEqual([second.get(cle) for cle in 'abc'], [None, {'answer': 'b'}, {'answer': 'c'}])
+            premier.db.close()
+            second.db.close()
+
+    def test_reponse_generee_une_fois(self):
+        async def fragments():
+            for texte in ('Redémarrer ', 'le client.'):
+                yield mock.Mock(text=texte)
+
+        model = mock.Mock()
+        model.generate_content_async = mock.AsyncMock(side_effect=lambda *args, **kwargs: fragments())
+        with mock.patch.object(ai, 'get_cache', return_value=self.cache), \
+                mock.patch.object(ai, 'get_model', return_value=model):
+            for _ in range(2):
+                self.assertEqual(async_to_sync(ai.answer_async)('vpn', [self.article], timeout=5),
+                                 'Redémarrer le client.')
+        self.assertEqual(model.generate_content_async.call_count, 1)
+
+
+class AiStreamTests(TestCase):
+    def setUp(self):
+        auteur = User.objects.create_user('auteur')
+        self.article = Article.objects.create(titre='Configurer le VPN', contenu='Installer le client.', auteur=auteur,
+                                              categorie=Categorie.objects.create(nom='Réseau'), statut='publie')
+        self.cache = AnswerCache(MemoryBackend())
+        self.ferme = False
+        for patcher in (mock.patch.object(ai, 'get_cache', return_value=self.cache),
+                        mock.patch.object(ai, 'is_enabled', return_value=True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def model(self, attente=0):
+        async def fragments():
+            try:
+                yield mock.Mock(text='Redémarrer ')
+                await asyncio.sleep(attente)
+                yield mock.Mock(text='le client.')
+            finally:
+                self.ferme = True
+
+        model = mock.Mock()
+        model.generate_content_async = mock.AsyncMock(side_effect=lambda *args, **kwargs: fragments())
+        return mock.patch.object(ai, 'get_model', return_value=model)
+
+    async def stream(self):
+        response = await self.async_client.get(reverse('ai_answer_stream'), {'q': 'vpn'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        return response.streaming_content
+
+    async def test_evenements_sse(self):
+        with self.model():
+            contenu = b''.join([morceau async for morceau in await self.stream()]).decode()
+        self.assertEqual(contenu, 'event: token\ndata: {"text": "Redémarrer "}\n\n'
+                                  'event: token\ndata: {"text": "le client."}\n\n'
+                                  'event: done\ndata: {}\n\n')
+        # Réponse complète mise en cache, avec les articles de contexte de la recherche
+        self.assertEqual(await ai.answer_async('vpn', [self.article]), 'Redémarrer le client.')
+
+    @override_settings(AI_STREAM_TIMEOUT=0.05)
+    async def test_delai_depasse(self):
+        with self.model(attente=1):
+            evenements = [morceau.decode() async for morceau in await self.stream()]
+        self.assertEqual(evenements[0], 'event: token\ndata: {"text": "Redémarrer "}\n\n')
+        self.assertEqual(evenements[1:], ['event: error\ndata: {"message": "L\'IA n\'a pas répondu à temps."}\n\n'])
+        self.assertTrue(self.ferme)
+        # Réponse partielle : rien n'est mis en cache
+        self.assertIsNone(self.cache.get('vpn', [self.article]))
+
+    async def test_annulation(self):
+        premier = asyncio.Event()
+
+        async def lecture(flux):
+            async for _ in flux:
+                premier.set()
+
+        with self.model(attente=60):
+            tache = asyncio.create_task(lecture(await self.stream()))
+            await premier.wait()
+            # Déconnexion du client : la génération en cours est interrompue
+            tache.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await tache
+        self.assertTrue(self.ferme)
+        self.assertIsNone(self.cache.get('vpn', [self.article]))
+
+    async def test_recherche_ai(self):
+        request = AsyncRequestFactory().post('/', {'query': 'vpn'})
+        request.user = AnonymousUser()
+        with mock.patch.object(project_views, 'render', return_value=HttpResponse()) as render, self.model():
+            await project_views.recherche_ai(request)
+        self.assertEqual(render.call_args.args[2], {'response': 'Redémarrer le client.'})
+
+
+class PeriodicFlusherTests(SimpleTestCase):
+    def test_reveil_et_arret(self):
+        passages = []
+        ecrit = threading.Event()
+
+        class Flusher(PeriodicFlusher):
+            def flush(self):
+                passages.append(self._stopping.is_set())
+                ecrit.set()
+
+        flusher = Flusher(interval=60, name='test')
+        flusher.start()
+        # wake() anticipe le passage ; stop() fait un dernier flush
+        flusher.wake()
+        self.assertTrue(ecrit.wait(5))
+        flusher.stop()
+        self.assertEqual(passages, [False, True])
+        self.assertIsNone(flusher._thread)
+
+    def test_base_changee_avant_l_arret(self):
+        passages = []
+
+        class Flusher(PeriodicFlusher):
+            def flush(self):
+                passages.append(True)
+
+        flusher = Flusher(interval=60, name='test')
+        flusher.start()
+        # Base de test détruite avant le flush de atexit : rien n'est écrit ailleurs
+        with mock.patch.dict(connections[DEFAULT_DB_ALIAS].settings_dict, {'NAME': 'db.sqlite3'}), \
+                self.assertLogs('baseconnaissance.utils.background', 'WARNING'):
+            flusher.stop()
+        self.assertEqual(passages, [])
+
+
+@mock.patch.object(ViewTracker, 'start')
+class ViewTrackerTests(TestCase):
+    def setUp(self):
+        auteur = User.objects.create_user('lecteur')
+        self.user_id = auteur.pk
+        self.article = Article.objects.create(titre='VPN', contenu='...', auteur=auteur,
+                                              categorie=Categorie.objects.create(nom='Réseau'), statut='publie')
+        self.tracker = ViewTracker(dedup_window=60, max_buffer=4)
+
+    def test_vues_ecrites_par_lot(self, start):
+        self.assertTrue(self.tracker.record(self.article.pk, self.user_id))
+        # Même lecteur dans la fenêtre : non compté
+        self.assertFalse(self.tracker.record(self.article.pk, self.user_id))
+        self.assertTrue(self.tracker.record(self.article.pk, None, '10.0.0.1'))
+        # Article supprimé entre la vue et l'écriture : ignoré
+        self.assertTrue(self.tracker.record(self.article.pk + 1000, None, '10.0.0.1'))
+        self.assertEqual(ArticleVue.objects.count(), 0)
+        self.assertEqual(self.tracker.flush(), 3)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.vues, 2)
+        self.assertEqual(ArticleVue.objects.filter(article=self.article).count(), 2)
+        self.assertEqual(self.tracker.flush(), 0)
+
+    def test_tampon_sature(self, start):
+        for i in range(4):
+            self.assertTrue(self.tracker.record(self.article.pk, None, f'10.0.0.{i}'))
+        self.assertFalse(self.tracker.record(self.article.pk, None, '10.0.0.9'))
+        self.tracker.flush()
+        self.assertTrue(self.tracker.record(self.article.pk, None, '10.0.0.9'))
+
+
+@mock.patch.object(SearchLogWriter, 'start')
+class SearchLogTests(TestCase):
+    def test_ecriture_par_lots(self, start):
+        writer = SearchLogWriter(batch_size=2)
+        for terme in ('vpn', 'imprimante', 'wifi'):
+            self.assertTrue(writer.log(terme, True, ip_address='10.0.0.1'))
+        with self.assertNumQueries(2):
+            self.assertEqual(writer.flush(), 3)
+        self.assertEqual(sorted(Recherche.objects.values_list('terme', flat=True)), ['imprimante', 'vpn', 'wifi'])
+
+    def test_file_pleine(self, start):
+        writer = SearchLogWriter(max_queue=1, policy='drop')
+        self.assertTrue(writer.log('vpn', True))
+        self.assertFalse(writer.log('wifi', True))
+        with self.assertLogs('baseconnaissance.utils.search_log', 'WARNING'):
+            writer.flush()
+        bloquant = SearchLogWriter(max_queue=1, policy='block', block_timeout=0.01)
+        bloquant.log('vpn', True)
+        self.assertFalse(bloquant.log('wifi', True))
+        with self.assertRaises(ValueError):
+            SearchLogWriter(policy='inconnue')
+
+
+class StatsTests(TestCase):
+    def setUp(self):
+        _cache_temporaire(self)
+        stats.verify(repair=True)
+        self.auteur = User.objects.create_user('auteur')
+        # L'arbre des catégories est mis à jour après commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reseau = Categorie.objects.create(nom='Réseau')
+            self.postes = Categorie.objects.create(nom='Postes')
+
+    def test_compteurs_suivent_les_modifications(self):
+        article = Article.objects.create(titre='VPN', contenu='...', auteur=self.auteur, categorie=self.reseau)
+        self.assertEqual(stats.value(stats.statut_key('brouillon')), 1)
+        article.statut, article.categorie = 'publie', self.postes
+        article.save()
+        self.assertEqual(stats.value(stats.statut_key('brouillon')), 0)
+        self.assertEqual(stats.value(stats.categorie_key(self.postes.pk)), 1)
+        feedback = Feedback.objects.create(article=article, note=4)
+        feedback.note = 2
+        feedback.save()
+        self.assertEqual((stats.value('feedbacks'), stats.value('feedbacks.somme_notes')), (1, 2))
+        self.assertEqual(stats.verify(), {})
+        article.delete()
+        self.postes.delete()
+        self.assertEqual(stats.value('articles'), 0)
+        # Les feedbacks supprimés en cascade sont décomptés
+        self.assertEqual(stats.verify(), {})
+
+    def test_instance_relue(self):
+        article = Article.objects.create(titre='VPN', contenu='...', auteur=self.auteur, categorie=self.reseau)
+        autre = Article.objects.get(pk=article.pk)
+        autre.statut = 'publie'
+        autre.save()
+        # Les valeurs relues servent de référence à la sauvegarde suivante
+        article.refresh_from_db()
+        article.statut = 'archive'
+        article.save()
+        self.assertEqual(stats.value(stats.statut_key('publie')), 0)
+        self.assertEqual(stats.verify(), {})
+
+    def test_reparation(self):
+        Article.objects.create(titre='VPN', contenu='...', auteur=self.auteur, categorie=self.reseau)
+        Statistique.objects.filter(cle='articles').update(valeur=7)
+        Statistique.objects.create(cle='obsolete', valeur=1)
+        self.assertEqual(stats.verify(repair=True), {'articles': (7, 1), 'obsolete': (1, None)})
+        self.assertEqual(stats.verify(), {})
+
+    def test_tableau_de_bord(self):
+        Article.objects.create(titre='VPN', contenu='...', auteur=self.auteur, categorie=self.reseau, statut='publie')
+        self.auteur.is_superuser = True
+        self.auteur.save()
+        self.client.force_login(self.auteur)
+        response = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(response.context['articles_publies'], 1)
+        self.assertEqual(response.context['total_categories'], 2)
+        self.assertEqual({ligne['categorie'].pk: ligne['nb_articles'] for ligne in response.context['stats_categories']},
+                         {self.reseau.pk: 1, self.postes.pk: 0})
+
+
+@override_settings(SQL_INSTRUMENTATION={'SAMPLE_RATE': 1, 'N_PLUS_ONE_THRESHOLD': 3, 'SERVER_TIMING_HEADER': True})
+class SQLInstrumentationTests(TestCase):
+    def setUp(self):
+        middleware.reset_stats()
+        self.addCleanup(middleware.reset_stats)
+        auteur = User.objects.create_user('auteur')
+        categorie = Categorie.objects.create(nom='Réseau')
+        self.articles = [Article.objects.create(titre=f'VPN {i}', contenu='...', auteur=auteur, categorie=categorie)
+                         for i in range(4)]
+
+    def test_empreinte(self):
+        self.assertEqual(
+            middleware.fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND nom = 'O''Neil'  AND n > 3"),
+            "SELECT * FROM t WHERE id IN (?) AND nom = ? AND n > ?",
+        )
+
+    def test_n_plus_un_detecte(self):
+        def vue(request):
+            for article in Article.objects.all():
+                article.auteur.username
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        with self.assertLogs('baseconnaissance.sql', 'WARNING') as logs:
+            response = middleware.SQLInstrumentationMiddleware(vue)(request)
+        self.assertIn('N+1 probable sur unresolved (5 requêtes)', logs.output[0])
+        self.assertIn('desc="5 queries"', response['Server-Timing'])
+        resume = middleware.get_stats()['unresolved']
+        self.assertEqual((resume['requests'], resume['n_plus_one'], resume['queries']['p50']), (1, 1, 5))
+        self.assertEqual(resume['repeated'][0]['count'], 4)
+
+    def test_requete_sans_n_plus_un(self):
+        def vue(request):
+            for article in Article.objects.select_related('auteur'):
+                article.auteur.username
+            return HttpResponse()
+
+        with self.assertNoLogs('baseconnaissance.sql', 'WARNING'):
+            middleware.SQLInstrumentationMiddleware(vue)(RequestFactory().get('/'))
+        self.assertEqual(middleware.get_stats()['unresolved']['n_plus_one'], 0)
+
+    def test_echantillonnage(self):
+        self.client.get(reverse('search'))
+        self.assertEqual(list(middleware.get_stats()), ['search'])
+        # Le middleware lit ses options au chargement : nouveau client
+        with override_settings(SQL_INSTRUMENTATION={'SAMPLE_RATE': 0}):
+            self.client_class().get(reverse('api_categories'))
+        self.assertEqual(list(middleware.get_stats()), ['search'])
+
+
+@override_settings(EMBEDDING_SYNC_ON_SAVE=False)
+class SuggestionsTests(TestCase):
+    def setUp(self):
+        auteur = User.objects.create_user('auteur')
+        categorie = Categorie.objects.create(nom='Réseau')
+        self.vpn = Article.objects.create(titre='Configurer le VPN', contenu='...', auteur=auteur,
+                                          categorie=categorie, statut='publie', vues=3)
+        self.populaire = Article.objects.create(titre='Connexion au Wi-Fi', contenu='...', auteur=auteur,
+                                                categorie=categorie, statut='publie', vues=500)
+        self.brouillon = Article.objects.create(titre='Configurer le proxy', contenu='...', auteur=auteur,
+                                                categorie=categorie)
+        jour = timezone.localdate()
+        RechercheJournaliere.objects.create(jour=jour, terme='conges payes', nb_recherches=5, nb_sans_resultat=1)
+        RechercheJournaliere.objects.create(jour=jour, terme='confidentiel', nb_recherches=3, nb_sans_resultat=3)
+        self.index = suggestions.load()
+
+    def textes(self, query):
+        return [suggestion.texte for suggestion in self.index.search(query)]
+
+    def test_prefixes_classes_par_poids(self):
+        # Brouillon et recherches sans résultat exclus ; les plus consultés d'abord
+        self.assertEqual(self.textes('con'), ['Connexion au Wi-Fi', 'conges payes', 'Configurer le VPN'])
+        self.assertEqual(self.textes('Configurer le v'), ['Configurer le VPN'])
+        self.assertEqual(self.textes('wifi co'), [])
+        self.assertEqual(self.textes('conges PAY'), ['conges payes'])
+
+    def test_mise_a_jour_incrementale(self):
+        self.assertEqual(self.textes('prox'), [])
+        with mock.patch.object(suggestions, '_index', self.index), self.captureOnCommitCallbacks(execute=True):
+            self.brouillon.statut = 'publie'
+            self.brouillon.save()
+            self.vpn.statut = 'archive'
+            self.vpn.save()
+            self.populaire.delete()
+        self.assertEqual(self.textes('con'), ['conges payes', 'Configurer le proxy'])
+
+    def test_vue(self):
+        # Index récent : pas de reconstruction en arrière-plan
+        with mock.patch.object(suggestions, '_index', self.index), \
+                mock.patch.object(suggestions, '_built_at', time.monotonic()):
+            data = self.client.get(reverse('search_suggestions'), {'q': 'config'}).json()
+        self.assertEqual(data['suggestions'], [
+            {'texte': 'Configurer le VPN', 'type': 'article', 'url': reverse('article_detail', args=[self.vpn.pk])},
+        ])
+
+
+def _image(taille=(300, 200), couleur='red', format_='PNG'):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', taille, couleur).save(buffer, format_)
+    return buffer.getvalue()
+
+
+class AvatarTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.enterContext(override_settings(AVATARS={'SIZES': [36, 80], 'FORMATS': ['webp', 'jpeg'], 'MAX_SIDE': 100}))
+        # Pool de threads à la place du pool de processus (mêmes appels, sans processus fils)
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        self.enterContext(mock.patch.object(avatars, 'get_pool', return_value=pool))
+        self.profiles = [User.objects.create_user(nom).profile for nom in ('alice', 'bob')]
+
+    def televerser(self, profile, contenu):
+        with self.captureOnCommitCallbacks() as callbacks:
+            profile.avatar = SimpleUploadedFile('photo.png', contenu, content_type='image/png')
+            profile.save()
+        # Traitement planifié après commit ; exécuté ici directement
+        self.assertEqual(len(callbacks), 1)
+        avatars.process_profile(profile.pk)
+        profile.refresh_from_db()
+        return profile
+
+    def test_variantes(self):
+        profile = self.profiles[0]
+        storage = profile.avatar.storage
+        profile = self.televerser(profile, _image())
+        self.assertEqual(sorted(profile.avatar_variantes), ['36.jpeg', '36.webp', '80.jpeg', '80.webp'])
+        self.assertTrue(profile.avatar.name.startswith('avatars/v/'))
+        # Le fichier téléversé est remplacé par l'original réduit
+        self.assertEqual(storage.listdir('avatars')[1], [])
+        self.assertEqual(profile.avatar.width, 100)
+        self.assertEqual(avatars.variant_url(profile, 40), storage.url(profile.avatar_variantes['80.webp']))
+        self.assertEqual(avatars.variant_url(profile, 500), storage.url(profile.avatar_variantes['80.webp']))
+
+    def test_fichiers_partages(self):
+        premier, second = (self.televerser(profile, _image()) for profile in self.profiles)
+        self.assertEqual(premier.avatar.name, second.avatar.name)
+        # Nouvel avatar du premier profil : l'original partagé reste en place pour le second
+        premier = self.televerser(premier, _image(couleur='blue'))
+        self.assertNotEqual(premier.avatar.name, second.avatar.name)
+        self.assertTrue(second.avatar.storage.exists(second.avatar.name))
+
+    def test_image_refusee(self):
+        with self.assertLogs('baseconnaissance.utils.avatars', 'WARNING'):
+            profile = self.televerser(self.profiles[0], b'pas une image')
+        self.assertFalse(profile.avatar)
+        self.assertEqual(profile.avatar_variantes, {})
+        self.assertEqual(profile.avatar.storage.listdir('avatars')[1], [])
+
+    def test_limites(self):
+        with self.assertRaises(ValueError):
+            image_worker.make_variants(_image((300, 200)), [36], ['webp'], 100, 50_000, 85)
+        upload = SimpleUploadedFile('photo.png', b'...', content_type='text/plain')
+        self.assertFalse(avatars.accept_upload(upload))
+
+
+@mock.patch.object(routers, 'read_aliases', return_value=['replica'])
+class RouterTests(SimpleTestCase):
+    def setUp(self):
+        self.tokens = routers.begin_request(False)
+        self.addCleanup(routers.end_request, self.tokens)
+
+    def test_lecture_apres_ecriture(self, read_aliases):
+        self.assertEqual(router.db_for_read(Article), 'replica')
+        self.assertEqual(router.db_for_write(Article), DEFAULT_DB_ALIAS)
+        # Même requête : la lecture suivante doit voir l'écriture
+        self.assertEqual(router.db_for_read(Article), DEFAULT_DB_ALIAS)
+        tokens = routers.begin_request(True)
+        self.assertEqual(router.db_for_read(Article), DEFAULT_DB_ALIAS)
+        self.assertFalse(routers.end_request(tokens))
+
+    def test_transaction_ouverte(self, read_aliases):
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True):
+            self.assertEqual(router.db_for_read(Article), DEFAULT_DB_ALIAS)
+
+    def test_cookie_apres_ecriture(self, read_aliases):
+        lectures = []
+
+        def vue(request):
+            lectures.append(router.db_for_read(Article))
+            if request.method == 'POST':
+                router.db_for_write(Article)
+            return HttpResponse()
+
+        rywm = middleware.ReadYourWritesMiddleware(vue)
+        factory = RequestFactory()
+        response = rywm(factory.post('/'))
+        self.assertEqual(response.cookies['db_pin']['max-age'], 5)
+        # Requête suivante du même navigateur : épinglée sur la base principale
+        factory.cookies['db_pin'] = '1'
+        response = rywm(factory.get('/'))
+        self.assertNotIn('db_pin', response.cookies)
+        self.assertEqual(lectures, ['replica', DEFAULT_DB_ALIAS])
+        self.assertEqual(router.db_for_read(Article), 'replica')
+
+
+class ReadAliasTests(SimpleTestCase):
+    def test_miroir_de_la_base_principale_ignore(self):
+        # Sous les tests, « replica » ouvre le même fichier que « default »
+        self.assertEqual(connections['replica'].settings_dict['NAME'],
+                         connections[DEFAULT_DB_ALIAS].settings_dict['NAME'])
+        self.assertEqual(routers.read_aliases(), [])
+        with mock.patch.dict(connections['replica'].settings_dict, {'NAME': 'replica.sqlite3'}):
+            self.assertEqual(routers.read_aliases(), ['replica'])
+        with override_settings(DATABASE_ROUTING={'READ_ALIASES': ['inconnu']}):
+            self.assertEqual(routers.read_aliases(), [])
+
+
+class EngagementCountersTests(TestCase):
+    def setUp(self):
+        self.auteur = User.objects.create_user('auteur')
+        categorie = Categorie.objects.create(nom='Réseau')
+        self.article, self.autre = (
+            Article.objects.create(titre=titre, contenu='...', auteur=self.auteur, categorie=categorie)
+            for titre in ('VPN', 'Wi-Fi')
+        )
+
+    def compteurs(self, article):
+        article.refresh_from_db(fields=engagement.COUNTER_FIELDS)
+        return {field: getattr(article, field) for field in engagement.COUNTER_FIELDS if getattr(article, field)}
+
+    def test_solution_statut_et_suppression(self):
+        solution = Solution.objects.create(article=self.article, contenu='Redémarrer', auteur=self.auteur)
+        self.assertEqual(self.compteurs(self.article), {'nb_solutions_en_attente': 1})
+        solution.statut = 'valide'
+        solution.save()
+        self.assertEqual(self.compteurs(self.article), {'nb_solutions_validees': 1})
+        solution.statut = 'refuse'
+        solution.save()
+        self.assertEqual(self.compteurs(self.article), {})
+        solution.statut = 'valide'
+        solution.save()
+        # Déplacée vers un autre article : retirée de l'un, ajoutée à l'autre
+        solution.article = self.autre
+        solution.save()
+        self.assertEqual((self.compteurs(self.article), self.compteurs(self.autre)),
+                         ({}, {'nb_solutions_validees': 1}))
+        solution.delete()
+        self.assertEqual(self.compteurs(self.autre), {})
+
+    def test_commentaires_et_avis(self):
+        Commentaire.objects.create(article=self.article, contenu='Merci')
+        feedback = Feedback.objects.create(article=self.article, note=5)
+        Feedback.objects.create(article=self.article, note=3)
+        feedback.note = 1
+        feedback.save()
+        self.assertEqual(self.compteurs(self.article), {'nb_commentaires': 1, 'nb_feedbacks': 2, 'somme_notes': 4})
+        self.assertEqual(self.article.note_moyenne, 2)
+        # Suppression par queryset : un signal par objet
+        Feedback.objects.filter(article=self.article).delete()
+        Commentaire.objects.all().delete()
+        self.assertEqual(self.compteurs(self.article), {})
+
+    def test_recalcul(self):
+        Solution.objects.create(article=self.article, contenu='Redémarrer', statut='valide')
+        Commentaire.objects.create(article=self.autre, contenu='Merci')
+        Article.objects.filter(pk=self.article.pk).update(nb_solutions_validees=0, nb_commentaires=3)
+        self.assertEqual(engagement.recompute(dry_run=True), 1)
+        self.assertEqual(self.compteurs(self.article), {'nb_commentaires': 3})
+        sortie = io.StringIO()
+        call_command('recalculer_compteurs', batch_size=1, stdout=sortie)
+        self.assertIn('1 article(s) corrigé(s)', sortie.getvalue())
+        self.assertEqual(self.compteurs(self.article), {'nb_solutions_validees': 1})
+        self.assertEqual(self.compteurs(self.autre), {'nb_commentaires': 1})
+        self.assertEqual(engagement.recompute(), 0)
+
+
+class RecordQueriesTests(TestCase):
+    # Réplica seul : sous SQLite, le miroir de test ne peut pas lire pendant la transaction de « default »
+    databases = {'replica'}
+
+    def test_requetes_du_replica_comptees(self):
+        with middleware.record_queries() as recorder:
+            Article.objects.using('replica').count()
+        self.assertEqual(recorder.count, 1)
+
+
+@override_settings(ALLOWED_HOSTS=['localhost'])
+class BenchmarkTests(TestCase):
+    def test_commande(self):
+        call_command('generer_donnees', articles=20, categories=2, profondeur=1, largeur=2, vues=50, recherches=20,
+                     lecteurs=3, redacteurs=1, administrateurs=1, jours=10, stdout=io.StringIO(),
+                     stderr=io.StringIO())
+        with tempfile.TemporaryDirectory() as directory, mock.patch('baseconnaissance.views.record_view'):
+            reference = f'{directory}/reference.json'
+            call_command('benchmark', iterations=2, warmup=1, pages=['home', 'article_detail', 'admin_dashboard'],
+                         baseline=reference, save_baseline=True, stdout=io.StringIO(), stderr=io.StringIO())
+            with open(reference, encoding='utf-8') as f:
+                rapport = json.load(f)
+            # Une page qui fait plus de requêtes que la référence est une régression
+            rapport['pages']['article_detail']['queries']['max'] -= 1
+            with open(reference, 'w', encoding='utf-8') as f:
+                json.dump(rapport, f)
+            with self.assertRaisesMessage(CommandError, 'article_detail :'):
+                call_command('benchmark', iterations=2, warmup=1, pages=['article_detail'], baseline=reference,
+                             tolerance=1000, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(rapport['dataset']['articles'], 20)
+        # Accueil servi depuis le cache une fois chaud : aucune requête
+        self.assertEqual(rapport['pages']['home']['queries']['max'], 0)
+        for page in ('article_detail', 'admin_dashboard'):
+            with self.subTest(page=page):
+                self.assertGreater(rapport['pages'][page]['queries']['max'], 0)
+
+
+class RolesTests(TestCase):
+    def setUp(self):
+        _cache_temporaire(self)
+        self.administrateurs = Group.objects.create(name=roles.ADMINISTRATEURS)
+        self.user = User.objects.create_user('admin', password='secret')
+        self.user.groups.add(self.administrateurs)
+
+    def session_user(self):
+        # Utilisateur tel que chargé à chaque requête
+        return ProfileModelBackend().get_user(self.user.pk)
+
+    def test_roles_en_cache(self):
+        self.assertTrue(roles.is_admin(self.session_user()))
+        user = self.session_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(roles.is_admin(user))
+            self.assertFalse(roles.is_redacteur(user))
+
+    def test_revocation(self):
+        user = self.session_user()
+        self.assertTrue(roles.is_admin(user))
+        ancienne_cle = roles._cache_key(user.pk, user.profile.version_roles)
+        self.user.groups.remove(self.administrateurs)
+        # L'entrée d'un autre processus (cache local) n'est pas effacée, mais n'est plus lue
+        self.assertEqual(cache.get(ancienne_cle), frozenset([roles.ADMINISTRATEURS]))
+        self.assertFalse(roles.is_admin(self.session_user()))
+
+    def test_revocation_par_le_groupe(self):
+        self.assertTrue(roles.is_admin(self.session_user()))
+        self.administrateurs.user_set.clear()
+        self.assertFalse(roles.is_admin(self.session_user()))
+        self.user.groups.add(self.administrateurs)
+        self.assertTrue(roles.is_admin(self.session_user()))
+        self.administrateurs.delete()
+        self.assertFalse(roles.is_admin(self.session_user()))
+
+    def test_acces_retire_au_tableau_de_bord(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('admin_dashboard')).status_code, 200)
+        self.administrateurs.user_set.remove(self.user)
+        self.assertEqual(self.client.get(reverse('admin_dashboard')).status_code, 302)
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        _cache_temporaire(self)
+        self.auteur = User.objects.create_user('auteur', password='secret')
+        self.categorie = Categorie.objects.create(nom='Réseau')
+        self.article = Article.objects.create(titre='VPN', contenu='Reconnecter le VPN.', auteur=self.auteur,
+                                              categorie=self.categorie, statut='publie')
+
+    def test_cache_partage_entre_processus(self):
+        # Les générations d'invalidation doivent être visibles de tous les workers
+        self.assertFalse(issubclass(import_string(project_settings.CACHES['default']['BACKEND']), LocMemCache))
+
+    def test_verrou_entre_processus(self):
+        release = page_cache._acquire('page:home:lock', 10)
+        # FileBasedCache.add n'est pas atomique : le verrou est un fichier exclusif
+        self.assertIsNone(page_cache._acquire('page:home:lock', 10))
+        cache.clear()
+        self.assertIsNone(page_cache._acquire('page:home:lock', 10))
+        release()
+        release = page_cache._acquire('page:home:lock', 10)
+        self.assertIsNotNone(release)
+        # Détenteur disparu : le verrou est repris après LOCK_TIMEOUT
+        self.assertIsNotNone(page_cache._acquire('page:home:lock', 0))
+        release()
+
+    def test_fragment_invalide_par_un_commentaire(self):
+        # Vues non comptées : le tracker global écrirait après la destruction de la base de test
+        self.enterContext(mock.patch('baseconnaissance.views.record_view'))
+        url = reverse('article_detail', args=[self.article.pk])
+        self.assertNotContains(self.client.get(url), 'Redémarrer le client')
+        generation = page_cache.generation(f'article:{self.article.pk}')
+        Commentaire.objects.create(article=self.article, auteur=self.auteur, contenu='Redémarrer le client')
+        self.assertNotEqual(page_cache.generation(f'article:{self.article.pk}'), generation)
+        self.assertContains(self.client.get(url), 'Redémarrer le client')
+
+    def test_arbre_recharge_apres_modification_par_un_autre_processus(self):
+        self.assertIn(self.categorie.pk, category_tree.get_tree().nodes)
+        # Un autre processus publie une nouvelle génération ; l'arbre local doit être relu
+        Categorie.objects.bulk_create([Categorie(nom='Imprimantes', chemin='')])
+        cache.set(category_tree.GENERATION_KEY, 0, None)
+        self.assertIn('Imprimantes', {noeud.nom for noeud in category_tree.get_tree().nodes.values()})
+
+
+class VectorStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.store = vector_store.VectorStore('articles', self.directory)
+        self.store.upsert([1, 2, 3], np.eye(3), 'test', 3)
+
+    def test_modification_ajoutee_au_journal(self):
+        generation = self.store._etat.generation
+        matrice = (self.store.directory / generation / 'vectors.npy').stat()
+        self.store.upsert([2], [[1, 0, 0]], 'test', 3)
+        self.store.remove([3])
+        self.store.upsert([4], [[0, 0, 1]], 'test', 3)
+        # Matrice intacte : seule la génération courante reçoit les ajouts
+        self.assertEqual(self.store._etat.generation, generation)
+        self.assertEqual((self.store.directory / generation / 'vectors.npy').stat().st_mtime_ns, matrice.st_mtime_ns)
+        self.assertEqual(sorted(self.store.pks()), [1, 2, 4])
+        self.assertNotIn(3, self.store)
+        self.assertEqual({pk for pk, _ in self.store.query([1, 0, 0], 2)}, {1, 2})
+        self.assertEqual(self.store.query([0, 0, 1], 1)[0][0], 4)
+
+    def test_autre_processus(self):
+        # Une autre instance (autre processus) suit le journal puis la compaction
+        lecteur = vector_store.VectorStore('articles', self.directory)
+        self.assertEqual(len(lecteur), 3)
+        self.store.remove([1])
+        self.assertNotIn(1, lecteur)
+        self.store.compact()
+        self.assertEqual(sorted(lecteur.pks()), [2, 3])
+        self.assertEqual(lecteur.query([0, 1, 0], 1)[0][0], 2)
+        # Une seule génération sur disque, matrice et identifiants alignés
+        generations = [path for path in self.store.directory.iterdir() if path.is_dir()]
+        self.assertEqual([path.name for path in generations], [lecteur._etat.generation])
+        self.assertEqual(len(np.load(generations[0] / 'ids.npy')), len(np.load(generations[0] / 'vectors.npy')))
+
+    def test_compaction_automatique(self):
+        with mock.patch.object(vector_store, 'COMPACT_MIN', 4):
+            generation = self.store._etat.generation
+            for pk in range(10, 16):
+                self.store.upsert([pk], [[1, 1, 0]], 'test', 3)
+        self.assertNotEqual(self.store._etat.generation, generation)
+        self.assertEqual(len(self.store), 9)
+
+    def test_ecrivains_concurrents(self):
+        # Chaque thread a sa propre instance : seul le verrou de fichier les sérialise
+        def ecrire(debut):
+            store = vector_store.VectorStore('articles', self.directory)
+            for pk in range(debut, debut + 20):
+                store.upsert([pk], [[pk, 1, 0]], 'test', 3)
+        with mock.patch.object(vector_store, 'COMPACT_MIN', 7):
+            threads = [threading.Thread(target=ecrire, args=(debut,)) for debut in (100, 200, 300, 400)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        attendus = {1, 2, 3} | {debut + i for debut in (100, 200, 300, 400) for i in range(20)}
+        self.assertEqual(set(self.store.pks()), attendus)
+
+    def test_changement_de_backend(self):
+        self.store.upsert([7], [[1, 0, 0, 0]], 'autre', 4)
+        self.assertEqual(self.store.pks(), [7])
+        self.assertEqual(self.store.meta, {'backend': 'autre', 'dimension': 4})
+
+
+class EmbeddingSyncTests(TestCase):
+    def setUp(self):
+        auteur = User.objects.create_user('auteur')
+        self.article = Article.objects.create(titre='VPN', contenu='Reconnecter le VPN.', auteur=auteur,
+                                              categorie=Categorie.objects.create(nom='Réseau'), statut='publie')
+        self.valide = Solution.objects.create(article=self.article, contenu='Redémarrer.', statut='valide')
+        Solution.objects.create(article=self.article, contenu='Réinstaller.')
+        self.article = Article.objects.get(pk=self.article.pk)
+
+    def synchronisations(self, **champs):
+        for champ, valeur in champs.items():
+            setattr(self.article, champ, valeur)
+        with mock.patch.object(embedding_pipeline, 'schedule_sync') as schedule_sync, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.article.save()
+        return [appel.args for appel in schedule_sync.call_args_list]
+
+    def test_titre_modifie(self):
+        # Le titre fait partie du texte indexé des solutions validées
+        self.assertEqual(self.synchronisations(titre='VPN entreprise'),
+                         [('articles', self.article.pk), ('solutions', self.valide.pk)])
+
+    def test_contenu_modifie(self):
+        self.assertEqual(self.synchronisations(contenu='Relancer le client.'), [('articles', self.article.pk)])
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        auteur = User.objects.create_user('auteur')
+        categorie = Categorie.objects.create(nom='Réseau')
+        self.titre = Article.objects.create(titre='Configurer le réseau Wi-Fi', contenu='Étapes de connexion.',
+                                            auteur=auteur, categorie=categorie, statut='publie')
+        self.contenu = Article.objects.create(titre='Portable lent', contenu='Vérifier le RESEAU et le disque.',
+                                              auteur=auteur, categorie=categorie, statut='publie')
+        self.brouillon = Article.objects.create(titre='Réseau interne', contenu='Brouillon.',
+                                                auteur=auteur, categorie=categorie, statut='brouillon')
+
+    def test_classement_accents_et_prefixes(self):
+        results, total = search_index.search('réseau')
+        # Terme du titre avant terme du contenu ; accents et casse ignorés ; brouillon exclu
+        self.assertEqual(results, [self.titre, self.contenu])
+        self.assertEqual(total, 2)
+        self.assertEqual(search_index.search('conf')[0], [self.titre])
+        self.assertEqual(search_index.search('réseau', offset=1, limit=1), ([self.contenu], 2))
+        self.assertEqual(search_index.search('réseau', offset=5), ([], 2))
+        self.assertEqual(search_index.search('"  ;'), ([], 0))
+
+    def test_index_suit_les_modifications(self):
+        self.brouillon.statut = 'publie'
+        self.brouillon.save()
+        self.assertEqual(search_index.count('interne'), 1)
+        self.contenu.contenu = 'Vérifier le disque.'
+        self.contenu.save()
+        self.titre.delete()
+        self.assertEqual(search_index.search('réseau')[0], [self.brouillon])
+
+    @override_settings(SEARCH_HYBRID=False)
+    def test_vue_recherche(self):
+        with mock.patch('baseconnaissance.views.log_search') as log_search:
+            response = self.client.get(reverse('search'), {'q': 'reseau'})
+        self.assertEqual(list(response.context['results']), [self.titre, self.contenu])
+        self.assertEqual(response.context['total'], 2)
+        self.assertIsNone(response.context['next_page'])
+        log_search.assert_called_once_with(mock.ANY, 'reseau', 2)
+
+
+class HybridSearchTests(TestCase):
+    def setUp(self):
+        auteur = User.objects.create_user('auteur')
+        categorie = Categorie.objects.create(nom='Imprimantes')
+        self.mots_cles = [
+            Article.objects.create(titre=f'Imprimante {i}', contenu='Bourrage papier ' * (i + 1), auteur=auteur,
+                                   categorie=categorie, statut='publie')
+            for i in range(12)
+        ]
+        # Trouvés uniquement par l'index vectoriel (aucun terme en commun)
+        self.semantiques = [
+            Article.objects.create(titre=f'Périphérique {i}', contenu='Feuilles coincées', auteur=auteur,
+                                   categorie=categorie, statut='publie')
+            for i in range(2)
+        ]
+
+    def test_fusion_des_classements(self):
+        self.assertEqual(search_index.reciprocal_rank_fusion([[1, 2, 3], [3, 4]]), [3, 1, 2, 4])
+        commun = self.mots_cles[-1]
+        voisins = [self.semantiques[0].pk, commun.pk, self.semantiques[1].pk]
+        with mock.patch.object(search_index, 'semantic_ids', return_value=voisins):
+            results, total = search_index.hybrid_search('imprimante', limit=5)
+        # Présent dans les deux classements : devant les résultats d'un seul
+        self.assertEqual(results[0], commun)
+        self.assertIn(self.semantiques[0], results)
+        self.assertEqual(total, 14)
+
+    def test_pagination_au_dela_des_candidats(self):
+        voisins = [article.pk for article in self.semantiques]
+        vus, page = [], 0
+        with mock.patch.object(search_index, 'HYBRID_CANDIDATES', 4), \
+                mock.patch.object(search_index, 'semantic_ids', return_value=voisins):
+            while True:
+                results, total = search_index.hybrid_search('imprimante', offset=page * 3, limit=3)
+                if not results:
+                    break
+                vus += [article.pk for article in results]
+                page += 1
+        self.assertEqual(total, 14)
+        self.assertEqual(len(vus), 14)
+        self.assertEqual(set(vus), {article.pk for article in self.mots_cles + self.semantiques})
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        auteur = User.objects.create_user('auteur')
+        self.article = Article.objects.create(titre='VPN', contenu='...', auteur=auteur,
+                                              categorie=Categorie.objects.create(nom='Réseau'), statut='publie')
+        self.today = timezone.localdate()
+        for jours, nb in ((20, 3), (2, 1)):
+            debut, _ = rollups.day_bounds(self.today - timedelta(days=jours))
+            vues = ArticleVue.objects.bulk_create([ArticleVue(article=self.article) for _ in range(nb)])
+            ArticleVue.objects.filter(pk__in=[vue.pk for vue in vues]).update(date_vue=debut + timedelta(hours=12))
+
+    def vues(self, jours):
+        return VueJournaliere.objects.filter(jour=self.today - timedelta(days=jours)).values_list('nb_vues', flat=True)
+
+    def test_recalcul_apres_purge(self):
+        rollups.run(self.today)
+        self.assertEqual(list(self.vues(20)), [3])
+        rollups.purge(retention_days=10)
+        self.assertFalse(ArticleVue.objects.filter(date_vue__lt=rollups.day_bounds(self.today - timedelta(days=10))[0])
+                         .exists())
+        # Un recalcul depuis une date antérieure à la purge conserve les totaux purgés
+        days = rollups.run(self.today, since=self.today - timedelta(days=30))
+        self.assertEqual(days[0], self.today - timedelta(days=10))
+        self.assertEqual(list(self.vues(20)), [3])
+        self.assertEqual(list(self.vues(2)), [1])
+
+
+    def test_etat_conserve_par_verifier_statistiques(self):
+        rollups.run(self.today)
+        rollups.purge(retention_days=10)
+        etat = (rollups.get_watermark(), rollups.first_kept_day())
+        self.assertNotIn(None, etat)
+        # L'état des agrégations partage la table des compteurs sans en être un
+        self.assertFalse({cle for cle in stats.verify(repair=True) if cle.startswith(rollups.KEY_PREFIX)})
+        call_command('verifier_statistiques', stdout=io.StringIO())
+        self.assertEqual((rollups.get_watermark(), rollups.first_kept_day()), etat)
+
+class CategorieTests(TestCase):
+    def setUp(self):
+        self.racine = Categorie.objects.create(nom='Réseau')
+        self.enfant = Categorie.objects.create(nom='VPN', parent=self.racine)
+        self.petit_enfant = Categorie.objects.create(nom='Clients VPN', parent=self.enfant)
+
+    def test_cycle_refuse_par_clean(self):
+        for parent in (self.racine, self.petit_enfant):
+            with self.subTest(parent=parent.nom):
+                self.racine.parent = parent
+                with self.assertRaises(ValidationError) as erreur:
+                    self.racine.full_clean()
+                self.assertIn('parent', erreur.exception.message_dict)
+        self.petit_enfant.parent = self.racine
+        self.petit_enfant.full_clean()
+
+    def test_cycle_dans_l_admin(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+        url = reverse('admin:baseconnaissance_categorie_change', args=[self.racine.pk])
+        response = self.client.post(url, {'nom': 'Réseau', 'parent': self.enfant.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('parent', response.context['adminform'].form.errors)
+        self.racine.refresh_from_db()
+        self.assertIsNone(self.racine.parent_id)
+
+
+@override_settings(REVISIONS={'SNAPSHOT_INTERVAL': 4})
+class RevisionTests(TestCase):
+    def setUp(self):
+        self.auteur = User.objects.create_user('auteur')
+        self.article = Article.objects.create(titre='VPN', contenu='Étape 1\n', auteur=self.auteur,
+                                              categorie=Categorie.objects.create(nom='Réseau'))
+
+    def test_reconstruction_de_chaque_version(self):
+        textes = {self.article.version: self.article.contenu}
+        lignes = ['Étape 1\n']
+        for i in range(2, 12):
+            # Ajouts, suppressions et modifications de lignes
+            lignes.append(f'Étape {i}\n')
+            if i % 3 == 0:
+                del lignes[0]
+            if i % 4 == 0:
+                lignes[-2] = f'Étape {i - 1} (corrigée)\n'
+            article = Article.objects.get(pk=self.article.pk)
+            article.contenu = ''.join(lignes)
+            article.save()
+            textes[article.version] = article.contenu
+        historique = list(Revision.objects.filter(article=self.article).order_by('version'))
+        self.assertEqual([revision.version for revision in historique], sorted(textes))
+        # Instantané toutes les 4 versions, deltas entre les deux
+        self.assertEqual([revision.est_instantane for revision in historique][:5], [True, False, False, False, True])
+        for version, texte in textes.items():
+            with self.subTest(version=version):
+                self.assertEqual(revisions.content(self.article.pk, version), texte)
+
+    def test_modifications_concurrentes(self):
+        # Deux éditeurs partent de la même version : chacun obtient un numéro distinct
+        premier = Article.objects.get(pk=self.article.pk)
+        second = Article.objects.get(pk=self.article.pk)
+        premier.contenu = 'Version du premier\n'
+        premier.save()
+        second.contenu = 'Version du second\n'
+        second.save()
+        self.assertEqual(second.version, premier.version + 1)
+        self.assertEqual(Article.objects.get(pk=self.article.pk).version, second.version)
+        self.assertEqual(revisions.content(self.article.pk, premier.version), 'Version du premier\n')
+        self.assertEqual(revisions.content(self.article.pk, second.version), 'Version du second\n')
+
+
+@override_settings(PDF_EXTRACTION={'ENABLED': False, 'STALE_AFTER': 900})
+class PdfExtractionTests(TestCase):
+    def setUp(self):
+        self.article = Article.objects.create(titre='Manuel', contenu='...', auteur=User.objects.create_user('auteur'),
+                                              categorie=Categorie.objects.create(nom='Imprimantes'),
+                                              fichier_pdf='articles/manuel.pdf')
+
+    def document(self, minutes, statut='en_cours'):
+        return DocumentPdf.objects.create(empreinte='a' * 64, statut=statut,
+                                          date_activite=timezone.now() - timedelta(minutes=minutes))
+
+    def test_extraction_abandonnee_reprise(self):
+        document = self.document(minutes=30)
+        self.assertTrue(pdf_text.claim(document))
+        # Réservée : un second processus ne la reprend pas
+        self.assertFalse(pdf_text.claim(document))
+
+    def test_extraction_active_non_reprise(self):
+        self.assertFalse(pdf_text.claim(self.document(minutes=1)))
+        self.assertTrue(pdf_text.claim(DocumentPdf.objects.create(empreinte='b' * 64, date_activite=None)))
+
+    def test_process_article(self):
+        document = self.document(minutes=30)
+        Article.objects.filter(pk=self.article.pk).update(document_pdf=document)
+        # Sélection de la commande extraire_pdf
+        a_reprendre = Article.objects.filter(pdf_text.to_retry('document_pdf__'))
+        self.assertTrue(a_reprendre.exists())
+        with mock.patch.object(pdf_text, 'file_hash', return_value=document.empreinte), \
+                mock.patch.object(pdf_text, 'extract') as extract:
+            pdf_text.process_article(self.article.pk)
+            self.assertEqual(extract.call_count, 1)
+            # Le document vient d'être repris : il n'est pas extrait une seconde fois
+            pdf_text.process_article(self.article.pk)
+            self.assertEqual(extract.call_count, 1)
+        document.refresh_from_db()
+        self.assertGreater(document.date_activite, timezone.now() - timedelta(minutes=1))
+        self.assertFalse(a_reprendre.exists())
+
+
+class ArticleIoTests(TestCase):
+    def setUp(self):
+        self.auteur = User.objects.create_user('auteur')
+        article = Article.objects.create(titre='Configurer le VPN', contenu='Installer le client.', statut='publie',
+                                         auteur=self.auteur, categorie=Categorie.objects.create(nom='Réseau'))
+        self.categorie_id = article.categorie_id
+        Article.objects.filter(pk=article.pk).update(date_creation=timezone.now() - timedelta(days=400))
+        Solution.objects.create(article=article, contenu='Redémarrer le service.', auteur=self.auteur)
+        self.records = list(article_io.export_records(article_io.export_queryset()))
+
+    def test_aller_retour(self):
+        Article.objects.all().delete()
+        index = suggestions.PrefixIndex()
+        with mock.patch.object(suggestions, '_index', index), self.captureOnCommitCallbacks(execute=True):
+            result = article_io.ArticleImporter(self.auteur).run(
+                ('ligne', record) for record in self.records)
+        self.assertEqual((result.articles, result.solutions, result.rejetes), (1, 1, 0))
+        article = Article.objects.get()
+        self.assertEqual(list(article_io.export_records(article_io.export_queryset())), self.records)
+        # Index dérivés tenus à jour comme par save()
+        self.assertEqual(revisions.content(article.pk, article.version), article.contenu)
+        self.assertEqual([resultat.pk for resultat in search_index.search('vpn')[0]], [article.pk])
+        self.assertEqual([suggestion.article_id for suggestion in index.search('configurer', 8)], [article.pk])
+
+    def test_date_invalide_rejetee(self):
+        record = dict(self.records[0], date_creation='hier')
+        result = article_io.ArticleImporter(self.auteur).run([('ligne', record)])
+        self.assertEqual((result.articles, result.rejetes), (0, 1))
+
+    def test_lot_annule(self):
+        importer = article_io.ArticleImporter(self.auteur)
+        record = dict(self.records[0], categorie='Réseau/VPN')
+        with mock.patch.object(Solution.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                importer.run([('ligne', record)])
+        # La catégorie créée pendant le lot disparaît avec lui, y compris du cache de l'importateur
+        self.assertFalse(Categorie.objects.filter(nom='VPN').exists())
+        importer.run([('ligne', record)])
+        self.assertTrue(Article.objects.filter(categorie__nom='VPN').exists())
+
+    def test_export_en_flux(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+        response = self.client.get(reverse('exporter_articles'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lignes = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(ligne) for ligne in lignes], self.records)
+        response = self.client.get(reverse('exporter_articles'), {'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lignes = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lignes[0], ','.join(article_io.CHAMPS))
+        self.assertEqual(len(lignes), 2)
+
+    async def test_export_en_flux_asgi(self):
+        admin = await sync_to_async(User.objects.create_superuser)('admin', password='secret')
+        await sync_to_async(Article.objects.create)(titre='Second', contenu='Texte.', statut='publie', auteur=admin,
+                                                      categorie_id=self.categorie_id)
+        await self.async_client.aforce_login(admin)
+        aiter_export = article_io.aiter_export
+        for format_, content_type in (('jsonl', 'application/x-ndjson'), ('csv', 'text/csv; charset=utf-8')):
+            # Lots d'un article : la pagination par clé est parcourue
+            with mock.patch.object(article_io, 'aiter_export',
+                                   lambda queryset, format_: aiter_export(queryset, format_, taille=1)):
+                response = await self.async_client.get(reverse('exporter_articles'), {'format': format_})
+                # Itérateur asynchrone : Django ne le convertit pas en liste avant l'envoi
+                self.assertTrue(response.is_async)
+                self.assertEqual(response['Content-Type'], content_type)
+                lignes = b''.join([morceau async for morceau in response.streaming_content]).decode().splitlines()
+            if format_ == 'jsonl':
+                self.assertEqual([json.loads(ligne)['titre'] for ligne in lignes], ['Configurer le VPN', 'Second'])
+            else:
+                self.assertEqual(lignes[0], ','.join(article_io.CHAMPS))
+                self.assertEqual(len(lignes), 3)
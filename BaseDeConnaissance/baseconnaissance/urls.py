@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('a_valider/', views.articles_a_valider, name='articles_a_valider'),
@@ -7,10 +7,20 @@ urlpatterns = [
     path('article/<int:article_id>/', views.article_detail, name='article_detail'),
     path('article/<int:article_id>/proposer-solution/', views.proposer_solution, name='proposer_solution'),
     path('article/<int:article_id>/commenter/', views.ajouter_commentaire, name='ajouter_commentaire'),
+    path('article/<int:article_id>/historique/', views.historique_article, name='historique_article'),
+    path('article/<int:article_id>/solutions/', views.article_solutions, name='article_solutions'),
+    path('article/<int:article_id>/commentaires/', views.article_commentaires, name='article_commentaires'),
     
     # Redacteur URLs
     path('redacteur/dashboard/', views.redacteur_dashboard, name='redacteur_dashboard'),
     path('redacteur/creer-article/', views.creer_article, name='creer_article'),
     path('redacteur/mes-articles/', views.mes_articles, name='mes_articles'),
     path('redacteur/editer-article/<int:article_id>/', views.editer_article, name='editer_article'),
+
+    # API JSON en lecture seule
+    path('api/articles/', api.articles, name='api_articles'),
+    path('api/articles/<int:article_id>/', api.article, name='api_article'),
+    path('api/categories/', api.categories, name='api_categories'),
+    path('api/recherche/', api.recherche, name='api_recherche'),
+    path('api/modifications/', api.modifications, name='api_modifications'),
 ] 
\ No newline at end of file
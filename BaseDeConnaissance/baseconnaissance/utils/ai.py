@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .ai_cache import get_cache
+
+MODEL_NAME = "gemini-1.5-flash"
+PROMPT_SYSTEME = "Tu es un assistant pour la base de connaissances d'une entreprise. Réponds de manière concise et utile."
+# Nombre d'articles trouvés transmis au modèle comme contexte, et taille maximale de chacun
+ARTICLES_CONTEXTE = 3
+EXTRAIT_CONTEXTE = 1500
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def is_enabled():
+    return bool(settings.GOOGLE_API_KEY)
+
+
+def get_model():
+    """Configure le client Gemini une seule fois par processus."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=settings.GOOGLE_API_KEY)
+                _model = genai.GenerativeModel(MODEL_NAME)
+    return _model
+
+
+def _article_context(article):
+    texte = f"### {article.titre}\n{article.contenu[:EXTRAIT_CONTEXTE]}"
+    # Passages du PDF joint retenus par pdf_text.add_excerpts
+    for extrait in getattr(article, 'extraits_pdf', ()):
+        texte += f"\n[PDF] {extrait[:EXTRAIT_CONTEXTE]}"
+    return texte
+
+
+def build_prompt(query, articles):
+    prompt = [PROMPT_SYSTEME]
+    if articles:
+        prompt.append("Articles de la base de connaissances :\n" + "\n\n".join(
+            _article_context(article) for article in articles
+        ))
+    prompt.append(f"Question: {query}")
+    return prompt
+
+
+async def stream_answer(query, articles=(), timeout=None):
+    """Générateur asynchrone des fragments de la réponse IA.
+
+    Le délai ``timeout`` (settings.AI_STREAM_TIMEOUT par défaut) borne la durée
+    totale de la génération : au-delà, asyncio.TimeoutError est levée. Si le
+    client se déconnecte, l'annulation de la tâche interrompt l'appel en cours.
+    """
+    articles = list(articles)[:ARTICLES_CONTEXTE]
+    cache = get_cache()
+    # Les backends du cache peuvent faire des entrées/sorties bloquantes (fichier, réseau)
+    cached = await sync_to_async(cache.get, thread_sensitive=False)(query, articles, model=MODEL_NAME)
+    if cached is not None:
+        yield cached
+        return
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (timeout or settings.AI_STREAM_TIMEOUT)
+    response = await asyncio.wait_for(
+        get_model().generate_content_async(build_prompt(query, articles), stream=True),
+        deadline - loop.time(),
+    )
+    chunks = response.__aiter__()
+    parts = []
+    while True:
+        try:
+            chunk = await asyncio.wait_for(chunks.__anext__(), deadline - loop.time())
+        except StopAsyncIteration:
+            break
+        if chunk.text:
+            parts.append(chunk.text)
+            yield chunk.text
+    await sync_to_async(cache.set, thread_sensitive=False)(query, ''.join(parts), articles, model=MODEL_NAME)
+
+
+async def answer_async(query, articles=(), timeout=None):
+    return ''.join([part async for part in stream_answer(query, articles, timeout)])
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .text import tokenize
+
+
+def normalize_query(query):
+    """Clé sémantique d'une question : casse, accents, espaces et mots vides ignorés."""
+    return ' '.join(tokenize(query))
+
+
+def context_fingerprint(articles):
+    """Identifie les articles fournis en contexte et leur dernière modification."""
+    return [[article.pk, article.date_modification.isoformat()] for article in articles]
+
+
+class MemoryBackend:
+    """LRU en mémoire du processus avec expiration (TTL)."""
+
+    def __init__(self, max_entries=1000, ttl=3600, **kwargs):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoCacheBackend:
+    """Cache Django configuré (partagé entre processus selon le backend choisi)."""
+
+    def __init__(self, alias='default', ttl=3600, **kwargs):
+        self.alias = alias
+        self.ttl = ttl
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.ttl)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+
+class SQLiteBackend:
+    """Fichier SQLite sur disque, partagé entre processus et persistant aux redémarrages."""
+
+    def __init__(self, path=None, max_entries=10000, ttl=24 * 3600, **kwargs):
+        self.path = str(path or settings.BASE_DIR / 'ai_cache.sqlite3')
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+
+    @property
+    def db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)'
+            )
+            db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)')
+            self._local.db = db
+        return db
+
+    def get(self, key):
+        now = time.time()
+        row = self.db.execute('SELECT value, expires FROM entries WHERE key = ?', [key]).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            self.delete(key)
+            return None
+        self.db.execute('UPDATE entries SET accessed = ? WHERE key = ?', [now, key])
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        self.db.execute(
+            'INSERT OR REPLACE INTO entries(key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+            [key, json.dumps(value), now + self.ttl, now],
+        )
+        # Éviction LRU au-delà de la capacité, expirées d'abord
+        self.db.execute('DELETE FROM entries WHERE expires < ?', [now])
+        self.db.execute(
+            'DELETE FROM entries WHERE key IN ('
+            'SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+            [self.max_entries],
+        )
+
+    def delete(self, key):
+        self.db.execute('DELETE FROM entries WHERE key = ?', [key])
+
+    def clear(self):
+        self.db.execute('DELETE FROM entries')
+
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'django': DjangoCacheBackend,
+    'sqlite': SQLiteBackend,
+}
+
+
+class AnswerCache:
+    """Réponses IA indexées par question normalisée.
+
+    Chaque entrée mémorise l'empreinte des articles passés en contexte : si la
+    recherche renvoie d'autres articles, ou si l'un d'eux a été modifié depuis,
+    l'entrée est périmée et la réponse est régénérée.
+    """
+
+    def __init__(self, backend, namespace='ai-answer'):
+        self.backend = backend
+        self.namespace = namespace
+        self._counters = Counter()
+        self._lock = threading.Lock()
+
+    def key(self, query, model=''):
+        digest = hashlib.sha256(f"{model}\x1f{normalize_query(query)}".encode('utf-8')).hexdigest()
+        return f"{self.namespace}:{digest}"
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, query, articles, model=''):
+        if not normalize_query(query):
+            return None
+        key = self.key(query, model)
+        entry = self.backend.get(key)
+        if entry is None:
+            self._count('misses')
+            return None
+        if entry['context'] != context_fingerprint(articles):
+            self.backend.delete(key)
+            self._count('stale')
+            self._count('misses')
+            return None
+        self._count('hits')
+        return entry['answer']
+
+    def set(self, query, answer, articles, model=''):
+        if not normalize_query(query):
+            return
+        self.backend.set(self.key(query, model), {
+            'answer': answer,
+            'context': context_fingerprint(articles),
+        })
+        self._count('sets')
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters.get('hits', 0) + counters.get('misses', 0)
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': counters.get('hits', 0),
+            'misses': counters.get('misses', 0),
+            'stale': counters.get('stale', 0),
+            'sets': counters.get('sets', 0),
+            'hit_ratio': round(counters.get('hits', 0) / lookups, 3) if lookups else None,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                options = dict(getattr(settings, 'AI_ANSWER_CACHE', {}))
+                backend = BACKENDS[options.pop('BACKEND', 'memory')]
+                _cache = AnswerCache(backend(**{k.lower(): v for k, v in options.items()}))
+    return _cache
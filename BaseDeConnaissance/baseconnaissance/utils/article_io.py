@@ -0,0 +1,351 @@
+import csv
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from baseconnaissance.models import Article, Categorie, Solution
+from . import category_tree, page_cache, revisions, search_index, stats, suggestions
+
+# Colonnes échangées, communes à l'import et à l'export
+CHAMPS = ['titre', 'contenu', 'categorie', 'statut', 'auteur', 'date_creation', 'solutions']
+SEPARATEUR_CATEGORIE = '/'
+STATUTS_ARTICLE = dict(Article.STATUT_CHOIX)
+STATUTS_SOLUTION = dict(Solution.STATUT_CHOIX)
+
+
+class InvalidRecord(ValueError):
+    """Enregistrement ignoré à l'import (signalé dans le rapport)."""
+
+
+# --- Lecture en flux : un enregistrement à la fois, mémoire constante ---
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for numero, ligne in enumerate(f, 1):
+            if not ligne.strip():
+                continue
+            try:
+                yield numero, json.loads(ligne)
+            except json.JSONDecodeError as exc:
+                yield numero, InvalidRecord(f"JSON invalide ({exc})")
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        for numero, row in enumerate(csv.DictReader(f), 2):
+            solutions = (row.get('solutions') or '').strip()
+            if solutions.startswith('['):
+                try:
+                    row['solutions'] = json.loads(solutions)
+                except json.JSONDecodeError as exc:
+                    yield numero, InvalidRecord(f"colonne solutions invalide ({exc})")
+                    continue
+            else:
+                row['solutions'] = [{'contenu': solutions}] if solutions else []
+            yield numero, row
+
+
+def read_markdown_dir(path):
+    """Un article par fichier .md ; la catégorie est le chemin relatif du dossier.
+
+    Un en-tête optionnel « --- / clé: valeur / --- » renseigne statut et auteur,
+    le premier titre « # » donne le titre (à défaut, le nom du fichier).
+    """
+    racine = Path(path)
+    for fichier in sorted(racine.rglob('*.md')):
+        lignes = fichier.read_text(encoding='utf-8').splitlines()
+        record = {'categorie': SEPARATEUR_CATEGORIE.join(fichier.parent.relative_to(racine).parts)}
+        if lignes and lignes[0].strip() == '---':
+            fin = next((i for i, ligne in enumerate(lignes[1:], 1) if ligne.strip() == '---'), None)
+            if fin is not None:
+                for ligne in lignes[1:fin]:
+                    cle, _, valeur = ligne.partition(':')
+                    record[cle.strip()] = valeur.strip()
+                lignes = lignes[fin + 1:]
+        titre = next((i for i, ligne in enumerate(lignes) if ligne.startswith('# ')), None)
+        if titre is not None:
+            record.setdefault('titre', lignes[titre][2:].strip())
+            del lignes[titre]
+        record.setdefault('titre', fichier.stem.replace('-', ' ').replace('_', ' '))
+        record['contenu'] = '\n'.join(lignes).strip()
+        yield str(fichier.relative_to(racine)), record
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv, 'markdown': read_markdown_dir}
+
+
+def detect_format(path):
+    path = Path(path)
+    if path.is_dir():
+        return 'markdown'
+    return {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv'}.get(path.suffix.lower())
+
+
+# --- Import ---
+
+class CategoryResolver:
+    """Résout « Réseau/VPN » en identifiant via l'arbre en mémoire, en créant les manquantes."""
+
+    def __init__(self):
+        arbre = category_tree.get_tree()
+        self._ids = {(noeud.parent_id, noeud.nom.strip().lower()): noeud.pk for noeud in arbre.nodes.values()}
+
+    def resolve(self, chemin):
+        parent_id = None
+        for nom in (part.strip() for part in (chemin or '').split(SEPARATEUR_CATEGORIE)):
+            if not nom:
+                continue
+            key = (parent_id, nom.lower())
+            if key not in self._ids:
+                # save() et non bulk_create : les signaux tiennent chemin, arbre et compteurs à jour
+                categorie = Categorie(nom=nom[:100], parent_id=parent_id)
+                categorie.save()
+                self._ids[key] = categorie.pk
+            parent_id = self._ids[key]
+        return parent_id
+
+    @contextmanager
+    def atomic(self):
+        """Transaction d'un lot : les catégories créées sont oubliées si elle est annulée."""
+        ids = dict(self._ids)
+        try:
+            with transaction.atomic():
+                yield
+        except BaseException:
+            self._ids = ids
+            raise
+
+
+@dataclass
+class ImportStats:
+    articles: int = 0
+    solutions: int = 0
+    rejetes: int = 0
+    erreurs: list = field(default_factory=list)
+
+    def __str__(self):
+        return f"{self.articles} article(s), {self.solutions} solution(s), {self.rejetes} rejeté(s)"
+
+
+class ArticleImporter:
+    """Importe un flux d'enregistrements par lots de ``batch_size`` (un lot = une transaction).
+
+    Les catégories manquantes sont créées dans la transaction du lot.
+    ``bulk_create`` ne déclenche pas les signaux de models.py : index plein
+    texte, suggestions, première révision, compteurs du tableau de bord et
+    cache de la page d'accueil sont mis à jour explicitement pour chaque lot,
+    et ``date_creation`` (auto_now_add) est rétablie. Les embeddings des nouveaux articles
+    (embedding_hash vide) sont calculés par ``reindex_embeddings``.
+    """
+
+    def __init__(self, auteur, statut='publie', batch_size=500, progress=None, max_erreurs=100):
+        self.auteur = auteur
+        self.statut = statut
+        self.batch_size = batch_size
+        self.progress = progress or (lambda message: None)
+        self.max_erreurs = max_erreurs
+        self.categories = CategoryResolver()
+        self._auteurs = {auteur.username: auteur.pk}
+
+    def _auteur_id(self, username):
+        if not username:
+            return self.auteur.pk
+        if username not in self._auteurs:
+            self._auteurs[username] = (User.objects.filter(username=username)
+                                       .values_list('pk', flat=True).first() or self.auteur.pk)
+        return self._auteurs[username]
+
+    def _prepare(self, record):
+        if isinstance(record, InvalidRecord):
+            raise record
+        if not isinstance(record, dict):
+            raise InvalidRecord("objet JSON attendu")
+        titre = (record.get('titre') or '').strip()
+        contenu = (record.get('contenu') or '').strip()
+        if not titre or not contenu:
+            raise InvalidRecord("titre et contenu sont obligatoires")
+        statut = record.get('statut') or self.statut
+        if statut not in STATUTS_ARTICLE:
+            raise InvalidRecord(f"statut inconnu : {statut}")
+        date_creation = None
+        if record.get('date_creation'):
+            try:
+                date_creation = parse_datetime(str(record['date_creation']))
+            except ValueError:
+                pass
+            if date_creation is None:
+                raise InvalidRecord(f"date_creation invalide : {record['date_creation']}")
+            if timezone.is_naive(date_creation):
+                date_creation = timezone.make_aware(date_creation)
+        article = Article(
+            titre=titre[:200],
+            contenu=contenu,
+            auteur_id=self._auteur_id(record.get('auteur')),
+            statut=statut,
+        )
+        solutions = []
+        for solution in record.get('solutions') or []:
+            if isinstance(solution, str):
+                solution = {'contenu': solution}
+            if not (solution.get('contenu') or '').strip():
+                continue
+            solutions.append(Solution(
+                contenu=solution['contenu'].strip(),
+                statut=solution.get('statut') if solution.get('statut') in STATUTS_SOLUTION else 'valide',
+                auteur_id=self._auteur_id(solution.get('auteur')),
+            ))
+        # bulk_create ne déclenche pas les signaux qui tiennent les compteurs à jour
+        statuts = Counter(solution.statut for solution in solutions)
+        article.nb_solutions_validees = statuts['valide']
+        article.nb_solutions_en_attente = statuts['en_attente']
+        # En dernier : un enregistrement rejeté ne crée pas de catégorie
+        article.categorie_id = self.categories.resolve(record.get('categorie')) or self._defaut_categorie()
+        return article, solutions, date_creation
+
+    def _defaut_categorie(self):
+        return self.categories.resolve('Non classé')
+
+    def run(self, records):
+        result = ImportStats()
+        debut = time.monotonic()
+        records = iter(records)
+        while True:
+            lot = list(islice(records, self.batch_size))
+            if not lot:
+                break
+            with self.categories.atomic():
+                prepared = []
+                for ref, record in lot:
+                    try:
+                        prepared.append(self._prepare(record))
+                    except (InvalidRecord, AttributeError, TypeError) as exc:
+                        result.rejetes += 1
+                        if len(result.erreurs) < self.max_erreurs:
+                            result.erreurs.append(f"{ref} : {exc}")
+                self._save(prepared, result)
+            duree = time.monotonic() - debut
+            self.progress(f"{result} — {result.articles / duree if duree else 0:.0f} articles/s")
+        return result
+
+    def _save(self, prepared, result):
+        if not prepared:
+            return
+        articles = Article.objects.bulk_create([article for article, _, _ in prepared])
+        solutions, dates = [], []
+        for article, (_, article_solutions, date_creation) in zip(articles, prepared):
+            for solution in article_solutions:
+                solution.article_id = article.pk
+                solutions.append(solution)
+            if date_creation is not None:
+                # auto_now_add a remplacé la date exportée lors de l'insertion
+                article.date_creation = date_creation
+                dates.append(article)
+        Solution.objects.bulk_create(solutions)
+        if dates:
+            Article.objects.bulk_update(dates, ['date_creation'], batch_size=self.batch_size)
+
+        search_index.index_articles(articles)
+        suggestions.articles_created(articles)
+        revisions.articles_created(articles)
+        deltas = Counter(articles=len(articles))
+        for article in articles:
+            deltas[stats.statut_key(article.statut)] += 1
+            deltas[stats.categorie_key(article.categorie_id)] += 1
+        stats.adjust(deltas)
+        if any(article.statut == 'publie' for article in articles):
+            transaction.on_commit(lambda: page_cache.bump('home'))
+        result.articles += len(articles)
+        result.solutions += len(solutions)
+
+
+# --- Export ---
+
+class _Echo:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne au lieu de l'écrire."""
+
+    def write(self, value):
+        return value
+
+
+def export_queryset(statut=None):
+    queryset = (Article.objects.select_related('auteur')
+                .only('id', 'titre', 'contenu', 'categorie_id', 'statut', 'date_creation', 'auteur__username')
+                .prefetch_related('solutions__auteur')
+                .order_by('pk'))
+    if statut:
+        queryset = queryset.filter(statut=statut)
+    return queryset
+
+
+def export_records(queryset, chunk_size=1000):
+    """Enregistrements au format d'import, lus par blocs (``iterator(chunk_size=...)``)."""
+    arbre = category_tree.get_tree()
+    for article in queryset.iterator(chunk_size=chunk_size):
+        yield _record(article, arbre)
+
+
+def export_batch(queryset, apres=0, taille=1000):
+    """Lot d'enregistrements après l'identifiant ``apres`` (pagination par clé) et dernier identifiant lu."""
+    articles = list(queryset.filter(pk__gt=apres)[:taille])
+    arbre = category_tree.get_tree()
+    return [_record(article, arbre) for article in articles], articles[-1].pk if articles else None
+
+
+def _record(article, arbre):
+    noeuds = arbre.ancestors(article.categorie_id) + [arbre.nodes[article.categorie_id]] \
+        if article.categorie_id in arbre.nodes else []
+    return {
+        'titre': article.titre,
+        'contenu': article.contenu,
+        'categorie': SEPARATEUR_CATEGORIE.join(noeud.nom for noeud in noeuds),
+        'statut': article.statut,
+        'auteur': article.auteur.username,
+        'date_creation': article.date_creation.isoformat(),
+        'solutions': [
+            {'contenu': solution.contenu, 'statut': solution.statut,
+             'auteur': solution.auteur.username if solution.auteur else None}
+            for solution in article.solutions.all()
+        ],
+    }
+
+
+def iter_jsonl(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def iter_csv(records, header=True):
+    writer = csv.writer(_Echo())
+    if header:
+        yield writer.writerow(CHAMPS)
+    for record in records:
+        record['solutions'] = json.dumps(record['solutions'], ensure_ascii=False)
+        yield writer.writerow([record[champ] for champ in CHAMPS])
+
+
+async def aiter_export(queryset, format_, taille=1000):
+    """Lignes JSONL ou CSV produites lot par lot, pour StreamingHttpResponse sous ASGI.
+
+    Django consomme un itérateur synchrone en entier (``sync_to_async(list)``)
+    avant d'envoyer le premier octet sous ASGI : ici chaque lot est lu par
+    ``sync_to_async`` et envoyé avant la lecture du suivant.
+    """
+    apres = 0
+    if format_ == 'csv':
+        yield next(iter_csv([]))
+    while True:
+        records, apres = await sync_to_async(export_batch)(queryset, apres, taille)
+        if apres is None:
+            return
+        lignes = iter_csv(records, header=False) if format_ == 'csv' else iter_jsonl(records)
+        yield ''.join(lignes)
@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from baseconnaissance.models import Article, ArticleRetire
+
+
+def _options():
+    return getattr(settings, 'API', {})
+
+
+def article_saved(article, created):
+    """Retrait à la dépublication, effacé si l'article est publié de nouveau."""
+    if created or not hasattr(article, '_loaded_values'):
+        return
+    ancien = article.initial_value('statut', article.statut)
+    if ancien == article.statut:
+        return
+    if article.statut == 'publie':
+        ArticleRetire.objects.filter(article_id=article.pk).delete()
+    elif ancien == 'publie':
+        ArticleRetire.objects.update_or_create(article_id=article.pk, defaults={'date_retrait': timezone.now()})
+
+
+def article_deleted(article):
+    if article.initial_value('statut', article.statut) == 'publie':
+        ArticleRetire.objects.update_or_create(article_id=article.pk, defaults={'date_retrait': timezone.now()})
+
+
+def changes(depuis, apres_id, lookups, limit):
+    """Articles publiés modifiés après la position (depuis, apres_id) et articles retirés.
+
+    Les modifications des SYNC_MARGIN dernières secondes sont laissées pour
+    l'appel suivant : une transaction encore ouverte peut y valider un article
+    daté d'avant la fin de celle-ci. Retourne (lignes ``values()`` triées par
+    (date_modification, id), identifiants retirés, position suivante, complet).
+    """
+    borne = timezone.now() - timedelta(seconds=_options().get('SYNC_MARGIN', 5))
+    articles = Article.objects.filter(statut='publie', date_modification__lt=borne)
+    retires = ArticleRetire.objects.filter(date_retrait__lt=borne)
+    if depuis is not None:
+        articles = articles.filter(Q(date_modification__gt=depuis) | Q(date_modification=depuis, id__gt=apres_id))
+        retires = retires.filter(date_retrait__gte=depuis)
+    lignes = list(articles.order_by('date_modification', 'id')
+                  .values('id', 'date_modification', *lookups)[:limit + 1])
+    if len(lignes) > limit:
+        # Lot incomplet : les retraits postérieurs au dernier article viendront avec le lot suivant
+        lignes = lignes[:limit]
+        position = (lignes[-1]['date_modification'], lignes[-1]['id'])
+        retires = retires.filter(date_retrait__lte=position[0])
+        complet = False
+    else:
+        position = (borne, 0)
+        complet = True
+    return lignes, list(retires.values_list('article_id', flat=True)), position, complet
@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import multiprocessing
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+from baseconnaissance.models import Profile
+from . import image_worker
+
+logger = logging.getLogger(__name__)
+
+# Variantes et originaux réduits, nommés d'après l'empreinte de leur contenu :
+# un fichier écrit ne change jamais et peut être mis en cache indéfiniment
+DOSSIER_VARIANTES = 'avatars/v'
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+
+def _options():
+    return getattr(settings, 'AVATARS', {})
+
+
+def accept_upload(upload):
+    """Vérification sommaire à l'envoi ; le fichier est décodé et contrôlé en arrière-plan."""
+    return (upload.size <= _options().get('MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+            and (upload.content_type or '').startswith('image/'))
+
+
+def variant_url(profile, size, format_='webp'):
+    """URL de la plus petite variante d'au moins ``size`` pixels.
+
+    Tant que les variantes ne sont pas prêtes (traitement en cours), l'original est servi.
+    """
+    if profile is None or not profile.avatar:
+        return ''
+    tailles = sorted(int(cle.split('.')[0]) for cle in profile.avatar_variantes
+                     if cle.endswith(f'.{format_}'))
+    if not tailles:
+        return profile.avatar.url
+    taille = next((taille for taille in tailles if taille >= size), tailles[-1])
+    return profile.avatar.storage.url(profile.avatar_variantes[f'{taille}.{format_}'])
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_options().get('WORKERS', 1),
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def _store(storage, contenu, extension):
+    name = posixpath.join(DOSSIER_VARIANTES, f'{hashlib.sha256(contenu).hexdigest()[:20]}.{extension}')
+    if not storage.exists(name):
+        storage.save(name, ContentFile(contenu))
+    return name
+
+
+def process_profile(profile_id):
+    """Génère les variantes de l'avatar et remplace l'original téléversé par sa version réduite."""
+    profile = Profile.objects.filter(pk=profile_id).only('id', 'avatar', 'avatar_variantes').first()
+    if profile is None or not profile.avatar:
+        if profile is not None and profile.avatar_variantes:
+            Profile.objects.filter(pk=profile_id).update(avatar_variantes={})
+        return None
+    options = _options()
+    televerse = profile.avatar.name
+    storage = profile.avatar.storage
+    with profile.avatar.open('rb'):
+        data = profile.avatar.read()
+    try:
+        resultats = get_pool().submit(
+            image_worker.make_variants, data,
+            options.get('SIZES', [36, 72, 80, 160]), options.get('FORMATS', ['webp', 'jpeg']),
+            options.get('MAX_SIDE', 1024), options.get('MAX_PIXELS', 40_000_000), options.get('QUALITY', 85),
+        ).result()
+    except BrokenProcessPool:
+        _reset_pool()
+        raise
+    except Exception as exc:
+        # Fichier illisible ou trop grand : il n'est pas conservé
+        logger.warning("Avatar refusé pour le profil #%s : %s", profile_id, exc)
+        if Profile.objects.filter(pk=profile_id, avatar=televerse).update(avatar='', avatar_variantes={}):
+            _delete_if_unused(storage, televerse)
+        return None
+
+    variantes = {
+        cle: _store(storage, contenu, EXTENSIONS[cle.split('.')[1]])
+        for cle, contenu in resultats.items() if cle != 'original'
+    }
+    original = _store(storage, resultats['original'], 'jpg')
+    # Le filtre sur l'ancien nom écarte le résultat si un autre avatar a été téléversé entre-temps
+    if Profile.objects.filter(pk=profile_id, avatar=televerse).update(avatar=original, avatar_variantes=variantes):
+        if televerse != original:
+            _delete_if_unused(storage, televerse)
+    return variantes
+
+
+def _delete_if_unused(storage, name):
+    # Les fichiers d'avatars/v sont partagés entre profils d'images identiques
+    if name.startswith(DOSSIER_VARIANTES + '/') and Profile.objects.filter(avatar=name).exists():
+        return
+    storage.delete(name)
+
+
+def referenced_names():
+    names = set()
+    for avatar, variantes in Profile.objects.values_list('avatar', 'avatar_variantes').iterator():
+        if avatar:
+            names.add(avatar)
+            names.update(variantes.values())
+    return names
+
+
+# Les traitements déclenchés par les téléversements passent par un thread unique
+# qui alimente le pool de processus : la requête n'attend pas le redimensionnement.
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _run(profile_id):
+    try:
+        process_profile(profile_id)
+    except Exception:
+        logger.exception("Échec du traitement de l'avatar du profil #%s", profile_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(profile_id):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='avatars')
+    _executor.submit(_run, profile_id)
+
+
+def profile_saved(profile):
+    if str(profile.initial_value('avatar') or '') == (profile.avatar.name or ''):
+        return
+    if not _options().get('ENABLED', True):
+        return
+    pk = profile.pk
+    transaction.on_commit(lambda: schedule(pk))
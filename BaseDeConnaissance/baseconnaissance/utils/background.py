@@ -0,0 +1,77 @@
+import atexit
+import logging
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicFlusher:
+    """Thread démon qui appelle ``flush()`` toutes les ``interval`` secondes.
+
+    Le thread est démarré au premier usage ; ``wake()`` anticipe le prochain
+    passage (tampon plein) et un dernier ``flush()`` a lieu à l'arrêt du processus.
+    Un passage est abandonné si la base n'est plus celle du démarrage (base de
+    test détruite avant l'arrêt : l'écriture irait dans la base de développement).
+    """
+
+    def __init__(self, interval, name):
+        self.interval = interval
+        self.name = name
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._database = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._stopping.clear()
+                self._database = _database_name()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self, timeout=10):
+        """Arrête le thread et écrit ce qui reste en attente."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self._safe_flush()
+            if self._stopping.is_set():
+                break
+
+    def _safe_flush(self):
+        if _database_name() != self._database:
+            logger.warning("Base de données changée depuis le démarrage : écriture différée abandonnée (%s)",
+                           self.name)
+            return
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Échec de l'écriture différée (%s)", self.name)
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        raise NotImplementedError
+
+
+def _database_name():
+    return str(connections[DEFAULT_DB_ALIAS].settings_dict['NAME'])
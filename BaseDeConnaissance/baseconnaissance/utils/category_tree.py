@@ -0,0 +1,239 @@
+import copy
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+
+from baseconnaissance.models import Categorie
+
+# Chemin matérialisé : identifiants des ancêtres puis de la catégorie, chacun suivi de « / »
+SEPARATEUR = '/'
+GENERATION_KEY = 'categories:arbre:gen'
+
+
+def build_chemin(parent_chemin, pk):
+    return f'{parent_chemin}{pk}{SEPARATEUR}'
+
+
+def subtree_filter(chemin, prefix=''):
+    """Filtre « chemin commence par ``chemin`` » exprimé en intervalle.
+
+    Un intervalle [chemin, borne) exploite l'index B-tree sur ``chemin`` quel que
+    soit le moteur, là où LIKE 'x%' ne l'utilise pas toujours (SQLite). La borne
+    remplace le dernier « / » par le caractère suivant (« 0 »).
+    """
+    borne = chemin[:-1] + chr(ord(SEPARATEUR) + 1)
+    return {f'{prefix}chemin__gte': chemin, f'{prefix}chemin__lt': borne}
+
+
+def creates_cycle(categorie):
+    """Vrai si le parent est la catégorie elle-même ou l'un de ses descendants."""
+    if not categorie.pk or not categorie.parent_id:
+        return False
+    if categorie.parent_id == categorie.pk:
+        return True
+    if not categorie.chemin:
+        return False
+    parent = Categorie.objects.only('chemin').filter(pk=categorie.parent_id).first()
+    return parent is not None and parent.chemin.startswith(categorie.chemin)
+
+
+def check_parent(categorie):
+    """Dernier rempart avant l'écriture ; les formulaires passent par Categorie.clean()."""
+    if creates_cycle(categorie):
+        raise ValueError("Une catégorie ne peut pas être déplacée sous l'une de ses sous-catégories.")
+
+
+def update_path(categorie):
+    """Calcule chemin et profondeur après sauvegarde et répercute un déplacement sur le sous-arbre."""
+    parent = None
+    if categorie.parent_id:
+        parent = Categorie.objects.only('chemin', 'profondeur').get(pk=categorie.parent_id)
+    chemin = build_chemin(parent.chemin if parent else '', categorie.pk)
+    profondeur = parent.profondeur + 1 if parent else 0
+    ancien = categorie.chemin
+    if chemin == ancien and profondeur == categorie.profondeur:
+        return
+    with transaction.atomic():
+        if ancien:
+            # Un seul UPDATE pour tous les descendants : préfixe remplacé, profondeur décalée
+            Categorie.objects.filter(**subtree_filter(ancien)).exclude(pk=categorie.pk).update(
+                chemin=Concat(Value(chemin), Substr('chemin', len(ancien) + 1)),
+                profondeur=F('profondeur') + (profondeur - categorie.profondeur),
+            )
+        Categorie.objects.filter(pk=categorie.pk).update(chemin=chemin, profondeur=profondeur)
+    categorie.chemin, categorie.profondeur = chemin, profondeur
+
+
+def rebuild_paths():
+    """Recalcule tous les chemins depuis ``parent`` (après un bulk_create, par exemple)."""
+    tree = CategoryTree.load()
+    changed = []
+    for categorie in Categorie.objects.only('id', 'chemin', 'profondeur'):
+        noeud = tree.nodes[categorie.pk]
+        if (categorie.chemin, categorie.profondeur) != (noeud.chemin, noeud.profondeur):
+            categorie.chemin, categorie.profondeur = noeud.chemin, noeud.profondeur
+            changed.append(categorie)
+    Categorie.objects.bulk_update(changed, ['chemin', 'profondeur'], batch_size=1000)
+    invalidate()
+    return len(changed)
+
+
+@dataclass
+class Noeud:
+    pk: int
+    nom: str
+    parent_id: int = None
+    chemin: str = ''
+    profondeur: int = 0
+    enfants: list = field(default_factory=list)
+
+
+def _ordre(noeud):
+    return (noeud.nom.lower(), noeud.pk)
+
+
+class CategoryTree:
+    """Arbre des catégories en mémoire pour la navigation et les cumuls par branche."""
+
+    def __init__(self, rows):
+        self.nodes = {pk: Noeud(pk, nom, parent_id) for pk, nom, parent_id in rows}
+        self.racines = []
+        for noeud in self.nodes.values():
+            parent = self.nodes.get(noeud.parent_id)
+            (parent.enfants if parent else self.racines).append(noeud)
+        for noeud in self.racines:
+            self._reindex(noeud)
+        for liste in [self.racines] + [noeud.enfants for noeud in self.nodes.values()]:
+            liste.sort(key=_ordre)
+
+    @classmethod
+    def load(cls):
+        return cls(Categorie.objects.values_list('id', 'nom', 'parent_id'))
+
+    def _reindex(self, noeud):
+        """Recalcule chemin et profondeur de ``noeud`` et de ses descendants."""
+        parent = self.nodes.get(noeud.parent_id)
+        pile = [(noeud, parent.chemin if parent else '', parent.profondeur + 1 if parent else 0)]
+        while pile:
+            courant, chemin_parent, profondeur = pile.pop()
+            courant.chemin = build_chemin(chemin_parent, courant.pk)
+            courant.profondeur = profondeur
+            pile.extend((enfant, courant.chemin, profondeur + 1) for enfant in courant.enfants)
+
+    def _siblings(self, parent_id):
+        parent = self.nodes.get(parent_id)
+        return parent.enfants if parent else self.racines
+
+    def upsert(self, pk, nom, parent_id):
+        """Ajoute ou met à jour une catégorie sans recharger l'arbre."""
+        noeud = self.nodes.get(pk)
+        if noeud is None:
+            noeud = self.nodes[pk] = Noeud(pk, nom, parent_id)
+        else:
+            self._siblings(noeud.parent_id).remove(noeud)
+            noeud.nom, noeud.parent_id = nom, parent_id
+        siblings = self._siblings(parent_id)
+        siblings.append(noeud)
+        siblings.sort(key=_ordre)
+        self._reindex(noeud)
+
+    def remove(self, pk):
+        noeud = self.nodes.get(pk)
+        if noeud is None:
+            return
+        self._siblings(noeud.parent_id).remove(noeud)
+        for descendant in self.walk(noeud):
+            del self.nodes[descendant.pk]
+
+    def walk(self, depuis=None):
+        """Parcours en profondeur, dans l'ordre d'affichage (nom)."""
+        pile = list(reversed(depuis.enfants if depuis else self.racines))
+        if depuis is not None:
+            yield depuis
+        while pile:
+            noeud = pile.pop()
+            yield noeud
+            pile.extend(reversed(noeud.enfants))
+
+    def descendant_ids(self, pk):
+        """Identifiants de la catégorie et de tout son sous-arbre."""
+        noeud = self.nodes.get(pk)
+        return [n.pk for n in self.walk(noeud)] if noeud else []
+
+    def ancestors(self, pk):
+        noeud = self.nodes.get(pk)
+        if noeud is None:
+            return []
+        return [self.nodes[int(part)] for part in noeud.chemin.split(SEPARATEUR)[:-2]]
+
+    def rollup(self, counts):
+        """Cumule des compteurs directs {pk: n} sur chaque branche (catégorie + descendants)."""
+        totals = {pk: counts.get(pk, 0) for pk in self.nodes}
+        # Les plus profonds d'abord : chaque total remonte vers son parent
+        for noeud in sorted(self.nodes.values(), key=lambda n: -n.profondeur):
+            if noeud.parent_id in totals:
+                totals[noeud.parent_id] += totals[noeud.pk]
+        return totals
+
+
+_tree = None
+_generation = None
+_lock = threading.Lock()
+
+
+def generation():
+    """Change à chaque modification des catégories, dans n'importe quel processus.
+
+    Lue dans le cache par défaut, partagé entre processus (voir CACHES).
+    """
+    return cache.get_or_set(GENERATION_KEY, time.time_ns, None)
+
+
+def get_tree():
+    """Arbre du processus, rechargé si un autre processus a modifié les catégories."""
+    global _tree, _generation
+    generation_courante = generation()
+    with _lock:
+        if _tree is None or _generation != generation_courante:
+            _tree = CategoryTree.load()
+            _generation = generation_courante
+        return _tree
+
+
+def invalidate():
+    global _tree
+    with _lock:
+        _tree = None
+    cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def _apply(change):
+    """Applique la modification à une copie de l'arbre local et publie une nouvelle génération.
+
+    Les lecteurs qui parcourent l'ancien arbre ne le voient jamais modifié.
+    """
+    global _tree, _generation
+    generation = time.time_ns()
+    with _lock:
+        current = cache.get(GENERATION_KEY)
+        cache.set(GENERATION_KEY, generation, None)
+        if _tree is not None and _generation == current:
+            tree = copy.deepcopy(_tree)
+            change(tree)
+            _tree, _generation = tree, generation
+
+
+def categorie_saved(categorie):
+    update_path(categorie)
+    pk, nom, parent_id = categorie.pk, categorie.nom, categorie.parent_id
+    transaction.on_commit(lambda: _apply(lambda tree: tree.upsert(pk, nom, parent_id)))
+
+
+def categorie_deleted(categorie):
+    pk = categorie.pk
+    transaction.on_commit(lambda: _apply(lambda tree: tree.remove(pk)))
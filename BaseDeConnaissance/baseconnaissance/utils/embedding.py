@@ -1,14 +1,91 @@
-import google.generativeai as genai
-import numpy as np
+import hashlib
+import math
 import os
+import threading
+from collections import Counter
+
+import numpy as np
 from dotenv import load_dotenv
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .text import tokenize
 
 load_dotenv()  # Charge les variables d’environnement à partir du fichier .env
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+
+class GeminiEmbeddingBackend:
+    """Embeddings distants via l'API Google (text-embedding-004)."""
+    name = 'gemini'
+    model = "text-embedding-004"
+
+    def __init__(self):
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        self._genai = genai
+
+    def embed(self, texts):
+        result = self._genai.embed_content(model=self.model, content=list(texts))
+        return np.asarray(result["embedding"], dtype=np.float32).reshape(len(texts), -1)
+
+
+class HashingEmbeddingBackend:
+    """Projection déterministe hors ligne : hachage signé des unigrammes et bigrammes.
+
+    Aucune dépendance réseau, ce qui permet d'indexer et de tester sans l'API.
+    """
+    name = 'hashing'
+
+    def __init__(self, dimension=384):
+        self.dimension = dimension
+
+    def _features(self, text):
+        tokens = tokenize(text)
+        return Counter(tokens + [f'{a}_{b}' for a, b in zip(tokens, tokens[1:])])
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, freq in self._features(text).items():
+                digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+                value = int.from_bytes(digest, 'little')
+                sign = 1.0 if value & 1 else -1.0
+                matrix[row, (value >> 1) % self.dimension] += sign * (1.0 + math.log(freq))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Backend configuré par settings.EMBEDDING_BACKEND (chemin pointé).
+
+    Par défaut : Gemini si une clé API est présente, sinon le hachage hors ligne.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'EMBEDDING_BACKEND', None)
+                if path:
+                    _backend = import_string(path)()
+                elif os.getenv("GOOGLE_API_KEY"):
+                    _backend = GeminiEmbeddingBackend()
+                else:
+                    _backend = HashingEmbeddingBackend()
+    return _backend
+
+
+def get_embeddings(texts):
+    """Matrice float32 (len(texts), dimension) en un seul appel au backend."""
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return get_backend().embed(texts)
+
 
 def get_embedding(text):
-    result = genai.embed_content(
-        model="text-embedding-004",
-        content=text
-    )
-    return np.array(result["embedding"]) 
+    return get_embeddings([text])[0]
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from baseconnaissance.models import Article, Solution
+from . import embedding
+from .vector_store import get_store
+
+logger = logging.getLogger(__name__)
+
+
+def article_text(article):
+    return f"{article.titre}\n{article.contenu}"
+
+
+def solution_text(solution):
+    return f"{solution.article.titre}\n{solution.contenu}"
+
+
+def published_articles():
+    return Article.objects.filter(statut='publie').only('id', 'titre', 'contenu', 'embedding_hash')
+
+
+def validated_solutions():
+    return (Solution.objects.filter(statut='valide')
+            .select_related('article')
+            .only('id', 'contenu', 'embedding_hash', 'article__titre'))
+
+
+@dataclass(frozen=True)
+class Source:
+    """Objets indexés dans un même index vectoriel."""
+    name: str
+    model: type
+    queryset: Callable
+    text: Callable
+
+
+SOURCES = {
+    'articles': Source('articles', Article, published_articles, article_text),
+    'solutions': Source('solutions', Solution, validated_solutions, solution_text),
+}
+
+
+def content_hash(text, backend_name):
+    # Le nom du backend fait partie de l'empreinte : en changer force un recalcul
+    return hashlib.sha256(f"{backend_name}\x1f{text}".encode('utf-8')).hexdigest()
+
+
+@dataclass
+class Stats:
+    parcourus: int = 0
+    calcules: int = 0
+    inchanges: int = 0
+    supprimes: int = 0
+    appels: int = 0
+    debut: float = field(default_factory=time.monotonic)
+
+    @property
+    def duree(self):
+        return time.monotonic() - self.debut
+
+    @property
+    def debit(self):
+        return self.calcules / self.duree if self.duree else 0.0
+
+    def __str__(self):
+        return (f"{self.parcourus} parcouru(s), {self.calcules} calculé(s), "
+                f"{self.inchanges} inchangé(s), {self.supprimes} supprimé(s), "
+                f"{self.appels} appel(s) d'embedding, {self.duree:.1f}s ({self.debit:.0f}/s)")
+
+
+class EmbeddingPipeline:
+    """Recalcule uniquement les embeddings dont le texte a changé.
+
+    Les textes sont regroupés par lots de ``batch_size`` (un appel au backend
+    par lot) ; l'index vectoriel, les empreintes et le point de reprise sont
+    écrits ensemble tous les ``checkpoint_every`` objets, ce qui permet de
+    relancer une indexation interrompue sans refaire le travail déjà fait.
+    """
+
+    def __init__(self, batch_size=64, checkpoint_every=2048, checkpoint_path=None, progress=None):
+        self.batch_size = batch_size
+        self.checkpoint_every = max(checkpoint_every, batch_size)
+        self.checkpoint_path = Path(checkpoint_path or Path(settings.VECTOR_STORE_DIR) / 'checkpoint.json')
+        self.progress = progress or (lambda message: None)
+        self.backend = embedding.get_backend()
+
+    def load_checkpoint(self):
+        try:
+            return json.loads(self.checkpoint_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_checkpoint(self, checkpoint):
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        self.checkpoint_path.write_text(json.dumps(checkpoint))
+
+    def reset_checkpoint(self):
+        self.checkpoint_path.unlink(missing_ok=True)
+
+    def run(self, sources=SOURCES, full=False):
+        stats = {}
+        for name in sources:
+            stats[name] = self.run_source(SOURCES[name], full=full)
+        return stats
+
+    def run_source(self, source, full=False):
+        stats = Stats()
+        store = get_store(source.name)
+        checkpoint = self.load_checkpoint()
+        if full:
+            checkpoint.pop(source.name, None)
+        last_pk = checkpoint.get(source.name, 0)
+        # Vecteurs calculés par un autre backend : tout est à refaire
+        force = full or (len(store) > 0 and store.meta.get('backend') != self.backend.name)
+
+        pending, ready = [], []
+        queryset = source.queryset().filter(pk__gt=last_pk).order_by('pk')
+        for obj in queryset.iterator(chunk_size=self.checkpoint_every):
+            stats.parcourus += 1
+            digest = content_hash(source.text(obj), self.backend.name)
+            if force or digest != obj.embedding_hash or obj.pk not in store:
+                pending.append((obj, digest))
+            else:
+                stats.inchanges += 1
+            if len(pending) >= self.batch_size:
+                ready.append(self._embed(source, pending, stats))
+                pending = []
+            if stats.parcourus % self.checkpoint_every == 0:
+                self._commit(source, store, ready, obj.pk, checkpoint, stats)
+                ready = []
+        if pending:
+            ready.append(self._embed(source, pending, stats))
+        self._commit(source, store, ready, None, checkpoint, stats)
+
+        # Objets dépubliés ou supprimés depuis la dernière indexation
+        indexed = store.pks()
+        if indexed:
+            eligible = set(source.queryset().values_list('pk', flat=True))
+            stale = [pk for pk in indexed if pk not in eligible]
+            if stale:
+                store.remove(stale)
+                stats.supprimes = len(stale)
+        # Les lots de l'indexation sont fusionnés dans la matrice
+        store.compact()
+        return stats
+
+    def _embed(self, source, pending, stats):
+        vectors = embedding.get_embeddings([source.text(obj) for obj, _ in pending])
+        stats.appels += 1
+        stats.calcules += len(pending)
+        return pending, vectors
+
+    def _commit(self, source, store, ready, last_pk, checkpoint, stats):
+        if ready:
+            objs, ids, vectors = [], [], []
+            for pending, matrix in ready:
+                for (obj, digest), vector in zip(pending, matrix):
+                    obj.embedding_hash = digest
+                    objs.append(obj)
+                    ids.append(obj.pk)
+                    vectors.append(vector)
+            store.upsert(ids, vectors, self.backend.name, len(vectors[0]))
+            source.model.objects.bulk_update(objs, ['embedding_hash'], batch_size=500)
+        if last_pk is None:
+            checkpoint.pop(source.name, None)
+        else:
+            checkpoint[source.name] = last_pk
+        self.save_checkpoint(checkpoint)
+        if last_pk is not None:
+            self.progress(f"{source.name} : {stats}")
+
+    def sync(self, source, pk):
+        """Met à jour un seul objet après sa sauvegarde : au plus un appel au backend."""
+        store = get_store(source.name)
+        obj = source.queryset().filter(pk=pk).first()
+        if obj is None:
+            if pk in store:
+                store.remove([pk])
+                source.model.objects.filter(pk=pk).update(embedding_hash='')
+            return
+        digest = content_hash(source.text(obj), self.backend.name)
+        if digest == obj.embedding_hash and pk in store:
+            return
+        vector = embedding.get_embeddings([source.text(obj)])
+        store.upsert([pk], vector, self.backend.name, vector.shape[1])
+        source.model.objects.filter(pk=pk).update(embedding_hash=digest)
+
+
+# Les mises à jour déclenchées par les sauvegardes passent par un unique thread :
+# la requête n'attend pas l'API (entre processus, le verrou de vector_store sérialise les écritures).
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _run_sync(source_name, pk):
+    try:
+        EmbeddingPipeline().sync(SOURCES[source_name], pk)
+    except Exception:
+        logger.exception("Échec de la mise à jour de l'embedding %s #%s", source_name, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule_sync(source_name, pk):
+    global _executor
+    if not getattr(settings, 'EMBEDDING_SYNC_ON_SAVE', True):
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='embeddings')
+    _executor.submit(_run_sync, source_name, pk)
+
+
+def schedule_solutions_sync(article_pk):
+    """Met à jour les solutions indexées d'un article (après un changement de titre)."""
+    if not getattr(settings, 'EMBEDDING_SYNC_ON_SAVE', True):
+        return
+    for pk in Solution.objects.filter(article_id=article_pk, statut='valide').values_list('pk', flat=True):
+        schedule_sync('solutions', pk)
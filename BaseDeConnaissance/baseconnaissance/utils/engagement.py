@@ -0,0 +1,125 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+
+from baseconnaissance.models import Article, Commentaire, Feedback, Solution
+
+# Compteurs d'Article tenus à jour par les signaux de models.py ; les
+# solutions refusées ne sont comptées nulle part
+SOLUTION_FIELDS = {'valide': 'nb_solutions_validees', 'en_attente': 'nb_solutions_en_attente'}
+COUNTER_FIELDS = ['nb_solutions_validees', 'nb_solutions_en_attente', 'nb_commentaires', 'nb_feedbacks',
+                  'somme_notes']
+
+
+def _part(model, statut=None, note=None):
+    """Contribution d'un objet aux compteurs de son article."""
+    if model is Solution:
+        field = SOLUTION_FIELDS.get(statut)
+        return Counter({field: 1} if field else {})
+    if model is Commentaire:
+        return Counter(nb_commentaires=1)
+    return Counter(nb_feedbacks=1, somme_notes=note)
+
+
+def _current(instance):
+    return instance.article_id, _part(type(instance), getattr(instance, 'statut', None),
+                                      getattr(instance, 'note', None))
+
+
+def _initial(instance):
+    # Valeurs lues en base (TrackedFieldsMixin), sinon valeurs courantes
+    if not hasattr(instance, '_loaded_values'):
+        return _current(instance)
+    return instance.initial_value('article_id', instance.article_id), _part(
+        type(instance),
+        instance.initial_value('statut', getattr(instance, 'statut', None)),
+        instance.initial_value('note', getattr(instance, 'note', None)),
+    )
+
+
+def apply(deltas):
+    """Incréments atomiques (F()) : {article_id: {champ: delta}}."""
+    for article_id, champs in deltas.items():
+        updates = {}
+        for field, delta in champs.items():
+            if delta > 0:
+                updates[field] = F(field) + delta
+            elif delta < 0:
+                # Jamais négatif, même si le compteur a dérivé (recalculer_compteurs le corrige)
+                updates[field] = Greatest(F(field) + delta, 0)
+        if article_id and updates:
+            Article.objects.filter(pk=article_id).update(**updates)
+
+
+def child_saved(instance, created):
+    """Solution, Commentaire ou Feedback enregistré : création, changement de statut, de note ou d'article."""
+    article_id, part = _current(instance)
+    if created:
+        apply({article_id: part})
+        return
+    if not hasattr(instance, '_loaded_values'):
+        return
+    ancien_article, ancienne_part = _initial(instance)
+    deltas = defaultdict(Counter)
+    deltas[ancien_article].subtract(ancienne_part)
+    deltas[article_id].update(part)
+    apply(deltas)
+
+
+def child_deleted(instance, origin=None):
+    # Suppression en cascade d'un article : ses compteurs disparaissent avec lui
+    if isinstance(origin, Article) or getattr(origin, 'model', None) is Article:
+        return
+    article_id, part = _initial(instance)
+    deltas = {article_id: Counter()}
+    deltas[article_id].subtract(part)
+    apply(deltas)
+
+
+def compute(article_ids):
+    """Valeurs exactes des compteurs {article_id: {champ: valeur}}, recalculées depuis les tables sources."""
+    values = {pk: dict.fromkeys(COUNTER_FIELDS, 0) for pk in article_ids}
+    solutions = (Solution.objects.filter(article_id__in=article_ids, statut__in=SOLUTION_FIELDS)
+                 .values_list('article_id', 'statut').annotate(total=Count('id')).order_by())
+    for article_id, statut, total in solutions:
+        values[article_id][SOLUTION_FIELDS[statut]] = total
+    commentaires = (Commentaire.objects.filter(article_id__in=article_ids)
+                    .values_list('article_id').annotate(total=Count('id')).order_by())
+    for article_id, total in commentaires:
+        values[article_id]['nb_commentaires'] = total
+    feedbacks = (Feedback.objects.filter(article_id__in=article_ids)
+                 .values_list('article_id').annotate(total=Count('id'), somme=Sum('note')).order_by())
+    for article_id, total, somme in feedbacks:
+        values[article_id]['nb_feedbacks'] = total
+        values[article_id]['somme_notes'] = somme or 0
+    return values
+
+
+def recompute(article_ids=None, batch_size=1000, dry_run=False):
+    """Corrige les compteurs par lots d'articles ; retourne le nombre d'articles divergents."""
+    queryset = Article.objects.order_by('pk')
+    if article_ids:
+        queryset = queryset.filter(pk__in=article_ids)
+    corriges = 0
+    last_pk = 0
+    while True:
+        # Lecture et correction d'un lot dans la même transaction d'écriture :
+        # aucun incrément concurrent ne peut se glisser entre les deux
+        with transaction.atomic():
+            articles = list(queryset.filter(pk__gt=last_pk).only('id', *COUNTER_FIELDS)[:batch_size])
+            if not articles:
+                break
+            attendus = compute([article.pk for article in articles])
+            divergents = []
+            for article in articles:
+                if any(getattr(article, field) != valeur for field, valeur in attendus[article.pk].items()):
+                    for field, valeur in attendus[article.pk].items():
+                        setattr(article, field, valeur)
+                    divergents.append(article)
+            if divergents and not dry_run:
+                Article.objects.bulk_update(divergents, COUNTER_FIELDS)
+        corriges += len(divergents)
+        last_pk = articles[-1].pk
+    return corriges
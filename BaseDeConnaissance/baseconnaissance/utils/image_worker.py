@@ -0,0 +1,47 @@
+# Fonctions exécutées dans les processus du pool d'images (utils/avatars.py).
+# Comme pdf_worker, ce module n'importe pas Django.
+import io
+
+
+def _encode(image, format_, quality):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    if format_ == 'webp':
+        image.save(buffer, 'WEBP', quality=quality, method=4)
+    else:
+        if image.mode != 'RGB':
+            # JPEG sans transparence : composition sur fond blanc
+            source = image.convert('RGBA')
+            image = Image.new('RGB', source.size, 'white')
+            image.paste(source, mask=source.getchannel('A'))
+        image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def make_variants(data, sizes, formats, max_side, max_pixels, quality):
+    """Variantes carrées {'<taille>.<format>': octets} et l'original réduit ('original').
+
+    Aucune métadonnée n'est recopiée (EXIF, GPS, profil ICC) ; l'orientation
+    EXIF est appliquée aux pixels avant d'être perdue. Une image de plus de
+    ``max_pixels`` pixels est refusée avant décodage (ValueError).
+    """
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    largeur, hauteur = image.size
+    if largeur * hauteur > max_pixels:
+        raise ValueError(f"Image trop grande ({largeur}x{hauteur})")
+    # JPEG : décodage directement à une résolution réduite
+    image.draft('RGB', (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    transparent = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    image = image.convert('RGBA' if transparent else 'RGB')
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    variantes = {'original': _encode(image, 'jpeg', quality)}
+    for taille in sizes:
+        carre = ImageOps.fit(image, (taille, taille), Image.LANCZOS)
+        for format_ in formats:
+            variantes[f'{taille}.{format_}'] = _encode(carre, format_, quality)
+    return variantes
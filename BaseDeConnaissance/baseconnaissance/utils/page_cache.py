@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+
+# Verrous par empreinte de clé : bornés en nombre, partagés par les clés en collision
+_locks = [threading.Lock() for _ in range(64)]
+
+
+def _options():
+    return getattr(settings, 'PAGE_CACHE', {})
+
+
+def is_enabled():
+    return _options().get('ENABLED', True)
+
+
+def _generation_key(scope):
+    return f'page:gen:{scope}'
+
+
+def generation(scope):
+    """Génération courante d'une portée (``home``, ``article:<pk>``…).
+
+    Initialisée à l'horloge plutôt qu'à 1 : si l'entrée est évincée, on ne
+    retombe pas sur une génération dont les fragments sont encore en cache.
+    Le cache par défaut doit être partagé par les processus (voir CACHES) pour
+    qu'une invalidation atteigne tous les workers.
+    """
+    return cache.get_or_set(_generation_key(scope), time.time_ns, None)
+
+
+def bump(*scopes):
+    """Invalide tous les fragments construits pour ces portées."""
+    cache.set_many({_generation_key(scope): time.time_ns() for scope in scopes}, None)
+
+
+def get_or_build(key, build, timeout=None):
+    """Valeur en cache ou construite par ``build()`` une seule fois pour tous.
+
+    Les threads du processus attendent sur un verrou local ; entre processus,
+    un verrou (voir ``_acquire``) désigne le constructeur et les autres
+    attendent le résultat (au plus LOCK_TIMEOUT secondes avant de construire
+    eux-mêmes).
+    """
+    options = _options()
+    if timeout is None:
+        timeout = options.get('TIMEOUT', 600)
+    value = cache.get(key)
+    if value is not None:
+        return value
+    lock_timeout = options.get('LOCK_TIMEOUT', 10)
+    with _locks[zlib.crc32(key.encode('utf-8')) % len(_locks)]:
+        value = cache.get(key)
+        if value is not None:
+            return value
+        release = _acquire(f'{key}:lock', lock_timeout)
+        if release is None:
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                value = cache.get(key)
+                if value is not None:
+                    return value
+        try:
+            value = build()
+            cache.set(key, value, timeout)
+        finally:
+            if release is not None:
+                release()
+        return value
+
+
+def _acquire(lock_key, lock_timeout):
+    """Verrou entre processus ; renvoie la fonction qui le libère, ou None s'il est pris.
+
+    ``cache.add`` est atomique sur Redis ou Memcached, mais pas sur
+    FileBasedCache (lecture puis écriture du fichier) : deux processus
+    peuvent l'obtenir ensemble. Pour ce backend, le verrou est un fichier
+    créé avec O_CREAT | O_EXCL dans le répertoire du cache, repris une fois
+    LOCK_TIMEOUT écoulé si son détenteur a disparu.
+    """
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if not isinstance(backend, FileBasedCache):
+        if not cache.add(lock_key, 1, lock_timeout):
+            return None
+        return lambda: cache.delete(lock_key)
+    os.makedirs(backend._dir, exist_ok=True)
+    # Suffixe distinct de .djcache : ni clear() ni l'éviction ne touchent aux verrous
+    path = os.path.join(backend._dir, hashlib.md5(lock_key.encode('utf-8')).hexdigest() + '.lock')
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            try:
+                if os.path.getmtime(path) > time.time() - lock_timeout:
+                    return None
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            continue
+        return lambda: _remove(path)
+    return None
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def fragment(scope, name, build, timeout=None):
+    """Fragment ``name`` rattaché à la génération de ``scope``."""
+    if not is_enabled():
+        return build()
+    return get_or_build(f'page:{name}:g{generation(scope)}', build, timeout)
+
+
+def article_saved(article):
+    scopes = [f'article:{article.pk}']
+    # La page d'accueil ne liste que les articles publiés
+    if 'publie' in (article.statut, article.initial_value('statut')):
+        scopes.append('home')
+    bump(*scopes)
@@ -0,0 +1,74 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    """Curseur fourni mais illisible ou falsifié."""
+
+
+def encode_cursor(*values):
+    raw = json.dumps(values, separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Valeurs d'un curseur opaque, ou None s'il est absent ou invalide."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError, binascii.Error, json.JSONDecodeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def decode_position(token):
+    """Position (datetime, id) d'un curseur ; None sans curseur, InvalidCursor s'il est invalide."""
+    if not token:
+        return None
+    values = decode_cursor(token)
+    # L'identifiant doit être un entier (bool est exclu), la date une chaîne ISO
+    if not values or len(values) != 2 or not isinstance(values[0], str) or type(values[1]) is not int:
+        raise InvalidCursor(token)
+    try:
+        position = parse_datetime(values[0])
+    except ValueError:
+        position = None
+    if position is None:
+        raise InvalidCursor(token)
+    if settings.USE_TZ and timezone.is_naive(position):
+        position = timezone.make_aware(position)
+    return position, values[1]
+
+
+def keyset_page(queryset, cursor, page_size, field='date_creation'):
+    """Page suivant le curseur, triée par (field, id) décroissants.
+
+    Contrairement à OFFSET, le coût ne dépend pas de la profondeur de la page :
+    le curseur encode la clé (field, id) du dernier élément déjà affiché.
+    Le queryset peut produire des instances ou des lignes ``values()``.
+    Retourne (éléments, curseur de la page suivante ou None) ; lève
+    InvalidCursor si le curseur a été modifié.
+    """
+    queryset = queryset.order_by(f'-{field}', '-id')
+    position = decode_position(cursor)
+    if position is not None:
+        date, pk = position
+        queryset = queryset.filter(Q(**{f'{field}__lt': date}) | Q(**{field: date, 'id__lt': pk}))
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        if isinstance(last, dict):
+            next_cursor = encode_cursor(last[field].isoformat(), last['id'])
+        else:
+            next_cursor = encode_cursor(getattr(last, field).isoformat(), last.pk)
+    return items, next_cursor
@@ -0,0 +1,225 @@
+import hashlib
+import importlib.util
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from baseconnaissance.models import Article, DocumentPdf, PassagePdf
+from . import pdf_worker, search_index
+from .text import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Taille des blocs lus pour calculer l'empreinte d'un fichier
+BLOC_LECTURE = 1 << 20
+
+
+def _options():
+    return getattr(settings, 'PDF_EXTRACTION', {})
+
+
+def is_available():
+    """pypdf est une dépendance optionnelle : sans elle, les PDF ne sont pas indexés."""
+    return importlib.util.find_spec('pypdf') is not None
+
+
+def file_hash(fichier):
+    digest = hashlib.sha256()
+    with fichier.open('rb'):
+        for bloc in fichier.chunks(BLOC_LECTURE):
+            digest.update(bloc)
+    return digest.hexdigest()
+
+
+def split_passages(texte, taille):
+    """Découpe le texte d'une page en passages d'au plus ``taille`` caractères (aux espaces)."""
+    passage, longueur = [], 0
+    for mot in texte.split():
+        if passage and longueur + len(mot) > taille:
+            yield ' '.join(passage)
+            passage, longueur = [], 0
+        passage.append(mot)
+        longueur += len(mot) + 1
+    if passage:
+        yield ' '.join(passage)
+
+
+# Pool de processus partagé : l'extraction est gourmande en CPU et ne doit pas
+# occuper les threads du serveur. « spawn » : pdf_worker n'a pas besoin de Django.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_options().get('WORKERS', 2),
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def _store(document, debut, textes):
+    taille = _options().get('PASSAGE_SIZE', 2000)
+    PassagePdf.objects.bulk_create([
+        PassagePdf(document=document, page=debut + numero, position=position, texte=passage)
+        for numero, texte in enumerate(textes)
+        for position, passage in enumerate(split_passages(texte, taille))
+    ])
+    document.pages_extraites = debut + len(textes)
+    DocumentPdf.objects.filter(pk=document.pk).update(pages_extraites=document.pages_extraites,
+                                                      date_activite=timezone.now())
+
+
+def extract(document, path, progress=None):
+    """Extrait le texte du PDF page par page dans le pool de processus.
+
+    Le document est découpé en tâches de PAGES_PER_TASK pages, dont au plus
+    deux par processus sont en cours : la mémoire reste bornée quelle que soit
+    la taille du manuel, et les passages sont écrits dans l'ordre des pages.
+    """
+    options = _options()
+    pas = options.get('PAGES_PER_TASK', 8)
+    en_vol = 2 * options.get('WORKERS', 2)
+    pool = get_pool()
+    fenetre = deque()
+    try:
+        document.nb_pages = pool.submit(pdf_worker.page_count, path).result()
+        PassagePdf.objects.filter(document=document).delete()
+        DocumentPdf.objects.filter(pk=document.pk).update(
+            nb_pages=document.nb_pages, pages_extraites=0, statut='en_cours', erreur='', date_activite=timezone.now(),
+        )
+        for debut in range(0, document.nb_pages, pas):
+            fenetre.append(pool.submit(pdf_worker.extract_pages, path, debut, min(debut + pas, document.nb_pages)))
+            if len(fenetre) >= en_vol:
+                _store(document, *fenetre.popleft().result())
+                if progress:
+                    progress(f"{path} : {document.pages_extraites}/{document.nb_pages} pages")
+        while fenetre:
+            _store(document, *fenetre.popleft().result())
+    except Exception as exc:
+        for future in fenetre:
+            future.cancel()
+        if isinstance(exc, BrokenProcessPool):
+            _reset_pool()
+        logger.exception("Échec de l'extraction du PDF %s", path)
+        DocumentPdf.objects.filter(pk=document.pk).update(statut='erreur', erreur=str(exc)[:1000] or repr(exc))
+        document.statut = 'erreur'
+        return document
+    DocumentPdf.objects.filter(pk=document.pk).update(statut='extrait')
+    document.statut = 'extrait'
+    _reindex(Q(document_pdf=document))
+    return document
+
+
+def _reindex(condition):
+    # date_modification change : les réponses IA en cache pour ces articles sont périmées
+    Article.objects.filter(condition).update(date_modification=timezone.now())
+    search_index.index_articles(Article.objects.filter(condition).only('id'))
+
+
+def to_retry(prefix=''):
+    """Documents à (ré)extraire : en erreur, ou « en cours » sans activité depuis STALE_AFTER secondes.
+
+    Un processus arrêté en pleine extraction (plantage, worker tué) laisse son
+    document « en cours » : il est repris une fois le délai écoulé.
+    """
+    limite = timezone.now() - timedelta(seconds=_options().get('STALE_AFTER', 900))
+    return (Q(**{f'{prefix}statut': 'erreur'})
+            | Q(**{f'{prefix}statut': 'en_cours', f'{prefix}date_activite__lt': limite})
+            | Q(**{f'{prefix}statut': 'en_cours', f'{prefix}date_activite__isnull': True}))
+
+
+def claim(document):
+    """Réserve l'extraction d'un document à reprendre ; un seul processus l'obtient."""
+    claimed = DocumentPdf.objects.filter(to_retry(), pk=document.pk).update(
+        statut='en_cours', date_activite=timezone.now(),
+    )
+    return claimed == 1
+
+
+def process_article(article_id, progress=None):
+    """Rattache l'article au texte de son PDF ; seul un fichier jamais vu est extrait."""
+    article = Article.objects.filter(pk=article_id).only('id', 'fichier_pdf', 'document_pdf').first()
+    if article is None:
+        return None
+    document = created = None
+    if article.fichier_pdf:
+        document, created = DocumentPdf.objects.get_or_create(empreinte=file_hash(article.fichier_pdf),
+                                                              defaults={'date_activite': timezone.now()})
+    if article.document_pdf_id != (document.pk if document else None):
+        Article.objects.filter(pk=article_id).update(document_pdf=document)
+        _reindex(Q(pk=article_id))
+    # Un autre processus peut être en train d'extraire ce fichier : il réindexera l'article
+    if document is not None and (created or claim(document)):
+        extract(document, article.fichier_pdf.path, progress)
+    return document
+
+
+# Les extractions déclenchées par les sauvegardes passent par un thread unique
+# qui alimente le pool : la requête n'attend pas et les fichiers sont traités un à un.
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _run(article_id):
+    try:
+        process_article(article_id)
+    except Exception:
+        logger.exception("Échec du traitement du PDF de l'article #%s", article_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(article_id):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf-extraction')
+    _executor.submit(_run, article_id)
+
+
+def article_saved(article, created):
+    """Planifie le traitement après commit si le fichier PDF a été ajouté, remplacé ou retiré."""
+    nouveau = article.fichier_pdf.name or ''
+    if created and not nouveau:
+        return
+    if not created and str(article.initial_value('fichier_pdf') or '') == nouveau:
+        return
+    if not _options().get('ENABLED', True):
+        return
+    if not is_available():
+        logger.warning("pypdf n'est pas installé : le PDF de l'article #%s ne sera pas indexé", article.pk)
+        return
+    pk = article.pk
+    transaction.on_commit(lambda: schedule(pk))
+
+
+def add_excerpts(articles, query, limit=2):
+    """Renseigne ``article.extraits_pdf`` : passages du PDF contenant un mot de la requête."""
+    tokens = tokenize(query)
+    for article in articles:
+        article.extraits_pdf = []
+        if not article.document_pdf_id or not tokens:
+            continue
+        condition = Q()
+        for token in tokens:
+            condition |= Q(texte__icontains=token)
+        article.extraits_pdf = list(PassagePdf.objects.filter(condition, document_id=article.document_pdf_id)
+                                    .values_list('texte', flat=True)[:limit])
+    return articles
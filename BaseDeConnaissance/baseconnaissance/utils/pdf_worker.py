@@ -0,0 +1,24 @@
+# Fonctions exécutées dans les processus du pool d'extraction (utils/pdf_text.py).
+# Ce module n'importe pas Django : les processus sont lancés en « spawn » et
+# n'ont ni réglages ni connexion à la base.
+
+
+def page_count(path):
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def extract_pages(path, debut, fin):
+    """Texte des pages [debut, fin) : seules ces pages sont décodées.
+
+    Une page illisible donne un texte vide plutôt que d'interrompre le document.
+    """
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    textes = []
+    for numero in range(debut, fin):
+        try:
+            textes.append(reader.pages[numero].extract_text() or '')
+        except Exception:
+            textes.append('')
+    return debut, textes
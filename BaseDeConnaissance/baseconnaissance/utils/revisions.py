@@ -0,0 +1,179 @@
+import difflib
+import json
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+
+from baseconnaissance.models import Article, Revision
+
+
+def _options():
+    return getattr(settings, 'REVISIONS', {})
+
+
+def _lines(texte):
+    return texte.splitlines(keepends=True)
+
+
+# --- Deltas ---
+# Un delta est une liste d'opérations sur les lignes de la version précédente :
+# entier positif = lignes recopiées, entier négatif = lignes sautées,
+# liste de chaînes = lignes insérées.
+
+def make_delta(ancien, nouveau):
+    a, b = _lines(ancien), _lines(nouveau)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append(b[j1:j2])
+    return ops
+
+
+def apply_delta(ancien, ops):
+    a = _lines(ancien)
+    lignes, position = [], 0
+    for op in ops:
+        if isinstance(op, list):
+            lignes.extend(op)
+        elif op > 0:
+            lignes.extend(a[position:position + op])
+            position += op
+        else:
+            position -= op
+    return ''.join(lignes)
+
+
+def encode(texte, precedent=None):
+    """Texte complet compressé, ou delta compressé avec ``precedent``."""
+    if precedent is None:
+        return zlib.compress(texte.encode('utf-8'), 9)
+    delta = json.dumps(make_delta(precedent, texte), ensure_ascii=False, separators=(',', ':'))
+    return zlib.compress(delta.encode('utf-8'), 9)
+
+
+def decode(revision, precedent=None):
+    donnees = zlib.decompress(bytes(revision.donnees)).decode('utf-8')
+    if revision.est_instantane:
+        return donnees
+    return apply_delta(precedent, json.loads(donnees))
+
+
+# --- Lecture ---
+
+def content(article_id, version):
+    """Contenu de l'article à ``version`` : dernier instantané puis deltas suivants."""
+    instantane = (Revision.objects.filter(article_id=article_id, version__lte=version, est_instantane=True)
+                  .order_by('-version').first())
+    if instantane is None:
+        raise Revision.DoesNotExist(f"Aucune révision {version} pour l'article {article_id}")
+    texte = decode(instantane)
+    for revision in (Revision.objects.filter(article_id=article_id, version__gt=instantane.version,
+                                             version__lte=version).order_by('version')):
+        texte = decode(revision, texte)
+    return texte
+
+
+def diff(article_id, de, a):
+    """Lignes du diff unifié entre deux versions (titre compris)."""
+    revisions = {r.version: r for r in Revision.objects.filter(article_id=article_id, version__in=[de, a])
+                 .only('version', 'titre')}
+    if de not in revisions or a not in revisions:
+        raise Revision.DoesNotExist(f"Versions {de}/{a} introuvables pour l'article {article_id}")
+    ancien = f"# {revisions[de].titre}\n\n{content(article_id, de)}"
+    nouveau = f"# {revisions[a].titre}\n\n{content(article_id, a)}"
+    return list(difflib.unified_diff(_lines(ancien), _lines(nouveau), f'v{de}', f'v{a}', n=3))
+
+
+# --- Écriture ---
+
+def record(article, version, titre, texte):
+    """Ajoute la révision ``version`` ; un instantané tous les SNAPSHOT_INTERVAL versions."""
+    derniere = (Revision.objects.filter(article=article, version__lt=version)
+                .order_by('-version').only('version', 'profondeur').first())
+    intervalle = _options().get('SNAPSHOT_INTERVAL', 10)
+    if derniere is None or derniere.profondeur + 1 >= intervalle:
+        donnees = encode(texte)
+        profondeur = 0
+    else:
+        # Delta avec la révision précédente telle qu'enregistrée (l'article a pu
+        # être modifié sans révision, par un bulk_create ou un update())
+        donnees = encode(texte, content(article.pk, derniere.version))
+        profondeur = derniere.profondeur + 1
+    return Revision.objects.create(
+        article=article, version=version, titre=titre, est_instantane=profondeur == 0,
+        profondeur=profondeur, donnees=donnees, taille=len(texte),
+    )
+
+
+def articles_created(articles):
+    """Première révision (instantané) d'articles créés par bulk_create, en une requête."""
+    Revision.objects.bulk_create([
+        Revision(article=article, version=article.version, titre=article.titre, est_instantane=True,
+                 profondeur=0, donnees=encode(article.contenu), taille=len(article.contenu))
+        for article in articles
+    ])
+
+
+def article_saved(article, created):
+    """Nouvelle version à chaque modification du titre ou du contenu."""
+    if created:
+        record(article, article.version, article.titre, article.contenu)
+        return
+    if not hasattr(article, '_loaded_values') or {'titre', 'contenu'} & article.get_deferred_fields():
+        return
+    ancien_titre = article.initial_value('titre', article.titre)
+    ancien_contenu = article.initial_value('contenu', article.contenu)
+    if (ancien_titre, ancien_contenu) == (article.titre, article.contenu):
+        return
+    with transaction.atomic():
+        # Ligne de l'article verrouillée (sous SQLite, BEGIN IMMEDIATE sérialise les écritures) :
+        # deux modifications simultanées ne peuvent pas prendre le même numéro de version
+        courante = Article.objects.select_for_update().filter(pk=article.pk).values_list('version', flat=True).first()
+        derniere = (Revision.objects.filter(article=article).order_by('-version')
+                    .values_list('version', flat=True).first())
+        if derniere is None:
+            # Article antérieur à l'historique : l'état d'avant la modification sert de point de départ
+            derniere = max(courante or 0, article.version)
+            record(article, derniere, ancien_titre, ancien_contenu)
+        article.version = max(derniere, courante or 0, article.version) + 1
+        Article.objects.filter(pk=article.pk).update(version=article.version)
+        record(article, article.version, article.titre, article.contenu)
+
+
+def compact(article_id, garder=None, intervalle=None, dry_run=False):
+    """Réécrit l'historique d'un article et retourne (octets avant, octets après, révisions supprimées).
+
+    Les instantanés sont replacés tous les ``intervalle`` versions et, si
+    ``garder`` est donné, seules les ``garder`` dernières versions sont conservées.
+    Seules les révisions dont l'encodage change sont réécrites.
+    """
+    intervalle = intervalle or _options().get('SNAPSHOT_INTERVAL', 10)
+    revisions = list(Revision.objects.filter(article_id=article_id).order_by('version'))
+    supprimees = revisions[:-garder] if garder else []
+    avant = apres = 0
+    modifiees = []
+    texte = conserve = None
+    profondeur = -1
+    for index, revision in enumerate(revisions):
+        avant += len(revision.donnees)
+        texte = decode(revision, texte)
+        if index < len(supprimees):
+            continue
+        profondeur = 0 if profondeur < 0 or profondeur + 1 >= intervalle else profondeur + 1
+        donnees = encode(texte, conserve if profondeur else None)
+        conserve = texte
+        apres += len(donnees)
+        if (donnees, profondeur) != (bytes(revision.donnees), revision.profondeur):
+            revision.donnees, revision.profondeur, revision.est_instantane = donnees, profondeur, profondeur == 0
+            modifiees.append(revision)
+    if not dry_run:
+        with transaction.atomic():
+            Revision.objects.filter(pk__in=[revision.pk for revision in supprimees]).delete()
+            Revision.objects.bulk_update(modifiees, ['donnees', 'profondeur', 'est_instantane'])
+    return avant, apres, len(supprimees)
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import F
+
+from baseconnaissance.models import Profile
+
+ADMINISTRATEURS = 'Administrateurs'
+REDACTEURS = 'Rédacteurs'
+
+
+def _cache_key(user_id, version):
+    return f'roles:{user_id}:v{version}'
+
+
+def _version(user):
+    # Lue avec l'utilisateur de la session (ProfileModelBackend charge le profil)
+    try:
+        return user.profile.version_roles
+    except Profile.DoesNotExist:
+        return None
+
+
+def group_names(user):
+    """Noms des groupes de l'utilisateur.
+
+    Lus une fois par requête (mémorisés sur l'objet ``user``) et partagés entre
+    requêtes via le cache Django, sous une clé qui porte ``Profile.version_roles``.
+    Les receivers de models.py incrémentent cette version en base quand les
+    groupes changent : chaque processus, même avec un cache local, cesse
+    d'utiliser l'ancienne entrée dès la requête suivante.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    names = getattr(user, '_role_names', None)
+    if names is None:
+        version = _version(user)
+        key = _cache_key(user.pk, version) if version is not None else None
+        names = cache.get(key) if key else None
+        if names is None:
+            names = frozenset(user.groups.values_list('name', flat=True))
+            if key:
+                cache.set(key, names, getattr(settings, 'ROLES_CACHE_TIMEOUT', 3600))
+        user._role_names = names
+    return names
+
+
+def invalidate(user_ids):
+    user_ids = list(user_ids)
+    if user_ids:
+        Profile.objects.filter(user_id__in=user_ids).update(version_roles=F('version_roles') + 1)
+
+
+def group_member_ids(group):
+    return list(User.objects.filter(groups=group).values_list('pk', flat=True))
+
+
+def is_admin(user):
+    return user.is_superuser or ADMINISTRATEURS in group_names(user)
+
+
+def is_redacteur(user):
+    return REDACTEURS in group_names(user)
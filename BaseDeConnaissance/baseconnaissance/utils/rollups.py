@@ -0,0 +1,176 @@
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from baseconnaissance.models import (
+    ArticleVue, Recherche, RechercheJournaliere, Statistique, VueJournaliere,
+)
+from .text import normalize
+
+# État des agrégations, rangé dans Statistique sous ce préfixe ; ce ne sont pas
+# des compteurs du tableau de bord et stats.verify() les ignore
+KEY_PREFIX = 'rollups.'
+# Dernier jour entièrement agrégé (ordinal de date) : les jours suivants sont
+# recalculés à chaque passage, les données brutes antérieures peuvent être purgées.
+WATERMARK_KEY = KEY_PREFIX + 'dernier_jour_complet'
+# Premier jour dont les données brutes sont intactes (ordinal) : les jours
+# antérieurs ont été purgés et ne peuvent plus être recalculés.
+PURGE_KEY = KEY_PREFIX + 'premier_jour_conserve'
+
+
+def normalize_terme(terme):
+    return normalize(terme)[:255]
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return start, start + datetime.timedelta(days=1)
+
+
+def get_watermark():
+    ordinal = Statistique.objects.filter(cle=WATERMARK_KEY).values_list('valeur', flat=True).first()
+    return datetime.date.fromordinal(ordinal) if ordinal else None
+
+
+def set_watermark(day):
+    Statistique.objects.update_or_create(cle=WATERMARK_KEY, defaults={'valeur': day.toordinal()})
+
+
+def first_kept_day():
+    ordinal = Statistique.objects.filter(cle=PURGE_KEY).values_list('valeur', flat=True).first()
+    return datetime.date.fromordinal(ordinal) if ordinal else None
+
+
+def first_raw_day():
+    dates = [
+        ArticleVue.objects.order_by('date_vue').values_list('date_vue', flat=True).first(),
+        Recherche.objects.order_by('date_recherche').values_list('date_recherche', flat=True).first(),
+    ]
+    dates = [timezone.localdate(d) for d in dates if d]
+    return min(dates) if dates else None
+
+
+def rollup_views(day):
+    start, end = day_bounds(day)
+    rows = (ArticleVue.objects.filter(date_vue__gte=start, date_vue__lt=end)
+            .values_list('article_id').annotate(total=Count('id')).order_by())
+    with transaction.atomic():
+        VueJournaliere.objects.filter(jour=day).delete()
+        VueJournaliere.objects.bulk_create(
+            [VueJournaliere(jour=day, article_id=article_id, nb_vues=total) for article_id, total in rows],
+            batch_size=1000,
+        )
+
+
+def rollup_searches(day):
+    start, end = day_bounds(day)
+    totals = defaultdict(lambda: [0, 0])
+    rows = (Recherche.objects.filter(date_recherche__gte=start, date_recherche__lt=end)
+            .values_list('terme', 'resultats_trouves'))
+    for terme, resultats in rows.iterator(chunk_size=5000):
+        terme = normalize_terme(terme)
+        if not terme:
+            continue
+        totals[terme][0] += 1
+        if not resultats:
+            totals[terme][1] += 1
+    with transaction.atomic():
+        RechercheJournaliere.objects.filter(jour=day).delete()
+        RechercheJournaliere.objects.bulk_create(
+            [RechercheJournaliere(jour=day, terme=terme, nb_recherches=n, nb_sans_resultat=vides)
+             for terme, (n, vides) in totals.items()],
+            batch_size=1000,
+        )
+
+
+def run(today=None, since=None):
+    """Agrège chaque jour depuis le dernier jour complet ; idempotent.
+
+    ``since`` est ramené au premier jour non purgé. Retourne la liste des
+    jours traités. Le jour courant est agrégé mais reste
+    « incomplet » : il sera recalculé au prochain passage.
+    """
+    today = today or timezone.localdate()
+    watermark = get_watermark()
+    if since is None:
+        since = watermark + datetime.timedelta(days=1) if watermark else first_raw_day()
+    if since is None:
+        return []
+    # Un jour purgé serait recalculé à partir de rien : ses totaux sont conservés
+    kept = first_kept_day()
+    if kept and since < kept:
+        since = kept
+    days = []
+    day = since
+    while day <= today:
+        rollup_views(day)
+        rollup_searches(day)
+        days.append(day)
+        day += datetime.timedelta(days=1)
+    yesterday = today - datetime.timedelta(days=1)
+    if watermark is None or yesterday > watermark:
+        set_watermark(yesterday)
+    return days
+
+
+def purge(retention_days, batch_size=5000):
+    """Supprime par lots les événements bruts plus anciens que la rétention.
+
+    Seuls des jours entiers, déjà agrégés de façon définitive, sont purgés ;
+    le premier jour conservé est enregistré pour que ``run`` ne recalcule
+    jamais un jour purgé.
+    """
+    watermark = get_watermark()
+    if watermark is None:
+        return {}
+    kept = min(
+        timezone.localdate() - datetime.timedelta(days=retention_days),
+        watermark + datetime.timedelta(days=1),
+    )
+    previous = first_kept_day()
+    if previous and previous > kept:
+        kept = previous
+    Statistique.objects.update_or_create(cle=PURGE_KEY, defaults={'valeur': kept.toordinal()})
+    cutoff = day_bounds(kept)[0]
+    deleted = {}
+    for model, field in ((ArticleVue, 'date_vue'), (Recherche, 'date_recherche')):
+        total = 0
+        while True:
+            ids = list(model.objects.filter(**{f'{field}__lt': cutoff})
+                       .order_by().values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            model.objects.filter(pk__in=ids).delete()
+            total += len(ids)
+        deleted[model.__name__] = total
+    return deleted
+
+
+def recherches_sans_resultat(days=7, limit=10):
+    depuis = timezone.localdate() - datetime.timedelta(days=days)
+    return (RechercheJournaliere.objects
+            .filter(jour__gte=depuis, nb_sans_resultat__gt=0)
+            .values('terme')
+            .annotate(total=Sum('nb_sans_resultat'), dernier_jour=Max('jour'))
+            .order_by('-total', 'terme')[:limit])
+
+
+def tendance(days=30):
+    """Séries quotidiennes (jour, vues, recherches, sans résultat) sur ``days`` jours."""
+    depuis = timezone.localdate() - datetime.timedelta(days=days - 1)
+    vues = dict(VueJournaliere.objects.filter(jour__gte=depuis)
+                .values_list('jour').annotate(total=Sum('nb_vues')).order_by())
+    recherches = {
+        jour: (total, vides)
+        for jour, total, vides in RechercheJournaliere.objects.filter(jour__gte=depuis)
+        .values_list('jour').annotate(total=Sum('nb_recherches'), vides=Sum('nb_sans_resultat')).order_by()
+    }
+    serie = []
+    for offset in range(days):
+        jour = depuis + datetime.timedelta(days=offset)
+        total, vides = recherches.get(jour, (0, 0))
+        serie.append({'jour': jour, 'vues': vues.get(jour, 0), 'recherches': total, 'sans_resultat': vides})
+    return serie
@@ -0,0 +1,244 @@
+from django.db import connections, router
+from django.db.models import Q, prefetch_related_objects
+
+from baseconnaissance.models import Article, Solution
+from . import embedding
+from .text import tokenize
+from .vector_store import get_store
+
+# Table virtuelle FTS5 créée par la migration 0005 (SQLite uniquement).
+# remove_diacritics rend l'index insensible aux accents et à la casse.
+FTS_TABLE = 'baseconnaissance_article_fts'
+FTS_TOKENIZER = 'unicode61 remove_diacritics 2'
+
+# Poids BM25 par colonne : un terme dans le titre compte plus que dans le contenu,
+# lui-même plus que dans le texte du PDF joint (souvent long et moins ciblé)
+POIDS_TITRE = 10.0
+POIDS_CONTENU = 1.0
+POIDS_PDF = 0.5
+BM25 = f'bm25({FTS_TABLE}, {POIDS_TITRE}, {POIDS_CONTENU}, {POIDS_PDF})'
+
+# Colonne « pdf » : passages extraits du PDF de l'article (utils/pdf_text.py)
+TEXTE_PDF_SQL = """(SELECT group_concat(p.texte, ' ') FROM baseconnaissance_passagepdf p
+                    WHERE p.document_id = a.document_pdf_id)"""
+INDEX_SQL = f"""
+    INSERT INTO {FTS_TABLE}(rowid, titre, contenu, pdf)
+    SELECT a.id, a.titre, a.contenu, {TEXTE_PDF_SQL}
+    FROM baseconnaissance_article a
+    WHERE a.statut = 'publie'
+"""
+
+SEARCH_SQL = f"""
+    SELECT a.*, hits.score, COUNT(*) OVER () AS total_hits
+    FROM (
+        SELECT rowid AS article_id, {BM25} AS score
+        FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH %s
+    ) AS hits
+    JOIN baseconnaissance_article a ON a.id = hits.article_id
+    WHERE a.statut = 'publie'
+    ORDER BY hits.score, a.id
+    LIMIT %s OFFSET %s
+"""
+
+
+# Fusion des classements mot-clé / sémantique (Reciprocal Rank Fusion)
+RRF_K = 60
+HYBRID_CANDIDATES = 100
+SCORE_SEMANTIQUE_MIN = 0.2
+
+
+def is_available(using=None):
+    using = using or router.db_for_read(Article)
+    return connections[using].vendor == 'sqlite'
+
+
+def build_match_query(query):
+    """Transforme la saisie utilisateur en requête FTS5 (ET implicite, préfixes)."""
+    tokens = tokenize(query) or tokenize(query, stop_words=False)
+    # Les tokens ne contiennent que [a-z0-9] : les guillemets suffisent à les échapper
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search(query, offset=0, limit=20):
+    """Retourne (articles classés de la page, nombre total de résultats)."""
+    match = build_match_query(query)
+    if not match:
+        return [], 0
+    if not is_available():
+        return _search_fallback(query, offset, limit)
+
+    using = router.db_for_read(Article)
+    results = list(Article.objects.using(using).raw(SEARCH_SQL, [match, limit, offset]))
+    if results:
+        total = results[0].total_hits
+    elif offset:
+        # Page au-delà de la fin : le total n'est pas porté par une ligne
+        total = count(query)
+    else:
+        total = 0
+    prefetch_related_objects(results, 'auteur')
+    return results, total
+
+
+def count(query):
+    match = build_match_query(query)
+    if not match:
+        return 0
+    if not is_available():
+        return _fallback_queryset(query).count()
+    with connections[router.db_for_read(Article)].cursor() as cursor:
+        cursor.execute(
+            f"""SELECT COUNT(*) FROM {FTS_TABLE}
+                JOIN baseconnaissance_article a ON a.id = {FTS_TABLE}.rowid
+                WHERE {FTS_TABLE} MATCH %s AND a.statut = 'publie'""",
+            [match],
+        )
+        return cursor.fetchone()[0]
+
+
+def keyword_ids(query, limit=HYBRID_CANDIDATES):
+    """Identifiants des meilleurs résultats BM25, sans charger les articles."""
+    match = build_match_query(query)
+    if not match:
+        return []
+    if not is_available():
+        return list(_fallback_queryset(query).order_by('-date_creation').values_list('id', flat=True)[:limit])
+    with connections[router.db_for_read(Article)].cursor() as cursor:
+        cursor.execute(
+            f"""SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s
+                ORDER BY {BM25} LIMIT %s""",
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def semantic_ids(query, limit=HYBRID_CANDIDATES):
+    """Articles les plus proches, directement ou via une de leurs solutions validées."""
+    articles, solutions = get_store('articles'), get_store('solutions')
+    if not (len(articles) or len(solutions)) or not query.strip():
+        return []
+    vector = embedding.get_embedding(query)
+    hits = [(pk, score) for pk, score in articles.query(vector, limit) if score >= SCORE_SEMANTIQUE_MIN]
+    solution_hits = [(pk, score) for pk, score in solutions.query(vector, limit) if score >= SCORE_SEMANTIQUE_MIN]
+    if solution_hits:
+        article_of = dict(Solution.objects.filter(pk__in=[pk for pk, _ in solution_hits])
+                          .values_list('pk', 'article_id'))
+        hits += [(article_of[pk], score) for pk, score in solution_hits if pk in article_of]
+    ranked = []
+    for pk, _ in sorted(hits, key=lambda hit: -hit[1]):
+        if pk not in ranked:
+            ranked.append(pk)
+    return ranked[:limit]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    scores = {}
+    for ranking in rankings:
+        for rank, pk in enumerate(ranking):
+            scores[pk] = scores.get(pk, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda pk: (-scores[pk], pk))
+
+
+def hybrid_search(query, offset=0, limit=20):
+    """Mélange les résultats BM25 et les plus proches voisins de l'index vectoriel.
+
+    Les HYBRID_CANDIDATES premiers résultats de chaque classement sont fusionnés ;
+    au-delà de cette fenêtre, les pages continuent avec les autres résultats
+    BM25. Le total est exact : la fenêtre plus les résultats mot-clé restants.
+    """
+    fused = reciprocal_rank_fusion([keyword_ids(query, HYBRID_CANDIDATES), semantic_ids(query, HYBRID_CANDIDATES)])
+    page_ids = fused[offset:offset + limit]
+    if len(page_ids) < limit:
+        page_ids += _keyword_rest_ids(query, fused, max(offset - len(fused), 0), limit - len(page_ids))
+    articles = Article.objects.filter(statut='publie').select_related('auteur').in_bulk(page_ids)
+    results = [articles[pk] for pk in page_ids if pk in articles]
+    return results, len(fused) + _keyword_rest_count(query, fused)
+
+
+def _keyword_rest_sql(exclude):
+    marqueurs = ', '.join(['%s'] * len(exclude)) or 'NULL'
+    return f"""FROM {FTS_TABLE} JOIN baseconnaissance_article a ON a.id = {FTS_TABLE}.rowid
+               WHERE {FTS_TABLE} MATCH %s AND a.statut = 'publie' AND a.id NOT IN ({marqueurs})"""
+
+
+def _keyword_rest_ids(query, exclude, offset, limit):
+    """Résultats mot-clé absents de ``exclude``, dans l'ordre BM25."""
+    match = build_match_query(query)
+    if not match:
+        return []
+    if not is_available():
+        queryset = _fallback_queryset(query).exclude(pk__in=exclude).order_by('-date_creation')
+        return list(queryset.values_list('id', flat=True)[offset:offset + limit])
+    with connections[router.db_for_read(Article)].cursor() as cursor:
+        cursor.execute(
+            f"SELECT a.id {_keyword_rest_sql(exclude)} ORDER BY {BM25}, a.id LIMIT %s OFFSET %s",
+            [match, *exclude, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _keyword_rest_count(query, exclude):
+    match = build_match_query(query)
+    if not match:
+        return 0
+    if not is_available():
+        return _fallback_queryset(query).exclude(pk__in=exclude).count()
+    with connections[router.db_for_read(Article)].cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) {_keyword_rest_sql(exclude)}", [match, *exclude])
+        return cursor.fetchone()[0]
+
+
+def _fallback_queryset(query):
+    return Article.objects.filter(
+        Q(titre__icontains=query) | Q(contenu__icontains=query),
+        statut='publie',
+    ).select_related('auteur')
+
+
+def _search_fallback(query, offset, limit):
+    queryset = _fallback_queryset(query).order_by('-date_creation')
+    return list(queryset[offset:offset + limit]), queryset.count()
+
+
+def index_article(article):
+    """Met à jour l'entrée de l'article : seuls les articles publiés sont indexés."""
+    index_articles([article])
+
+
+def index_articles(articles):
+    """Met à jour un lot d'entrées (après un bulk_create, sans signaux, par exemple).
+
+    Le texte est relu en base : le PDF joint n'a pas à être chargé en mémoire.
+    """
+    using = router.db_for_write(Article)
+    if connections[using].vendor != 'sqlite':
+        return
+    ids = [article.pk for article in articles]
+    with connections[using].cursor() as cursor:
+        for debut in range(0, len(ids), 500):
+            lot = ids[debut:debut + 500]
+            marqueurs = ', '.join(['%s'] * len(lot))
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({marqueurs})', lot)
+            cursor.execute(f'{INDEX_SQL} AND a.id IN ({marqueurs})', lot)
+
+
+def remove_article(article_id):
+    using = router.db_for_write(Article)
+    if connections[using].vendor != 'sqlite':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [article_id])
+
+
+def rebuild():
+    """Reconstruit entièrement l'index à partir des articles publiés."""
+    using = router.db_for_write(Article)
+    if connections[using].vendor != 'sqlite':
+        return 0
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(INDEX_SQL)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
@@ -0,0 +1,97 @@
+import logging
+import queue
+import threading
+
+from django.conf import settings
+
+from baseconnaissance.models import Recherche
+from .background import PeriodicFlusher
+
+logger = logging.getLogger(__name__)
+
+
+class SearchLogWriter(PeriodicFlusher):
+    """Journal des recherches écrit par lots hors du chemin de la requête.
+
+    Les ``Recherche`` sont placées dans une file bornée puis insérées par
+    ``bulk_create``. File pleine : la politique ``'drop'`` abandonne l'entrée
+    immédiatement, ``'block'`` attend au plus ``block_timeout`` secondes
+    qu'une place se libère (contre-pression) avant de l'abandonner.
+    """
+
+    def __init__(self, flush_interval=2, max_queue=5000, batch_size=500, policy='drop', block_timeout=0.05):
+        super().__init__(flush_interval, name='search-log')
+        if policy not in ('drop', 'block'):
+            raise ValueError(f"Politique de file inconnue : {policy}")
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def log(self, terme, resultats_trouves, user_id=None, ip_address=None):
+        recherche = Recherche(
+            terme=terme[:255],
+            utilisateur_id=user_id,
+            ip_address=ip_address,
+            resultats_trouves=resultats_trouves,
+        )
+        try:
+            if self.policy == 'block':
+                self.queue.put(recherche, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(recherche)
+        except queue.Full:
+            with self._dropped_lock:
+                self._dropped += 1
+            return False
+        self.start()
+        if self.queue.qsize() >= self.batch_size:
+            self.wake()
+        return True
+
+    def flush(self):
+        written = 0
+        while True:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            if batch:
+                Recherche.objects.bulk_create(batch)
+                written += len(batch)
+            if len(batch) < self.batch_size:
+                break
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            logger.warning("%s recherche(s) non journalisée(s) : file pleine", dropped)
+        return written
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                options = getattr(settings, 'SEARCH_LOGGING', {})
+                _writer = SearchLogWriter(
+                    flush_interval=options.get('FLUSH_INTERVAL', 2),
+                    max_queue=options.get('MAX_QUEUE', 5000),
+                    batch_size=options.get('BATCH_SIZE', 500),
+                    policy=options.get('POLICY', 'drop'),
+                    block_timeout=options.get('BLOCK_TIMEOUT', 0.05),
+                )
+    return _writer
+
+
+def log_search(request, terme, resultats_trouves):
+    user_id = request.user.pk if request.user.is_authenticated else None
+    return get_writer().log(terme, resultats_trouves, user_id, request.META.get('REMOTE_ADDR'))
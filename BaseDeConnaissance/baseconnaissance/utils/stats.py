@@ -0,0 +1,123 @@
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from baseconnaissance.models import Article, Categorie, Feedback, Statistique
+from . import rollups
+
+# Clés des compteurs tenus à jour par les signaux de models.py :
+#   articles, articles.statut.<statut>, articles.categorie.<id>,
+#   categories, utilisateurs, feedbacks, feedbacks.somme_notes
+MODEL_KEYS = {
+    Categorie: 'categories',
+    User: 'utilisateurs',
+}
+
+
+def statut_key(statut):
+    return f'articles.statut.{statut}'
+
+
+def categorie_key(categorie_id):
+    return f'articles.categorie.{categorie_id}'
+
+
+def adjust(deltas):
+    """Applique des incréments atomiques (F()) aux compteurs, en les créant au besoin."""
+    for cle, delta in deltas.items():
+        if not delta:
+            continue
+        if not Statistique.objects.filter(cle=cle).update(valeur=F('valeur') + delta):
+            with transaction.atomic():
+                stat, created = Statistique.objects.select_for_update().get_or_create(
+                    cle=cle, defaults={'valeur': delta}
+                )
+                if not created:
+                    Statistique.objects.filter(pk=stat.pk).update(valeur=F('valeur') + delta)
+
+
+def forget(cle):
+    Statistique.objects.filter(cle=cle).delete()
+
+
+def article_saved(article, created):
+    deltas = Counter()
+    if created:
+        deltas['articles'] += 1
+        deltas[statut_key(article.statut)] += 1
+        deltas[categorie_key(article.categorie_id)] += 1
+    elif hasattr(article, '_loaded_values'):
+        old_statut = article.initial_value('statut', article.statut)
+        if old_statut != article.statut:
+            deltas[statut_key(old_statut)] -= 1
+            deltas[statut_key(article.statut)] += 1
+        old_categorie = article.initial_value('categorie_id', article.categorie_id)
+        if old_categorie != article.categorie_id:
+            deltas[categorie_key(old_categorie)] -= 1
+            deltas[categorie_key(article.categorie_id)] += 1
+    adjust(deltas)
+
+
+def article_deleted(article):
+    adjust({
+        'articles': -1,
+        statut_key(article.statut): -1,
+        categorie_key(article.categorie_id): -1,
+    })
+
+
+def feedback_saved(feedback, created):
+    if created:
+        adjust({'feedbacks': 1, 'feedbacks.somme_notes': feedback.note})
+    elif hasattr(feedback, '_loaded_values'):
+        adjust({'feedbacks.somme_notes': feedback.note - feedback.initial_value('note', feedback.note)})
+
+
+def read():
+    """Compteurs stockés, sans l'état des agrégations (rollups.KEY_PREFIX) rangé dans la même table."""
+    return dict(Statistique.objects.exclude(cle__startswith=rollups.KEY_PREFIX).values_list('cle', 'valeur'))
+
+
+def value(cle, default=0):
+    valeur = Statistique.objects.filter(cle=cle).values_list('valeur', flat=True).first()
+    return default if valeur is None else valeur
+
+
+def compute():
+    """Valeurs exactes recalculées depuis les tables sources."""
+    values = {
+        'articles': Article.objects.count(),
+        'categories': Categorie.objects.count(),
+        'utilisateurs': User.objects.count(),
+    }
+    for statut, _ in Article.STATUT_CHOIX:
+        values[statut_key(statut)] = 0
+    for statut, total in Article.objects.values_list('statut').annotate(total=Count('id')).order_by():
+        values[statut_key(statut)] = total
+    for categorie_id, total in Categorie.objects.values_list('id').annotate(total=Count('articles')).order_by():
+        values[categorie_key(categorie_id)] = total
+    feedbacks = Feedback.objects.aggregate(total=Count('id'), somme=Sum('note'))
+    values['feedbacks'] = feedbacks['total']
+    values['feedbacks.somme_notes'] = feedbacks['somme'] or 0
+    return values
+
+
+def verify(repair=False):
+    """Retourne les écarts {clé: (stocké, attendu)} et les corrige si ``repair``."""
+    expected = compute()
+    stored = read()
+    # Un compteur absent vaut 0 (catégorie encore vide, par exemple)
+    drift = {
+        cle: (stored.get(cle), expected.get(cle))
+        for cle in set(expected) | set(stored)
+        if stored.get(cle, 0) != expected.get(cle, 0)
+    }
+    if repair and drift:
+        with transaction.atomic():
+            Statistique.objects.filter(cle__in=[cle for cle in drift if cle not in expected]).delete()
+            for cle, (_, valeur) in drift.items():
+                if cle in expected:
+                    Statistique.objects.update_or_create(cle=cle, defaults={'valeur': valeur})
+    return drift
@@ -0,0 +1,228 @@
+import bisect
+import datetime
+import heapq
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from baseconnaissance.models import Article, RechercheJournaliere
+from .text import MOTS_VIDES, tokenize
+
+# Préfixes courts mémorisés : ce sont les plus fréquents et les plus coûteux à fusionner
+MEMO_PREFIXE_MAX = 2
+# Suggestions examinées au plus pour une saisie de plusieurs mots (les plus populaires d'abord)
+SCAN_MAX = 2000
+
+
+def _options():
+    return getattr(settings, 'SUGGESTIONS', {})
+
+
+@dataclass
+class Suggestion:
+    texte: str
+    poids: float
+    type: str
+    article_id: int = None
+    mots: frozenset = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.mots = frozenset(tokenize(self.texte, stop_words=False))
+
+
+class PrefixIndex:
+    """Index de préfixes en mémoire : vocabulaire trié (bisect) et listes par mot.
+
+    Chaque mot significatif pointe vers les suggestions qui le contiennent,
+    triées par poids décroissant. Une requête « mots complets + préfixe »
+    parcourt la plage du vocabulaire couverte par le préfixe puis filtre sur
+    les mots complets ; aucune base de données n'est interrogée.
+    """
+
+    def __init__(self, suggestions=()):
+        self.entries = {}
+        postings = {}
+        for key, suggestion in suggestions:
+            self.entries[key] = suggestion
+            for mot in suggestion.mots - MOTS_VIDES:
+                postings.setdefault(mot, []).append(key)
+        for keys in postings.values():
+            keys.sort(key=self._rang)
+        self.postings = postings
+        self.vocabulaire = sorted(postings)
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _rang(self, key):
+        return (-self.entries[key].poids, key)
+
+    def add(self, key, suggestion):
+        with self._lock:
+            self._discard(key)
+            self.entries[key] = suggestion
+            for mot in suggestion.mots - MOTS_VIDES:
+                keys = self.postings.get(mot)
+                if keys is None:
+                    keys = self.postings[mot] = []
+                    bisect.insort(self.vocabulaire, mot)
+                bisect.insort(keys, key, key=self._rang)
+            self._memo.clear()
+
+    def remove(self, key):
+        with self._lock:
+            self._discard(key)
+            self._memo.clear()
+
+    def _discard(self, key):
+        suggestion = self.entries.get(key)
+        if suggestion is None:
+            return
+        for mot in suggestion.mots - MOTS_VIDES:
+            keys = self.postings[mot]
+            keys.remove(key)
+            if not keys:
+                del self.postings[mot]
+                del self.vocabulaire[bisect.bisect_left(self.vocabulaire, mot)]
+        del self.entries[key]
+
+    def _filtrer(self, prefixe, complets, limit):
+        """Parcourt la liste (triée par poids) du mot complet le plus rare, avec arrêt anticipé."""
+        if not complets <= self.postings.keys():
+            return []
+        plus_rare = min(complets, key=lambda mot: len(self.postings[mot]))
+        meilleurs = []
+        for key in self.postings[plus_rare][:SCAN_MAX]:
+            mots = self.entries[key].mots
+            if complets <= mots and any(mot.startswith(prefixe) for mot in mots):
+                meilleurs.append(key)
+                if len(meilleurs) == limit:
+                    break
+        return meilleurs
+
+    def search(self, query, limit=8):
+        tokens = tokenize(query, stop_words=False)
+        if not tokens:
+            return []
+        prefixe = tokens[-1]
+        complets = frozenset(tokens[:-1]) - MOTS_VIDES
+        memo_key = (prefixe, limit) if not complets and len(prefixe) <= MEMO_PREFIXE_MAX else None
+        with self._lock:
+            if memo_key in self._memo:
+                return self._memo[memo_key]
+            if complets:
+                meilleurs = self._filtrer(prefixe, complets, limit)
+            else:
+                debut = bisect.bisect_left(self.vocabulaire, prefixe)
+                fin = bisect.bisect_left(self.vocabulaire, prefixe + '\uffff', debut)
+                # Chaque liste est triée par poids : ses ``limit`` premiers suffisent au top global
+                candidats = set()
+                for mot in self.vocabulaire[debut:fin]:
+                    candidats.update(self.postings[mot][:limit])
+                meilleurs = heapq.nsmallest(limit, candidats, key=self._rang)
+            result = [self.entries[key] for key in meilleurs]
+            if memo_key is not None:
+                self._memo[memo_key] = result
+            return result
+
+
+def poids(total):
+    return 1.0 + math.log1p(total)
+
+
+def article_suggestion(pk, titre, vues):
+    return f'a:{pk}', Suggestion(titre, poids(vues), 'article', pk)
+
+
+def load():
+    """Titres des articles publiés (pondérés par les vues) et recherches fructueuses fréquentes."""
+    options = _options()
+    suggestions = [
+        article_suggestion(pk, titre, vues)
+        for pk, titre, vues in Article.objects.filter(statut='publie')
+        .values_list('pk', 'titre', 'vues').iterator(chunk_size=5000)
+    ]
+    depuis = timezone.localdate() - datetime.timedelta(days=options.get('RECHERCHES_JOURS', 90))
+    termes = (RechercheJournaliere.objects.filter(jour__gte=depuis)
+              .values_list('terme')
+              .annotate(total=Sum(F('nb_recherches') - F('nb_sans_resultat')))
+              .filter(total__gte=options.get('RECHERCHES_MIN', 3))
+              .order_by())
+    suggestions += [(f'r:{terme}', Suggestion(terme, poids(total), 'recherche')) for terme, total in termes]
+    return PrefixIndex(suggestions)
+
+
+_index = None
+_built_at = 0.0
+_refreshing = False
+_lock = threading.Lock()
+
+
+def get_index():
+    """Index du processus, construit au premier appel puis rafraîchi en arrière-plan.
+
+    Pendant un rafraîchissement, l'ancien index continue de répondre.
+    """
+    global _index, _built_at, _refreshing
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index, _built_at = load(), time.monotonic()
+        return _index
+    if time.monotonic() - _built_at > _options().get('REFRESH_INTERVAL', 900) and not _refreshing:
+        with _lock:
+            if not _refreshing:
+                _refreshing = True
+                threading.Thread(target=_refresh, name='suggestions-refresh', daemon=True).start()
+    return _index
+
+
+def _refresh():
+    global _index, _built_at, _refreshing
+    try:
+        index = load()
+        with _lock:
+            _index, _built_at = index, time.monotonic()
+    finally:
+        _refreshing = False
+        close_old_connections()
+
+
+def suggest(query, limit=None):
+    return get_index().search(query, limit or _options().get('LIMIT', 8))
+
+
+def article_saved(article):
+    """Publication, modification ou dépublication : mise à jour incrémentale après commit."""
+    if _index is None:
+        return
+    if article.statut == 'publie':
+        key, suggestion = article_suggestion(article.pk, article.titre, article.vues)
+        transaction.on_commit(lambda: _index.add(key, suggestion))
+    elif article.initial_value('statut') == 'publie':
+        article_deleted(article)
+
+
+def articles_created(articles):
+    """Articles créés par bulk_create (import) : ajoutés en une fois après commit."""
+    if _index is None:
+        return
+    ajouts = [article_suggestion(article.pk, article.titre, article.vues)
+              for article in articles if article.statut == 'publie']
+    if ajouts:
+        transaction.on_commit(lambda: [_index.add(key, suggestion) for key, suggestion in ajouts])
+
+
+def article_deleted(article):
+    if _index is None:
+        return
+    key = f'a:{article.pk}'
+    transaction.on_commit(lambda: _index.remove(key))
@@ -0,0 +1,29 @@
+import re
+import unicodedata
+
+# Mots vides français ignorés lors de la normalisation des requêtes
+MOTS_VIDES = frozenset("""
+a au aux avec ce ces cet cette comment d dans de des du elle en est et eux il ils
+je l la le les leur leurs lui m ma mais me meme mes moi mon n ne nos notre nous on
+ou par pas pour qu que quel quelle quels quelles qui s sa sans se ses si son sur t
+ta te tes toi ton tu un une vos votre vous y quoi dont
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def strip_accents(text):
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def normalize(text):
+    """Minuscules, sans accents, espaces compactés."""
+    return ' '.join(strip_accents(text or '').lower().split())
+
+
+def tokenize(text, stop_words=True):
+    tokens = _TOKEN_RE.findall(normalize(text))
+    if stop_words:
+        tokens = [t for t in tokens if t not in MOTS_VIDES]
+    return tokens
@@ -0,0 +1,303 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Le journal est fusionné dans une nouvelle matrice quand il dépasse
+# COMPACT_RATIO de celle-ci (et au moins COMPACT_MIN enregistrements) :
+# le coût total des réécritures reste proportionnel à la taille de l'index
+COMPACT_MIN = 1000
+COMPACT_RATIO = 0.25
+
+
+def _delta_dtype(dimension):
+    # Enregistrements de taille fixe : identifiant, suppression, vecteur
+    return np.dtype([('pk', '<i8'), ('supprime', '?'), ('vector', '<f4', (dimension,))])
+
+
+class _Etat:
+    """Vue cohérente d'une génération et du journal lu jusqu'à ``offset`` ; jamais modifiée."""
+
+    def __init__(self, generation=None, meta=None, vectors=None, ids=None, rows=None, delta=None, offset=0):
+        self.generation = generation
+        self.meta = meta or {}
+        self.vectors = vectors
+        self.ids = np.zeros(0, dtype=np.int64) if ids is None else ids
+        self.rows = rows or {}
+        # pk -> vecteur, ou None si supprimé ; prime sur la matrice
+        self.delta = delta or {}
+        self.offset = offset
+        self.masked = np.array([self.rows[pk] for pk in self.delta if pk in self.rows], dtype=np.int64)
+        vivants = [(pk, vector) for pk, vector in self.delta.items() if vector is not None]
+        self.delta_ids = np.array([pk for pk, _ in vivants], dtype=np.int64)
+        self.delta_vectors = np.stack([vector for _, vector in vivants]) if vivants else None
+
+    def __len__(self):
+        return len(self.ids) - len(self.masked) + len(self.delta_ids)
+
+    def __contains__(self, pk):
+        if pk in self.delta:
+            return self.delta[pk] is not None
+        return pk in self.rows
+
+    def pks(self):
+        base = np.delete(self.ids, self.masked) if len(self.masked) else self.ids
+        return [int(pk) for pk in base] + [int(pk) for pk in self.delta_ids]
+
+    def matrix(self):
+        """Ids et vecteurs vivants, journal fusionné (chargés en mémoire)."""
+        vectors = np.asarray(self.vectors, dtype=np.float32)
+        ids = self.ids
+        if len(self.masked):
+            vectors, ids = np.delete(vectors, self.masked, axis=0), np.delete(ids, self.masked)
+        if self.delta_vectors is not None:
+            vectors = np.vstack([vectors, self.delta_vectors])
+            ids = np.concatenate([ids, self.delta_ids])
+        return ids, vectors
+
+
+class VectorStore:
+    """Index vectoriel sur disque : matrice float32 normalisée ouverte en mmap et journal des modifications.
+
+    Chaque génération est un répertoire <nom>/<génération>/ : vectors.npy (une
+    ligne par objet), ids.npy (identifiants Django alignés), meta.json (backend
+    et dimension) et delta.bin, journal en ajout seul des vecteurs modifiés et
+    des suppressions. Une modification courante ajoute un enregistrement au
+    journal ; quand il devient trop long, il est fusionné dans une nouvelle
+    génération, publiée par un seul renommage du fichier CURRENT : un lecteur
+    ne voit jamais une matrice et des identifiants dépareillés. Les écrivains
+    de tous les processus sont sérialisés par un verrou de fichier.
+    """
+
+    def __init__(self, name, directory=None):
+        self.name = name
+        self.directory = Path(directory or settings.VECTOR_STORE_DIR) / name
+        self._lock = threading.Lock()
+        self._etat = _Etat()
+
+    @property
+    def current_path(self):
+        return self.directory / 'CURRENT'
+
+    @property
+    def meta(self):
+        self._refresh()
+        return self._etat.meta
+
+    def __len__(self):
+        self._refresh()
+        return len(self._etat)
+
+    def __contains__(self, pk):
+        self._refresh()
+        return int(pk) in self._etat
+
+    def pks(self):
+        """Identifiants présents dans l'index."""
+        self._refresh()
+        return self._etat.pks()
+
+    def _refresh(self):
+        """Suit la génération courante et les ajouts au journal, y compris ceux des autres processus."""
+        with self._lock:
+            for attempt in range(3):
+                try:
+                    self._etat = self._load(self._etat)
+                    return
+                except FileNotFoundError:
+                    # Génération remplacée puis supprimée pendant la lecture : CURRENT est relu
+                    if attempt == 2:
+                        raise
+
+    def _load(self, etat):
+        try:
+            generation = self.current_path.read_text().strip()
+        except FileNotFoundError:
+            return _Etat()
+        path = self.directory / generation
+        if generation != etat.generation:
+            ids = np.load(path / 'ids.npy')
+            etat = _Etat(
+                generation,
+                json.loads((path / 'meta.json').read_text()),
+                np.load(path / 'vectors.npy', mmap_mode='r') if len(ids) else np.load(path / 'vectors.npy'),
+                ids,
+                {int(pk): row for row, pk in enumerate(ids)},
+            )
+        dtype = _delta_dtype(etat.meta['dimension'])
+        count = (os.stat(path / 'delta.bin').st_size - etat.offset) // dtype.itemsize
+        if count <= 0:
+            return etat
+        # Un enregistrement en cours d'écriture (incomplet) sera lu au prochain passage
+        with open(path / 'delta.bin', 'rb') as f:
+            f.seek(etat.offset)
+            records = np.frombuffer(f.read(count * dtype.itemsize), dtype=dtype)
+        delta = dict(etat.delta)
+        for record in records:
+            delta[int(record['pk'])] = None if record['supprime'] else np.array(record['vector'])
+        return _Etat(etat.generation, etat.meta, etat.vectors, etat.ids, etat.rows, delta,
+                     etat.offset + count * dtype.itemsize)
+
+    def query(self, vector, k=10):
+        """Top-k (id, score cosinus) : un produit matrice-vecteur sur la matrice, un sur le journal."""
+        self._refresh()
+        etat = self._etat
+        if not len(etat):
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        if query.shape[0] != etat.meta['dimension']:
+            return []
+        norm = np.linalg.norm(query)
+        if not norm:
+            return []
+        query = query / norm
+        scores, ids = etat.vectors @ query, etat.ids
+        if len(etat.masked):
+            scores[etat.masked] = -np.inf
+        if etat.delta_vectors is not None:
+            scores = np.concatenate([scores, etat.delta_vectors @ query])
+            ids = np.concatenate([ids, etat.delta_ids])
+        k = min(k, len(etat))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def upsert(self, ids, vectors, backend_name, dimension):
+        """Ajoute ou remplace des lignes par un ajout au journal, sans réécrire la matrice."""
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        meta = {'backend': backend_name, 'dimension': dimension}
+        with self._writing() as etat:
+            if etat.generation is None or etat.meta != meta:
+                # Autre backend ou autre dimension : les anciens vecteurs ne sont plus comparables
+                self._publish(np.asarray(ids, dtype=np.int64), vectors, meta)
+                return
+            records = np.zeros(len(ids), dtype=_delta_dtype(dimension))
+            records['pk'] = ids
+            records['vector'] = vectors
+            self._append(etat, records)
+
+    def remove(self, ids):
+        with self._writing() as etat:
+            ids = [int(pk) for pk in ids if int(pk) in etat]
+            if not ids:
+                return
+            records = np.zeros(len(ids), dtype=_delta_dtype(etat.meta['dimension']))
+            records['pk'] = ids
+            records['supprime'] = True
+            self._append(etat, records)
+
+    def compact(self):
+        """Fusionne le journal dans une nouvelle génération (fin d'une indexation complète)."""
+        with self._writing() as etat:
+            if etat.delta:
+                self._compact(etat)
+
+    def clear(self):
+        with self._writing():
+            self.current_path.unlink(missing_ok=True)
+            self._remove_generations(keep=None)
+        self._refresh()
+
+    @contextmanager
+    def _writing(self):
+        """Verrou exclusif entre processus ; fournit l'état à jour de l'index."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / 'lock', 'a+b') as lock:
+            _lock_file(lock)
+            try:
+                self._refresh()
+                yield self._etat
+            finally:
+                _unlock_file(lock)
+        self._refresh()
+
+    def _append(self, etat, records):
+        with open(self.directory / etat.generation / 'delta.bin', 'ab') as f:
+            f.write(records.tobytes())
+        if len(etat.delta) + len(records) > max(COMPACT_MIN, COMPACT_RATIO * len(etat.ids)):
+            self._refresh()
+            self._compact(self._etat)
+
+    def _compact(self, etat):
+        ids, vectors = etat.matrix()
+        self._publish(ids, vectors, etat.meta)
+
+    def _publish(self, ids, vectors, meta):
+        # Génération complète écrite à part, puis rendue visible par un seul renommage
+        generation = f'g{time.time_ns()}'
+        tmp = Path(tempfile.mkdtemp(dir=self.directory, prefix='.tmp-'))
+        try:
+            np.save(tmp / 'vectors.npy', vectors)
+            np.save(tmp / 'ids.npy', ids)
+            (tmp / 'meta.json').write_text(json.dumps(meta))
+            (tmp / 'delta.bin').touch()
+            os.replace(tmp, self.directory / generation)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        _atomic_write(self.current_path, lambda f: f.write(generation.encode('ascii')))
+        self._remove_generations(keep=generation)
+
+    def _remove_generations(self, keep):
+        # Les lecteurs qui ont encore l'ancienne matrice en mmap la gardent (POSIX) ;
+        # ailleurs, un répertoire encore ouvert est supprimé à la compaction suivante
+        for path in self.directory.iterdir():
+            if path.is_dir() and path.name != keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def _lock_file(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock_file(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _atomic_write(path, writer):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            writer(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(name='articles'):
+    with _stores_lock:
+        if name not in _stores:
+            _stores[name] = VectorStore(name)
+        return _stores[name]
@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from baseconnaissance.models import Article, ArticleVue
+from .background import PeriodicFlusher
+
+
+class ViewTracker(PeriodicFlusher):
+    """Comptage des consultations d'articles hors du chemin de la requête.
+
+    ``record()`` ne fait qu'ajouter la vue à un tampon en mémoire ; le thread
+    d'écriture crée les ``ArticleVue`` par ``bulk_create`` et applique un seul
+    ``F('vues') + n`` par groupe d'articles. Une même personne (utilisateur ou,
+    à défaut, adresse IP) n'est comptée qu'une fois par fenêtre ``dedup_window``.
+    """
+
+    def __init__(self, flush_interval=5, dedup_window=1800, max_buffer=10000):
+        super().__init__(flush_interval, name='article-views')
+        self.dedup_window = dedup_window
+        self.max_buffer = max_buffer
+        self._lock = threading.Lock()
+        self._pending = []
+        self._seen = {}
+
+    def record(self, article_id, user_id=None, ip_address=None):
+        """Retourne False si la vue est un doublon ou si le tampon est saturé."""
+        key = (article_id, user_id or ip_address)
+        now = time.monotonic()
+        with self._lock:
+            last = self._seen.get(key)
+            if last is not None and now - last < self.dedup_window:
+                return False
+            if len(self._pending) >= self.max_buffer:
+                return False
+            self._seen[key] = now
+            self._pending.append((article_id, user_id, ip_address))
+            full = len(self._pending) >= self.max_buffer // 2
+        self.start()
+        if full:
+            self.wake()
+        return True
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            limit = time.monotonic() - self.dedup_window
+            self._seen = {key: seen for key, seen in self._seen.items() if seen >= limit}
+        if not pending:
+            return 0
+
+        increments = Counter(article_id for article_id, _, _ in pending)
+        by_increment = defaultdict(list)
+        for article_id, count in increments.items():
+            by_increment[count].append(article_id)
+        with transaction.atomic():
+            existing = set(Article.objects.filter(pk__in=increments).values_list('pk', flat=True))
+            ArticleVue.objects.bulk_create([
+                ArticleVue(article_id=article_id, utilisateur_id=user_id, ip_address=ip_address)
+                for article_id, user_id, ip_address in pending
+                if article_id in existing
+            ], batch_size=500)
+            for count, article_ids in by_increment.items():
+                Article.objects.filter(pk__in=article_ids).update(vues=F('vues') + count)
+        return len(pending)
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker():
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                options = getattr(settings, 'VIEW_TRACKING', {})
+                _tracker = ViewTracker(
+                    flush_interval=options.get('FLUSH_INTERVAL', 5),
+                    dedup_window=options.get('DEDUP_WINDOW', 1800),
+                    max_buffer=options.get('MAX_BUFFER', 10000),
+                )
+    return _tracker
+
+
+def record_view(request, article):
+    user_id = request.user.pk if request.user.is_authenticated else None
+    return get_tracker().record(article.pk, user_id, request.META.get('REMOTE_ADDR'))
@@ -1,51 +1,72 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.conf import settings
-from django.db.models import Count, Avg
-from django.utils import timezone
-from datetime import timedelta
-import google.generativeai as genai
-from .models import Article, Categorie, ArticleVue, Recherche, Feedback, Solution, Commentaire
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Prefetch, Q
+from django.db.models.functions import Substr
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from .models import Article, Categorie, ArticleVue, Solution, Commentaire, Revision
+from .middleware import get_stats as get_sql_stats
+from .utils import ai, article_io, category_tree, page_cache, pdf_text, revisions, rollups, search_index, stats, suggestions
+from .utils.ai_cache import get_cache as get_ai_cache
+from .utils.pagination import InvalidCursor, keyset_page
+from .utils.roles import is_admin, is_redacteur
+from .utils.search_log import log_search
+from .utils.view_tracking import record_view
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-def is_admin(user):
-    return user.is_superuser or user.groups.filter(name='Administrateurs').exists()
-
-def is_redacteur(user):
-    return user.groups.filter(name='Rédacteurs').exists()
+SEARCH_PAGE_SIZE = 20
+SUGGESTION_QUERY_MAX = 100
+MODERATION_PAGE_SIZE = 20
+# Longueur de l'extrait de contenu chargé pour la file de modération
+MODERATION_EXTRAIT = 1000
+# Commentaires et solutions rendus avec l'article ; la suite est chargée au défilement
+COMMENTAIRES_PAGE_SIZE = 20
+SOLUTIONS_PAGE_SIZE = 10
 
 @login_required
 @user_passes_test(is_admin)
 def admin_dashboard(request):
-    # Statistiques générales
-    total_articles = Article.objects.count()
-    articles_publies = Article.objects.filter(statut='publie').count()
-    articles_en_attente = Article.objects.filter(statut='en_attente').count()
-    total_categories = Categorie.objects.count()
-    total_utilisateurs = User.objects.count()
+    # Statistiques générales : compteurs pré-agrégés (utils/stats.py)
+    compteurs = stats.read()
+    total_articles = compteurs.get('articles', 0)
+    articles_publies = compteurs.get(stats.statut_key('publie'), 0)
+    articles_en_attente = compteurs.get(stats.statut_key('en_attente'), 0)
+    total_categories = compteurs.get('categories', 0)
+    total_utilisateurs = compteurs.get('utilisateurs', 0)
     
     # Articles les plus vus
-    articles_populaires = Article.objects.filter(statut='publie').order_by('-vues')[:5]
+    articles_populaires = Article.objects.filter(statut='publie').select_related('categorie').order_by('-vues')[:5]
     
-    # Recherches sans résultats (7 derniers jours)
-    date_limite = timezone.now() - timedelta(days=7)
-    recherches_sans_resultats = Recherche.objects.filter(
-        resultats_trouves=0,
-        date_recherche__gte=date_limite
-    ).order_by('-date_recherche')[:10]
+    # Recherches sans résultats (7 derniers jours), depuis les agrégats journaliers
+    recherches_sans_resultats = rollups.recherches_sans_resultat(days=7, limit=10)
     
     # Satisfaction moyenne
-    satisfaction_moyenne = Feedback.objects.aggregate(Avg('note'))['note__avg'] or 0
+    nb_feedbacks = compteurs.get('feedbacks', 0)
+    satisfaction_moyenne = compteurs.get('feedbacks.somme_notes', 0) / nb_feedbacks if nb_feedbacks else 0
     
     # Articles récents
-    articles_recents = Article.objects.order_by('-date_creation')[:5]
+    articles_recents = Article.objects.select_related('auteur').order_by('-date_creation')[:5]
+    
+    # Statistiques par catégorie : articles directs et cumul de la branche
+    arbre = category_tree.get_tree()
+    directs = {pk: compteurs.get(stats.categorie_key(pk), 0) for pk in arbre.nodes}
+    totaux = arbre.rollup(directs)
+    stats_categories = [
+        {'categorie': noeud, 'nb_articles': directs[noeud.pk], 'nb_articles_total': totaux[noeud.pk]}
+        for noeud in arbre.walk()
+    ]
     
-    # Statistiques par catégorie
-    stats_categories = Categorie.objects.annotate(
-        nb_articles=Count('articles')
-    ).order_by('-nb_articles')
+    # Tendances sur 30 jours, depuis les agrégats journaliers
+    tendance = rollups.tendance(days=30)
     
     context = {
         'total_articles': total_articles,
@@ -58,10 +79,43 @@ def admin_dashboard(request):
         'satisfaction_moyenne': round(satisfaction_moyenne, 1),
         'articles_recents': articles_recents,
         'stats_categories': stats_categories,
+        'tendance': tendance,
+        'tendance_max_vues': max([point['vues'] for point in tendance] + [1]),
+        'tendance_max_recherches': max([point['recherches'] for point in tendance] + [1]),
     }
     
     return render(request, 'admin_dashboard.html', context)
 
+@login_required
+@user_passes_test(is_admin)
+def ai_cache_stats(request):
+    return JsonResponse(get_ai_cache().stats())
+
+@login_required
+@user_passes_test(is_admin)
+def sql_stats(request):
+    return JsonResponse(get_sql_stats())
+
+@login_required
+@user_passes_test(is_admin)
+def exporter_articles(request):
+    """Export en flux (JSONL ou CSV, format d'import de ``importer_articles``)."""
+    format_ = request.GET.get('format', 'jsonl')
+    statut = request.GET.get('statut') or None
+    if format_ not in ('jsonl', 'csv') or (statut and statut not in dict(Article.STATUT_CHOIX)):
+        return HttpResponse(status=400)
+    queryset = article_io.export_queryset(statut)
+    if isinstance(request, ASGIRequest):
+        # Sous ASGI, un itérateur synchrone serait lu en entier avant l'envoi
+        content = article_io.aiter_export(queryset, format_)
+    else:
+        records = article_io.export_records(queryset)
+        content = article_io.iter_csv(records) if format_ == 'csv' else article_io.iter_jsonl(records)
+    content_type = 'text/csv; charset=utf-8' if format_ == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="articles.{format_}"'
+    return response
+
 @login_required
 @user_passes_test(is_redacteur)
 def redacteur_dashboard(request):
@@ -72,10 +126,10 @@ def redacteur_dashboard(request):
     articles_brouillon = mes_articles.filter(statut='brouillon').count()
     
     # Recent articles by this redacteur
-    articles_recents = mes_articles[:5]
+    articles_recents = mes_articles.select_related('categorie')[:5]
     
     # Articles with most views by this redacteur
-    articles_populaires = mes_articles.filter(statut='publie').order_by('-vues')[:5]
+    articles_populaires = mes_articles.filter(statut='publie').select_related('categorie').order_by('-vues')[:5]
     
     context = {
         'mes_articles': mes_articles,
@@ -136,7 +190,8 @@ def editer_article(request, article_id):
                 article.contenu = contenu
                 article.categorie = categorie
                 article.statut = 'en_attente'  # Reset to pending when edited
-                article.save()
+                # update_fields : ne pas écraser les vues comptées entre-temps
+                article.save(update_fields=['titre', 'contenu', 'categorie', 'statut', 'date_modification'])
                 return redirect('mes_articles')
             except Categorie.DoesNotExist:
                 pass
@@ -147,10 +202,80 @@ def editer_article(request, article_id):
         'categories': categories
     })
 
+@login_required
+def historique_article(request, article_id):
+    # Historique visible par l'auteur de l'article et les administrateurs
+    articles = Article.objects.only('id', 'titre', 'version', 'auteur')
+    if not is_admin(request.user):
+        articles = articles.filter(auteur=request.user)
+    article = get_object_or_404(articles, id=article_id)
+    versions = list(article.revisions.order_by('-version')
+                    .only('article', 'version', 'taille', 'date_creation'))
+    diff = []
+    de = a = None
+    if len(versions) > 1:
+        try:
+            a = int(request.GET.get('a', versions[0].version))
+            de = int(request.GET.get('de', versions[1].version))
+            diff = revisions.diff(article.pk, de, a)
+        except (ValueError, Revision.DoesNotExist):
+            return HttpResponse(status=400)
+    return render(request, 'historique_article.html', {
+        'article': article,
+        'versions': versions,
+        'de': de,
+        'a': a,
+        'diff': diff,
+    })
+
 @login_required
 def articles_a_valider(request):
-    articles = Article.objects.all().prefetch_related('solutions', 'auteur', 'categorie')
-    return render(request, 'articles_a_valider.html', {'articles': articles})
+    # File de modération : par défaut les articles en attente et ceux ayant
+    # des solutions en attente, paginés par curseur (date_creation, id)
+    statut = request.GET.get('statut', 'a_traiter')
+    categorie_id = request.GET.get('categorie', '')
+    
+    solutions_en_attente = Solution.objects.filter(statut='en_attente')
+    articles = Article.objects.select_related('auteur', 'categorie').only(
+        'id', 'titre', 'statut', 'date_creation', 'nb_solutions_validees', 'auteur__username', 'categorie__nom',
+    ).annotate(
+        extrait=Substr('contenu', 1, MODERATION_EXTRAIT),
+    ).prefetch_related(Prefetch(
+        'solutions',
+        queryset=solutions_en_attente.select_related('auteur').only(
+            'id', 'article_id', 'contenu', 'statut', 'date_creation', 'auteur__username',
+        ).order_by('date_creation'),
+        to_attr='solutions_en_attente',
+    ))
+    if statut == 'a_traiter':
+        articles = articles.filter(
+            Q(statut='en_attente') | Q(pk__in=solutions_en_attente.values('article_id'))
+        )
+    elif statut in dict(Article.STATUT_CHOIX):
+        articles = articles.filter(statut=statut)
+    arbre = category_tree.get_tree()
+    if categorie_id.isdigit() and int(categorie_id) in arbre.nodes:
+        # La catégorie et toutes ses sous-catégories, par intervalle sur le chemin indexé
+        articles = articles.filter(**category_tree.subtree_filter(arbre.nodes[int(categorie_id)].chemin, 'categorie__'))
+    
+    try:
+        articles, next_cursor = keyset_page(articles, request.GET.get('apres'), MODERATION_PAGE_SIZE)
+    except InvalidCursor:
+        return HttpResponse(status=400)
+    filtres = request.GET.copy()
+    filtres.pop('apres', None)
+    
+    return render(request, 'articles_a_valider.html', {
+        'articles': articles,
+        'next_cursor': next_cursor,
+        'filtres': filtres.urlencode(),
+        'statut': statut,
+        'statuts': [('a_traiter', 'À traiter'), ('tous', 'Tous')] + Article.STATUT_CHOIX,
+        'categorie_id': categorie_id,
+        # Libellés indentés selon la profondeur dans l'arbre
+        'categories': [(noeud.pk, '\u00a0\u00a0' * noeud.profondeur + noeud.nom) for noeud in arbre.walk()],
+        'articles_en_attente': stats.value(stats.statut_key('en_attente')),
+    })
 
 @login_required
 def valider_article(request, article_id):
@@ -163,7 +288,7 @@ def valider_article(request, article_id):
                 article.statut = 'publie'
             else:
                 article.statut = 'brouillon'
-            article.save()
+            article.save(update_fields=['statut', 'date_modification'])
         # Solution moderation
         if action in ['valider_solution', 'refuser_solution']:
             solution_id = request.POST.get('solution_id')
@@ -173,14 +298,66 @@ def valider_article(request, article_id):
     return redirect('articles_a_valider')
 
 def article_detail(request, article_id):
-    article = get_object_or_404(Article, id=article_id, statut='publie')
-    solutions = article.solutions.filter(statut='valide')
-    commentaires = article.commentaires.order_by('-date_creation')
-    return render(request, 'article_detail.html', {
-        'article': article,
-        'solutions': solutions,
-        'commentaires': commentaires,
-    })
+    # Seuls l'identifiant et la version sont lus : le reste de la page vient du cache
+    article = get_object_or_404(Article.objects.only('id', 'version'), id=article_id, statut='publie')
+    # Consultation bufferisée : écrite en lot par le thread de view_tracking
+    record_view(request, article)
+    contenu = page_cache.fragment(
+        f'article:{article.pk}', f'article:{article.pk}:v{article.version}',
+        lambda: _article_detail_fragments(article.pk),
+    )
+    # Formulaires (CSRF, utilisateur connecté) rendus hors du fragment en cache
+    return render(request, 'article_detail.html', {'article': article, **contenu})
+
+def _article_detail_fragments(article_id):
+    article = Article.objects.select_related('categorie').get(pk=article_id)
+    # Première page seulement : le poids de la page ne dépend pas du nombre de commentaires
+    solutions, solutions_suivantes = _solutions_page(article.pk, None)
+    commentaires, commentaires_suivants = _commentaires_page(article.pk, None)
+    return {
+        'titre': article.titre,
+        'article_html': render_to_string('fragments/article_contenu.html', {
+            'article': article,
+            'solutions': solutions,
+            'solutions_suivantes': solutions_suivantes,
+        }),
+        'nb_commentaires': article.nb_commentaires,
+        'commentaires_html': render_to_string('fragments/article_commentaires.html', {
+            'article_id': article.pk,
+            'commentaires': commentaires,
+            'commentaires_suivants': commentaires_suivants,
+        }),
+    }
+
+def _solutions_page(article_id, cursor):
+    solutions = Solution.objects.filter(article_id=article_id, statut='valide').select_related('auteur').only(
+        'id', 'article_id', 'contenu', 'date_creation', 'auteur__username',
+    )
+    return keyset_page(solutions, cursor, SOLUTIONS_PAGE_SIZE)
+
+def _commentaires_page(article_id, cursor):
+    commentaires = Commentaire.objects.filter(article_id=article_id).select_related('auteur').only(
+        'id', 'article_id', 'contenu', 'date_creation', 'auteur__username',
+    )
+    return keyset_page(commentaires, cursor, COMMENTAIRES_PAGE_SIZE)
+
+def _page_suivante(request, article_id, page, template, nom):
+    # Page suivant le curseur ``apres`` (voir keyset_page), en HTML prêt à insérer
+    get_object_or_404(Article.objects.only('id'), id=article_id, statut='publie')
+    try:
+        items, next_cursor = page(article_id, request.GET.get('apres'))
+    except InvalidCursor:
+        return JsonResponse({'erreur': "Curseur invalide."}, status=400)
+    response = JsonResponse({'html': render_to_string(template, {nom: items}), 'apres': next_cursor})
+    response['Cache-Control'] = 'max-age=60'
+    return response
+
+def article_solutions(request, article_id):
+    return _page_suivante(request, article_id, _solutions_page, 'fragments/solutions_liste.html', 'solutions')
+
+def article_commentaires(request, article_id):
+    return _page_suivante(request, article_id, _commentaires_page, 'fragments/commentaires_liste.html',
+                          'commentaires')
 
 @login_required
 def proposer_solution(request, article_id):
@@ -212,51 +389,76 @@ def ajouter_commentaire(request, article_id):
 def search_view(request):
     query = request.GET.get('q', '')
     results = []
-    ai_answer = None
+    total = 0
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
     
     if query:
-        # Enregistrer la recherche
-        resultats_count = Article.objects.filter(
-            statut='publie',
-            titre__icontains=query
-        ).count() + Article.objects.filter(
-            statut='publie',
-            contenu__icontains=query
-        ).count()
-        
-        Recherche.objects.create(
-            terme=query,
-            utilisateur=request.user if request.user.is_authenticated else None,
-            ip_address=request.META.get('REMOTE_ADDR'),
-            resultats_trouves=resultats_count
+        # Recherche classée (BM25) : la page et le total en une seule requête indexée,
+        # éventuellement mélangée avec la recherche sémantique
+        search = search_index.hybrid_search if settings.SEARCH_HYBRID else search_index.search
+        results, total = search(
+            query,
+            offset=(page - 1) * SEARCH_PAGE_SIZE,
+            limit=SEARCH_PAGE_SIZE,
         )
         
-        # Classic search in articles
-        results = Article.objects.filter(
-            statut='publie',
-            titre__icontains=query
-        ) | Article.objects.filter(
-            statut='publie',
-            contenu__icontains=query
-        )
-        
-        # AI-powered answer if Google AI is configured
-        if settings.GOOGLE_API_KEY:
-            try:
-                genai.configure(api_key=settings.GOOGLE_API_KEY)
-                model = genai.GenerativeModel("gemini-1.5-flash")
-                response = model.generate_content(
-                    [
-                        "Tu es un assistant pour la base de connaissances d'une entreprise. Réponds de manière concise et utile.",
-                        f"Question: {query}",
-                    ]
-                )
-                ai_answer = response.text
-            except Exception as e:
-                ai_answer = f"Erreur avec l'IA: {str(e)}"
+        # Enregistrer la recherche (écriture différée, par lots)
+        log_search(request, query, total)
     
     return render(request, 'search_results.html', {
         'query': query,
         'results': results,
-        'ai_answer': ai_answer,
-    })
\ No newline at end of file
+        'total': total,
+        'page': page,
+        'previous_page': page - 1 if page > 1 else None,
+        'next_page': page + 1 if page * SEARCH_PAGE_SIZE < total else None,
+        # La réponse IA est chargée ensuite en streaming (ai_answer_stream)
+        'ai_enabled': bool(query) and ai.is_enabled(),
+    })
+
+def search_suggestions(request):
+    # Autocomplétion servie par l'index de préfixes en mémoire (aucune requête SQL)
+    query = request.GET.get('q', '')[:SUGGESTION_QUERY_MAX]
+    search_url = reverse('search')
+    data = []
+    for suggestion in suggestions.suggest(query):
+        if suggestion.type == 'article':
+            url = reverse('article_detail', args=[suggestion.article_id])
+        else:
+            url = f"{search_url}?{urlencode({'q': suggestion.texte})}"
+        data.append({'texte': suggestion.texte, 'type': suggestion.type, 'url': url})
+    response = JsonResponse({'query': query, 'suggestions': data})
+    response['Cache-Control'] = 'private, max-age=60'
+    return response
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def ai_answer_stream(request):
+    """Réponse IA en Server-Sent Events, sans occuper de worker synchrone."""
+    query = request.GET.get('q', '').strip()
+    if not query or not ai.is_enabled():
+        return HttpResponse(status=204)
+    # Mêmes articles de contexte que la première page de search_view
+    articles, _ = await sync_to_async(search_index.search)(query, limit=ai.ARTICLES_CONTEXTE)
+    await sync_to_async(pdf_text.add_excerpts)(articles, query)
+
+    async def events():
+        try:
+            async for text in ai.stream_answer(query, articles):
+                yield _sse('token', {'text': text})
+            yield _sse('done', {})
+        except asyncio.TimeoutError:
+            yield _sse('error', {'message': "L'IA n'a pas répondu à temps."})
+        # Une déconnexion du client annule la tâche (CancelledError n'est pas
+        # une Exception) : la génération en cours est abandonnée
+        except Exception as e:
+            yield _sse('error', {'message': f"Erreur avec l'IA: {str(e)}"})
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
\ No newline at end of file